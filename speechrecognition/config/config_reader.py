@@ -74,8 +74,108 @@ class ConfigReader(object): #, metaclass=Singleton):
         """
         return self.dataset['num_speakers']
 
+    def audio_dir(self):
+        """
+        Directory of the audios in the dataset path (VCTK).
+        Defaults to the original 'wav48', set it to the 16 kHz mirror created by the convert command
+        to skip the resampling in the feature extraction.
+        """
+        return self.dataset.get('audio_dir', 'wav48')
+
+    def feature_store_path(self):
+        """
+        Directory of the memory mapped feature store of the preprocessed dataset.
+        The dataset is preprocessed and saved to it on the first run and loaded from it on the next runs.
+        If you leave it empty, the dataset is preprocessed on every run.
+        """
+        path = self.dataset.get('feature_store')
+
+        if path is None:
+            return None
+
+        return self._absolute_path(path)
+
+    def manifest_path(self):
+        """
+        Path to the cached manifest of the corpus utterances, transcripts and durations.
+        It's built on the first run and only the changed directories are rescanned on the next runs.
+        If you leave it empty, the corpus is scanned on every run.
+        """
+        path = self.dataset.get('manifest')
+
+        if path is None:
+            return None
+
+        return self._absolute_path(path)
+
+    def dataset_split(self):
+        """
+        How the dataset is split to train and test set, 'random' by seeded shuffle of the whole corpus,
+        'hash' by stable hash of the utterance (or speaker) id, which keeps the split when the corpus grows.
+        """
+        return self.dataset.get('split', 'random')
+
+    def test_ratio(self):
+        """
+        Ratio of the test set, defaults to 0.3.
+        """
+        return self.dataset.get('test_ratio', 0.3)
+
+    def split_by_speaker(self):
+        """
+        Flag whether the hash split assigns whole speakers to the sets, so no test speaker is seen in the training.
+        """
+        return self.dataset.get('split_by_speaker', False)
+
+    def dataset_sets(self):
+        """
+        Sets whose features are extracted, e.g. [test] for evaluation skips the training set.
+        Defaults to both train and test set.
+        """
+        return tuple(self.dataset.get('sets', ('train', 'test')))
+
+    def dataset_mode(self):
+        """
+        How the dataset is served to the model, 'memory' preprocesses the whole dataset to memory,
+        'stream' yields the utterances lazily from the file manifest or the feature store.
+        """
+        return self.dataset.get('mode', 'memory')
+
+    def shuffle_buffer(self):
+        """
+        Number of utterances in the shuffle buffer of the streamed train set.
+        """
+        return self.dataset.get('shuffle_buffer', 1000)
+
+    def tfrecord_path(self):
+        """
+        Directory of the sharded TFRecord export of the preprocessed dataset.
+        The dataset is exported to it before the first training and the model reads it by parallel interleave.
+        If you leave it empty, the dataset is fed to the model from memory (or streamed in the stream mode).
+        The dataset is still loaded to memory in the memory mode, use the stream mode to keep it out of memory.
+        """
+        path = self.dataset.get('tfrecords')
+
+        if path is None:
+            return None
+
+        return self._absolute_path(path)
+
+    def num_shards(self):
+        """
+        Number of TFRecord files of the train and of the test set.
+        """
+        return self.dataset.get('num_shards', 8)
+
     # -----FEATURES-----
 
+    def feature_name(self):
+        """
+        Type of the speech features, 'mfcc', 'fbank' (log mel filterbank) or 'spectrogram' (log power spectrum).
+        All the types are computed from the same power spectrum by the numpy engine.
+        """
+        return self.features.get('name', 'mfcc')
+
     def feature_size(self):
         """
         Length of the speech feature vector!
@@ -83,13 +183,159 @@ class ConfigReader(object): #, metaclass=Singleton):
         """
         return self.features['feature_size']
 
+    def feature_deltas(self):
+        """
+        Order of delta coefficients appended to the features, the feature size includes them.
+        E.g. 13 MFCC with deltas 2 has feature size 39.
+        """
+        return self.features.get('deltas', 0)
+
     def num_context(self):
         """
-        # TODO: connect or change
-        Param for MFCC, will be changed...
+        Number of past and future frames stacked to every frame, the model input is [frame-k ... frame+k].
+        It's applied only with use_context.
         """
         return self.features['num_context']
 
+    def use_context(self):
+        """
+        Flag whether the num_context frames are stacked to every frame in the batch assembly.
+        The stored features keep the feature size, only the batches are wider.
+        """
+        return self.features.get('use_context', False)
+
+    def frame_stack(self):
+        """
+        Number of consecutive frames stacked to one frame, the model runs at frame_stack times lower frame rate.
+        Defaults to 1, no stacking.
+        """
+        return self.features.get('frame_stack', 1)
+
+    def input_size(self):
+        """
+        Size of the input vector of the model, the feature size times number of the stacked frames.
+        """
+        if self.use_context():
+            return self.feature_size() * self.frame_stack() * (2 * self.num_context() + 1)
+
+        return self.feature_size() * self.frame_stack()
+
+    def feature_engine(self):
+        """
+        Implementation of the MFCC feature extraction.
+        'psf' runs python_speech_features file by file, 'numpy' computes whole chunks of files at once.
+        """
+        return self.features.get('engine', 'psf')
+
+    def audio_loader(self):
+        """
+        Loader of the audio files.
+        'librosa' uses librosa.load, 'wav' reads PCM WAV files directly and falls back to librosa for other formats.
+        """
+        return self.features.get('loader', 'librosa')
+
+    def resample_quality(self):
+        """
+        Quality of resampling to 16kHz in the 'wav' audio loader, one of fast, medium or high.
+        Trades the accuracy of the resampling filter for speed.
+        """
+        return self.features.get('resample_quality', 'medium')
+
+    def vad(self):
+        """
+        Flag whether the leading and trailing silence of the audio is trimmed before the feature extraction.
+        Defaults to False.
+        """
+        return self.features.get('vad', False)
+
+    def vad_threshold(self):
+        """
+        Threshold of the silence trimming in dB below the loudest frame of the utterance, None when it's disabled.
+        """
+        return self.features.get('vad_threshold', 40.) if self.vad() else None
+
+    def vad_padding(self):
+        """
+        Seconds of silence kept before and after the voiced part of the trimmed audio.
+        """
+        return self.features.get('vad_padding', 0.1)
+
+    def normalization(self):
+        """
+        Normalization of the speech features.
+        'frame' normalizes every frame to zero mean and unit variance,
+        'cmvn' normalizes every coefficient by mean and variance of the whole training set.
+        """
+        return self.features.get('normalization', 'frame')
+
+    def stream_normalization(self):
+        """
+        Normalization of the features streamed in the prediction, one of feature_stream.STREAM_NORMALIZATIONS.
+        'frame' gives the same features as the training, 'running' normalizes every coefficient by mean and variance
+        of the frames read so far. It applies only to the frame normalization, CMVN uses the saved statistics.
+        """
+        return self.features.get('stream_normalization', 'frame')
+
+    def cmvn_per_speaker(self):
+        """
+        Flag whether the CMVN statistics are accumulated and applied per speaker.
+        The prediction, where the speaker is unknown, uses the global statistics.
+        """
+        return self.features.get('cmvn_per_speaker', False)
+
+    def cmvn_path(self):
+        """
+        Path to the CMVN statistics, they are saved next to the trained model checkpoints.
+        """
+        return os.path.join(self.get_trained_model_path(), 'cmvn.npz')
+
+    def storage_dtype(self):
+        """
+        Dtype the features are kept in memory, in the feature cache and in the feature store.
+        One of float32, float16 or int8 (scaled per utterance), float16 and int8 trade a bit of precision for memory.
+        """
+        return self.features.get('storage_dtype', 'float32')
+
+    def feature_cache_path(self):
+        """
+        Directory of the on-disk feature cache.
+        If you leave it empty, the features are extracted again on every run.
+        """
+        path = self.features.get('cache_path')
+
+        if path is None:
+            return None
+
+        return self._absolute_path(path)
+
+    def feature_cache_max_bytes(self):
+        """
+        Byte budget of the feature cache, the least recently used features are evicted over it.
+        If you leave it empty, the cache is unlimited.
+        """
+        return self.features.get('cache_max_bytes')
+
+    def feature_cache_hash_content(self):
+        """
+        Flag whether the cache keys are built from the audio file content instead of its path, size and mtime.
+        Slower, but survives moving or touching the dataset files.
+        """
+        return self.features.get('cache_hash_content', False)
+
+    def feature_num_workers(self):
+        """
+        Number of processes extracting the speech features in parallel.
+        Defaults to 1, the features are extracted in the main process.
+        """
+        return self.features.get('num_workers', 1)
+
+    def feature_chunk_size(self):
+        """
+        Number of audio files submitted to a feature extraction worker at once.
+        If you leave it empty, it's derived from the dataset size and number of workers.
+        """
+        return self.features.get('chunk_size')
+
     # -----HYPERPARAMATERS-----
 
     def num_classes(self):
@@ -146,6 +392,51 @@ class ConfigReader(object): #, metaclass=Singleton):
         """
         return self.hyperparameters['dropout_prob']
 
+    def sortagrad_epochs(self):
+        """
+        Number of the first training epochs which iterate the utterances sorted by length (SortaGrad curriculum).
+        Short utterances first makes the early training faster and more stable, then the order is shuffled.
+        Defaults to 0, the curriculum is off.
+        """
+        return self.hyperparameters.get('sortagrad_epochs', 0)
+
+    def spec_augment(self):
+        """
+        Flag whether the training batches are augmented by SpecAugment frequency and time masking.
+        Defaults to False.
+        """
+        return self.hyperparameters.get('spec_augment', False)
+
+    def freq_masks(self):
+        """
+        Number of SpecAugment frequency masks of every utterance.
+        """
+        return self.hyperparameters.get('freq_masks', 2)
+
+    def freq_mask_width(self):
+        """
+        Maximal width of SpecAugment frequency mask in feature coefficients.
+        """
+        return self.hyperparameters.get('freq_mask_width', 4)
+
+    def time_masks(self):
+        """
+        Number of SpecAugment time masks of every utterance.
+        """
+        return self.hyperparameters.get('time_masks', 2)
+
+    def time_mask_width(self):
+        """
+        Maximal width of SpecAugment time mask in frames.
+        """
+        return self.hyperparameters.get('time_mask_width', 20)
+
+    def time_mask_ratio(self):
+        """
+        Maximal width of SpecAugment time mask as ratio of the utterance length.
+        """
+        return self.hyperparameters.get('time_mask_ratio', 0.2)
+
     # -----MODEL-----
 
     def get_tensorboard_logs_path(self):
@@ -0,0 +1,118 @@
+import os
+import math
+import time
+from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from speechrecognition.utils import audio_utils, wav_utils
+
+# directory of the original 48 kHz VCTK audios and the default directory of the converted mirror
+SOURCE_AUDIO_DIR = 'wav48'
+CONVERTED_AUDIO_DIR = 'wav16'
+
+
+def convert_corpus(dataset_path, source_dir=SOURCE_AUDIO_DIR, target_dir=CONVERTED_AUDIO_DIR,
+                   sample_rate=audio_utils.SAMPLE_RATE, num_workers=1, resample_quality='medium', chunk_size=None):
+    """
+    Converts the audios of the corpus once to mono 16-bit PCM WAV mirror of the sample rate the features use,
+    so the feature extraction reads them without resampling.
+    The mirror keeps the speaker directories and filenames of the source, e.g. wav48/p225/p225_001.wav
+    is converted to wav16/p225/p225_001.wav, point dataset.audio_dir to the mirror to use it.
+    The conversion is resumable, every file is written to temporary file and renamed when it's complete,
+    the already converted files are skipped.
+
+    :param str dataset_path: path to the corpus
+    :param str source_dir: directory of the source audios in the corpus
+    :param str target_dir: directory of the converted audios in the corpus
+    :param int sample_rate: sample rate of the converted audios
+    :param int num_workers: number of processes of the conversion
+    :param str resample_quality: resampling quality, one of wav_utils.RESAMPLE_QUALITY
+    :param int chunk_size: number of files submitted to a worker at once, None chooses it from the corpus size
+    :return: tuple of (number of converted files, number of skipped files)
+    """
+    source_path = os.path.join(dataset_path, source_dir)
+    target_path = os.path.join(dataset_path, target_dir)
+
+    if not os.path.isdir(source_path):
+        raise ValueError(f'Missing source audio directory {source_path}')
+
+    jobs = []
+    skipped = 0
+    for source_filename, target_filename in mirror_filenames(source_path, target_path):
+        if os.path.isfile(target_filename):
+            skipped += 1
+        else:
+            jobs.append((source_filename, target_filename))
+
+    start_time = time.perf_counter()
+
+    chunk_size = chunk_size or max(1, min(64, math.ceil(len(jobs) / (num_workers * 4))))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+    with tqdm(total=len(jobs), desc=f'Converting {source_dir} to {target_dir}') as t_files:
+        if num_workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = {executor.submit(convert_files, chunk, sample_rate, resample_quality): chunk
+                           for chunk in chunks}
+
+                for future in as_completed(futures):
+                    future.result()
+                    t_files.update(len(futures[future]))
+        else:
+            for chunk in chunks:
+                convert_files(chunk, sample_rate, resample_quality)
+                t_files.update(len(chunk))
+
+    elapsed_time = time.perf_counter() - start_time
+
+    print(f'Converted {len(jobs)} files in {elapsed_time:.1f}s to {target_path}, '
+          f'{skipped} already converted files skipped.')
+
+    return len(jobs), skipped
+
+
+def mirror_filenames(source_path, target_path):
+    """
+    Pairs of the source audio files and their paths in the mirror, sorted by the source path.
+    :param str source_path: directory of the source audios
+    :param str target_path: directory of the mirror
+    :return: list of tuples (source filename, target filename)
+    """
+    filenames = []
+
+    for root, dirs, files in os.walk(source_path):
+        dirs.sort()
+
+        relative_root = os.path.relpath(root, source_path)
+
+        for filename in sorted(files):
+            if filename.startswith('.'):
+                continue
+
+            target_filename = os.path.splitext(filename)[0] + '.wav'
+            filenames.append((os.path.join(root, filename),
+                              os.path.normpath(os.path.join(target_path, relative_root, target_filename))))
+
+    return filenames
+
+
+def convert_files(jobs, sample_rate, resample_quality='medium'):
+    """
+    Converts the audio files, it's the unit of work of the parallel conversion.
+    :param list jobs: list of tuples (source filename, target filename)
+    :param int sample_rate: sample rate of the converted audios
+    :param str resample_quality: resampling quality, one of wav_utils.RESAMPLE_QUALITY
+    """
+    for source_filename, target_filename in jobs:
+        signal, _ = wav_utils.load_wav(source_filename, sample_rate=sample_rate, quality=resample_quality)
+
+        os.makedirs(os.path.dirname(target_filename), exist_ok=True)
+
+        # the target file appears only complete, so interrupted conversion is resumed from the next file
+        temp_filename = os.path.join(os.path.dirname(target_filename), '.' + os.path.basename(target_filename) + '.part')
+        try:
+            wav_utils.write_wav(temp_filename, signal, sample_rate)
+            os.replace(temp_filename, target_filename)
+        finally:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
@@ -1,5 +1,8 @@
 from speechrecognition.dataset.digit_dataset import DigitDataset
 from speechrecognition.dataset.vctk_dataset import VCTKDataset
+from speechrecognition.dataset.feature_store import StoreOptions
+from speechrecognition.dataset.manifest import ManifestOptions
+from speechrecognition.utils.feature_cache import FeatureCache
 
 class Dataset(object):
     """
@@ -24,17 +27,55 @@ class Dataset(object):
         """
         name = config.dataset_name()
 
+        feature_options = self.feature_options(config)
+
         # TODO: get dataset names from static config
         if name == 'digits':
             self.dataset_engine = DigitDataset(
                 dataset_path=self.config.dataset_path(),
-                num_features=self.config.feature_size(), num_context=self.config.num_context())
+                num_features=self.config.feature_size(), num_context=self.config.num_context(),
+                **feature_options
+            )
         elif name == 'VCTK':
             self.dataset_engine = VCTKDataset(
                 dataset_path=self.config.dataset_path(), num_speakers=self.config.num_speakers(),
-                num_features=self.config.feature_size(), num_context=self.config.num_context()
+                num_features=self.config.feature_size(), num_context=self.config.num_context(),
+                audio_dir=self.config.audio_dir(), **feature_options
             )
         else:
             # TODO: Create my own exepction
             raise Exception('Missing datset engine name.')
 
+    def feature_options(self, config):
+        """
+        Collects the feature extraction options of the dataset engines from the config.
+        :param ConfigReader config: config reader object
+        :return: dict of keyword arguments for the dataset engine
+        """
+        feature_cache = None
+        if config.feature_cache_path() is not None:
+            feature_cache = FeatureCache(config.feature_cache_path(), max_bytes=config.feature_cache_max_bytes(),
+                                         hash_content=config.feature_cache_hash_content())
+
+        return {
+            'feature_cache': feature_cache,
+            'num_workers': config.feature_num_workers(),
+            'chunk_size': config.feature_chunk_size(),
+            'feature_engine': config.feature_engine(),
+            'feature_type': config.feature_name(),
+            'feature_deltas': config.feature_deltas(),
+            'vad_threshold': config.vad_threshold(),
+            'vad_padding': config.vad_padding(),
+            'audio_loader': config.audio_loader(),
+            'resample_quality': config.resample_quality(),
+            'store_options': StoreOptions(config.feature_store_path(), config.storage_dtype()),
+            'normalization': config.normalization(),
+            'cmvn_path': config.cmvn_path(),
+            'cmvn_per_speaker': config.cmvn_per_speaker(),
+            'use_context': config.use_context(),
+            'frame_stack': config.frame_stack(),
+            'mode': config.dataset_mode(),
+            'manifest_options': ManifestOptions(config.manifest_path(), config.dataset_split(), config.test_ratio(),
+                                                config.split_by_speaker()),
+            'sets': config.dataset_sets(),
+        }
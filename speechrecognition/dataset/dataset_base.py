@@ -1,21 +1,58 @@
+import os
 import numpy as np
-import tensorflow as tf
 import pickle
+import math
+import time
 from tqdm import tqdm
 import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from speechrecognition.utils import audio_utils, text_utils
+from speechrecognition.utils import audio_utils, text_utils, feature_quantization
+from speechrecognition.utils.feature_engine import num_coefficients
+from speechrecognition.utils.vad import vad_report
+from speechrecognition.utils.cmvn import CMVN, params_digest
+from speechrecognition.dataset.feature_store import StoreOptions, SPLIT_MODES, split_store_matches, \
+    open_split_store, write_split_store, to_object_array
+from speechrecognition.dataset.manifest import ManifestOptions, corpus_digest, hash_split
 
 class DatasetBase(object):
     """
     Base class for datasets operation.
     """
 
-    def __init__(self, num_features, num_context):
+    def __init__(self, num_features, num_context, feature_cache=None, num_workers=1, chunk_size=None,
+                 feature_engine='psf', audio_loader='librosa', resample_quality='medium', store_options=None,
+                 normalization='frame', cmvn_path=None, cmvn_per_speaker=False, use_context=False,
+                 feature_type='mfcc', feature_deltas=0, vad_threshold=None, vad_padding=0.1, frame_stack=1,
+                 mode='memory', manifest_options=None, sets=('train', 'test')):
         """
         Initializer of DatasetBase object
         :param int num_features: size of feature vector
-        :param num_context: NOT USED...
+        :param int num_context: number of past and future context frames stacked to every frame
+        :param FeatureCache feature_cache: on-disk cache of extracted features, None disables caching
+        :param int num_workers: number of processes for the feature extraction
+        :param int chunk_size: number of files submitted to a worker at once, None chooses it from the dataset size
+        :param str feature_engine: MFCC implementation, one of audio_utils.FEATURE_ENGINES
+        :param str audio_loader: audio loader, one of audio_utils.AUDIO_LOADERS
+        :param str resample_quality: resampling quality of the wav loader
+        :param StoreOptions store_options: directory of memory mapped feature store of the dataset and dtype
+                                           of the features in memory and on disk, None keeps float32 without store
+        :param str normalization: 'frame' normalizes every frame, 'cmvn' normalizes by statistics of the training set
+        :param str cmvn_path: path where the CMVN statistics are saved to or loaded from
+        :param bool cmvn_per_speaker: normalize by statistics of the speaker of the utterance
+        :param bool use_context: stack the context frames to the frames in the batch assembly
+        :param str feature_type: type of the features, one of feature_engine.FEATURE_TYPES
+        :param int feature_deltas: order of deltas appended to the features, num_features includes them
+        :param float vad_threshold: trims the leading and trailing silence quieter by the dB than the loudest frame,
+                                    None disables the trimming
+        :param float vad_padding: seconds of silence kept on both ends of the trimmed audio
+        :param int frame_stack: number of consecutive frames stacked to one frame of frame_stack times lower frame rate
+        :param str mode: 'memory' preprocesses the whole dataset to memory, 'stream' reads only the file manifest
+                         and yields the utterances lazily by stream_dataset
+        :param ManifestOptions manifest_options: path to the cached manifest of the corpus and its split to train
+                                                 and test set, None scans the corpus on every start and splits it
+                                                 randomly
+        :param tuple sets: sets whose features are extracted in the memory mode, e.g. ('test',) for evaluation
         """
         self._audio_filenames = []
         self._label_filenames = []
@@ -23,6 +60,63 @@ class DatasetBase(object):
 
         self.num_features = num_features
         self.num_context = num_context
+        self.use_context = use_context
+        self.frame_stack = frame_stack
+
+        self.feature_cache = feature_cache
+        self.num_workers = num_workers or 1
+        self.chunk_size = chunk_size
+        self.feature_engine = feature_engine
+        self.audio_loader = audio_loader
+        self.resample_quality = resample_quality
+        self.store_options = store_options or StoreOptions()
+
+        # fails early when the feature size doesn't fit the feature type
+        num_coefficients(feature_type, num_features, feature_deltas)
+        if feature_type != 'mfcc' and feature_engine == 'psf':
+            raise ValueError(f'Feature engine "psf" computes only mfcc features, use "numpy" engine '
+                             f'for {feature_type} features')
+
+        self.feature_type = feature_type
+        self.feature_deltas = feature_deltas
+        self.vad_threshold = vad_threshold
+        self.vad_padding = vad_padding
+
+        if normalization not in ('frame', 'cmvn'):
+            raise ValueError(f'Normalization "{normalization}" not understood, choose one of (\'frame\', \'cmvn\')')
+
+        if mode not in ('memory', 'stream'):
+            raise ValueError(f'Dataset mode "{mode}" not understood, choose one of (\'memory\', \'stream\')')
+
+        self.mode = mode
+        self.manifest_options = manifest_options or ManifestOptions()
+        self.sets = tuple(sets)
+
+        self.normalization = normalization
+        self.cmvn_path = cmvn_path
+        self.cmvn_per_speaker = cmvn_per_speaker
+        self.cmvn = None
+
+        # speakers of the utterances, None when the engine doesn't know them
+        self._train_speakers = None
+        self._test_speakers = None
+
+        # stream mode sources, the opened feature stores or the audio filenames of the split manifest
+        self.train_store = None
+        self.test_store = None
+        self._train_filenames = None
+        self._test_filenames = None
+        # audio filename -> duration in seconds from the manifest, the streamed audio files are sorted by it
+        self._durations = None
+        # manifest read by the engine and its corpus_digest, the feature store is built again when it changes
+        self._manifest = None
+        self._corpus = None
+
+        # reused buffers of the padded batches
+        self.batch_assembler = audio_utils.BatchAssembler()
+
+        # labels of next_batch in CSR format, the batches are sliced from it
+        self._labels_csr = None
 
         self._index_in_epoch = 0
         self._epochs_completed = 0
@@ -32,29 +126,626 @@ class DatasetBase(object):
     def read_dataset(self):
         raise NotImplemented
 
-    def train_dataset(self):
+    def read_manifest(self, *args):
+        """
+        Reads the audio filenames, labels, speakers and durations of the dataset without extracting the features.
+        Engines override it to support the stream mode.
+
+        :param args: arguments of the engine read_dataset function
+        :return: tuple of (audio filenames, labels, speakers, durations in seconds),
+                 speakers and durations are None when they are not known
+        """
+        raise NotImplementedError(f'{type(self).__name__} doesn\'t support the stream mode')
+
+    def manifest(self, *args):
+        """
+        Reads the manifest by read_manifest only once, the feature store check and the extraction share it.
+        :param args: arguments of the engine read_manifest function
+        :return: tuple of (audio filenames, labels, speakers, durations in seconds)
+        """
+        if self._manifest is None:
+            self._manifest = self.read_manifest(*args)
+
+            audio_filenames, labels, _, durations = self._manifest
+            self._corpus = corpus_digest(audio_filenames, labels, durations)
+
+        return self._manifest
+
+    def read_sets(self, *args, desc='Extracting features'):
+        """
+        Reads the manifest of the dataset, splits it to train and test set and only then extracts
+        the features of the sets in sets, the other sets are left empty.
+
+        :param args: arguments of the engine read_manifest function
+        :param str desc: description of the progress bar
+        """
+        audio_filenames, labels, speakers, _ = self.manifest(*args)
+
+        self.split_dataset(audio_filenames, labels, speakers)
+
+        filenames = []
+        for name in ('train', 'test'):
+            if name in self.sets:
+                filenames.extend(getattr(self, f'_{name}_audios'))
+
+        # both sets are extracted at once, so the workers are started only once
+        audios = to_object_array(self.extract_features(filenames, desc=desc))
+
+        start = 0
+        for name in ('train', 'test'):
+            if name in self.sets:
+                end = start + len(getattr(self, f'_{name}_audios'))
+                setattr(self, f'_{name}_audios', audios[start:end])
+                start = end
+            else:
+                self.clear_set(name)
+
+    def clear_set(self, name):
+        """
+        Empties the train or test set, it's used for the sets which are not in sets.
+        :param str name: 'train' or 'test'
+        """
+        setattr(self, f'_{name}_audios', to_object_array([]))
+        setattr(self, f'_{name}_labels', to_object_array([]))
+        if getattr(self, f'_{name}_speakers') is not None:
+            setattr(self, f'_{name}_speakers', to_object_array([]))
+        if getattr(self, f'_{name}_filenames') is not None:
+            setattr(self, f'_{name}_filenames', to_object_array([]))
+        setattr(self, f'{name}_store', None)
+
+    def init_dataset(self, read_dataset, *args):
+        """
+        Loads the dataset from the feature store if there is one written with the current parameters and corpus,
+        otherwise reads the dataset by read_dataset function and saves it to the feature store.
+
+        :param function read_dataset: engine function which reads and preprocess the dataset
+        :param args: arguments of the read_dataset function
+        """
+        if self.mode == 'stream':
+            self.init_stream(*args)
+            return
+
+        store_path = self.store_options.path
+
+        if store_path is None:
+            read_dataset(*args)
+        elif self.feature_store_matches(*args):
+            self.load_feature_store()
+
+            # the store keeps both sets of the split
+            for name in set(SPLIT_MODES) - set(self.sets):
+                self.clear_set(name)
+        else:
+            read_dataset(*args)
+
+            # store of a single set would be mistaken for the whole dataset on the next start
+            if set(self.sets) >= set(SPLIT_MODES):
+                self.save_feature_store()
+            else:
+                print(f'Feature store is not saved, only {", ".join(self.sets)} set was extracted.')
+
+        if self.frame_stack > 1:
+            self.drop_unfit_utterances()
+
+        if self.normalization == 'cmvn':
+            self.init_cmvn()
+
+    def init_stream(self, *args):
+        """
+        Prepares the stream mode, nothing but the manifest and the labels is kept in memory.
+        The utterances are streamed from the feature store if there is one, otherwise from the audio files
+        of the manifest with the features extracted on the fly (and served from the feature cache).
+        The manifest is split the same way as the features in the memory mode.
+        When the feature store path is set, the store is written utterance by utterance on the first run
+        and whenever it was written with different parameters or corpus.
+
+        :param args: arguments of the engine read_dataset function
+        """
+        store_path = self.store_options.path
+
+        audio_filenames, labels, speakers, durations = self.manifest(*args)
+
+        if durations is not None:
+            self._durations = dict(zip(audio_filenames, durations))
+
+        if store_path is None or not self.feature_store_matches(*args):
+            self.split_dataset(audio_filenames, labels, speakers)
+
+            self._train_filenames, self._test_filenames = self._train_audios, self._test_audios
+            self._train_audios, self._test_audios = None, None
+
+            if store_path is not None:
+                self.save_feature_store()
+
+        if store_path is not None:
+            self.train_store, self.test_store = open_split_store(store_path)
+            self._train_labels = self.train_store.labels()
+            self._test_labels = self.test_store.labels()
+            self._train_speakers = self.train_store.speakers
+            self._test_speakers = self.test_store.speakers
+
+            print(f'Streaming feature store {store_path} with {len(self.train_store)} of training data '
+                  f'and {len(self.test_store)} of testing data.')
+
+        for name in set(SPLIT_MODES) - set(self.sets):
+            self.clear_set(name)
+
+        if self.normalization == 'cmvn':
+            self.init_cmvn()
+
+    def feature_store_matches(self, *args):
+        """
+        Checks the feature store against the current store_params, see feature_store.split_store_matches.
+        The manifest is read first, the store of other utterances is built again too.
+        :param args: arguments of the engine read_manifest function
+        :return: bool, False when the store has to be (re)built
+        """
+        self.manifest(*args)
+
+        return split_store_matches(self.store_options.path, self.store_params(), self.num_features)
+
+    def load_feature_store(self):
+        """
+        Opens the train and test feature stores, the audios and labels are views into the memory mapped files.
+        """
+        self.train_store, self.test_store = open_split_store(self.store_options.path)
+
+        self._train_audios = self.train_store.audios()
+        self._train_labels = self.train_store.labels()
+        self._test_audios = self.test_store.audios()
+        self._test_labels = self.test_store.labels()
+        self._train_speakers = self.train_store.speakers
+        self._test_speakers = self.test_store.speakers
+
+        print(f'Loaded feature store {self.store_options.path} with {len(self._train_audios)} of training data '
+              f'and {len(self._test_audios)} of testing data.')
+
+    def save_feature_store(self):
+        """
+        Writes the train and test feature stores utterance by utterance, in the stream mode the features
+        are extracted from the audio files on the fly, at most one chunk of them is in memory at once.
+        """
+        sets = {mode: (self.iter_utterances(mode), self.num_utterances(mode)) for mode in SPLIT_MODES}
+
+        write_split_store(self.store_options.path, sets, dtype=self.store_options.dtype, params=self.store_params())
+
+    def num_utterances(self, mode='train'):
+        """
+        Number of utterances of the train or test set.
+        :param str mode: 'train' or 'test'
+        :return: int
+        """
+        store = self.train_store if mode == 'train' else self.test_store
+        if self.mode == 'stream' and store is not None:
+            return len(store)
+
+        labels = self._train_labels if mode == 'train' else self._test_labels
+        return len(labels)
+
+    def iter_utterances(self, mode='train', shuffle=False, sort_by_length=False):
+        """
+        Iterates the raw stored features, see init_stream.
+        The features of the audio files are extracted in chunks, so the numpy engine can batch them.
+        In the memory mode the features in memory are iterated.
+
+        :param str mode: 'train' or 'test'
+        :param bool shuffle: iterate in random order
+        :param bool sort_by_length: iterate from the shortest to the longest utterance, the audio files
+                                    are sorted by their manifest durations
+        :return: generator of tuples (features, label, speaker)
+        """
+        store = self.train_store if mode == 'train' else self.test_store
+        labels = self._train_labels if mode == 'train' else self._test_labels
+        speakers = self._train_speakers if mode == 'train' else self._test_speakers
+
+        if self.mode == 'memory':
+            audios = self._train_audios if mode == 'train' else self._test_audios
+
+            order = self.length_order(audios) if sort_by_length else np.arange(len(audios))
+            if shuffle and not sort_by_length:
+                np.random.shuffle(order)
+
+            for i in order:
+                yield audios[i], labels[i], speakers[i] if speakers is not None else None
+            return
+
+        filenames = self._train_filenames if mode == 'train' else self._test_filenames
+
+        order = np.arange(self.num_utterances(mode))
+        if sort_by_length and store is not None:
+            order = np.argsort(store.index[:, 1], kind='stable')
+        elif sort_by_length and self._durations is not None:
+            order = np.argsort([self._durations[filename] for filename in filenames], kind='stable')
+        elif sort_by_length:
+            print(f'Durations of the {mode} audio files are not known, they are iterated in random order.')
+            np.random.shuffle(order)
+        elif shuffle:
+            np.random.shuffle(order)
+
+        if store is not None:
+            for i in order:
+                yield store[i], store.label(i), speakers[i] if speakers is not None else None
+            return
+
+        chunk_size = self.chunk_size or 32
+
+        for start in range(0, len(order), chunk_size):
+            chunk = order[start:start + chunk_size]
+
+            for i, audio in zip(chunk, self.extract_chunk([filenames[i] for i in chunk])):
+                yield audio, labels[i], speakers[i] if speakers is not None else None
+
+    def extract_chunk(self, audio_filenames):
+        """
+        Extracts the features of a few audio files in the main process without any reporting,
+        the feature cache is used the same way as in extract_features.
+        :param list audio_filenames: paths to the audio files
+        :return: list of features in the storage dtype
+        """
+        params = self.feature_params()
+
+        audios = [None] * len(audio_filenames)
+        if self.feature_cache is not None:
+            audios = [self.feature_cache.get(audio_filename, params) for audio_filename in audio_filenames]
+
+        missing = [i for i, audio_features in enumerate(audios) if audio_features is None]
+        if not missing:
+            return audios
+
+        missing_audios = audio_utils.audiofiles_to_input_vectors(
+            [audio_filenames[i] for i in missing], self.num_features, self.num_context, **self.extraction_options())
+
+        for i, audio_features in zip(missing, missing_audios):
+            audios[i] = feature_quantization.quantize(audio_features, self.store_options.dtype)
+
+            if self.feature_cache is not None:
+                self.feature_cache.put(audio_filenames[i], params, audios[i])
+
+        return audios
+
+    def stream_dataset(self, mode='train', shuffle=False, sort_by_length=False, context=True):
+        """
+        Yields the preprocessed utterances one by one, it's the source of the tf.data generator of the stream mode
+        and of the TFRecord export. Every utterance is preprocessed the same way as in transform_to_speech_targets:
+        dequantized, normalized by CMVN, frame stacked and context windowed. The utterances whose labels
+        don't fit to the stacked audio are skipped.
+
+        :param str mode: 'train' or 'test'
+        :param bool shuffle: yield in random order, new for every call
+        :param bool sort_by_length: yield from the shortest to the longest utterance
+        :param bool context: stack the context windows when use_context is set, False leaves them to the reader
+        :return: generator of tuples (float32 features of shape (num_frames, input_size), int32 label)
+        """
+        for audio, label, speaker in self.iter_utterances(mode, shuffle, sort_by_length):
+            audio = feature_quantization.dequantize(audio)
+
+            if self.cmvn is not None:
+                audio = self.cmvn.normalize(np.array(audio, dtype=np.float32), speaker)
+
+            if self.frame_stack > 1:
+                x, x_length = audio_utils.stack_frames(audio[None], [len(audio)], self.frame_stack)
+                audio = x[0, :x_length[0]]
+
+                if len(audio) < text_utils.ctc_min_length(label):
+                    continue
+
+            if self.use_context and context:
+                audio = audio_utils.context_windows(audio, self.num_context)
+
+            yield np.asarray(audio, dtype=np.float32), np.asarray(label, dtype=np.int32)
+
+    def drop_unfit_utterances(self):
+        """
+        Drops the utterances whose labels don't fit to the CTC input shortened by the frame stacking,
+        CTC loss of such utterance is infinite.
+        """
+        for name in ('train', 'test'):
+            audios = getattr(self, f'_{name}_audios')
+            labels = getattr(self, f'_{name}_labels')
+            speakers = getattr(self, f'_{name}_speakers')
+
+            lengths = audio_utils.stacked_lengths([len(audio) for audio in audios], self.frame_stack)
+            fit = lengths >= np.asarray([text_utils.ctc_min_length(label) for label in labels], dtype=np.int64)
+
+            if np.all(fit):
+                continue
+
+            print(f'Dropped {len(fit) - np.count_nonzero(fit)} of {len(fit)} {name} utterances, '
+                  f'their labels are longer than the audio stacked by {self.frame_stack} frames.')
+
+            setattr(self, f'_{name}_audios', audios[fit])
+            setattr(self, f'_{name}_labels', labels[fit])
+            if speakers is not None:
+                setattr(self, f'_{name}_speakers', np.asarray(speakers)[fit])
+
+    def init_cmvn(self):
+        """
+        Loads the CMVN statistics saved with the trained model, when they were accumulated for the same
+        features, otherwise accumulates them over the training set and saves them.
+        """
+        params = params_digest(self.feature_params())
+
+        if self.cmvn_path is not None and os.path.isfile(self.cmvn_path):
+            cmvn = CMVN.load(self.cmvn_path)
+
+            changed = [name for name, same in (('feature_size', cmvn.feature_size == self.num_features),
+                                               ('feature parameters', cmvn.params == params),
+                                               ('cmvn_per_speaker', cmvn.per_speaker == self.cmvn_per_speaker))
+                       if not same]
+            if not changed:
+                self.cmvn = cmvn
+                print(f'Loaded CMVN statistics from {self.cmvn_path}.')
+                return
+
+            print(f'CMVN statistics {self.cmvn_path} were accumulated with different {", ".join(changed)}, '
+                  f'they are accumulated again.')
+
+        if 'train' not in self.sets:
+            raise ValueError(f'CMVN statistics are accumulated over the train set, which is not loaded, '
+                             f'set cmvn_path to the statistics saved with the model')
+
+        self.cmvn = CMVN(self.num_features, per_speaker=self.cmvn_per_speaker, params=params)
+
+        if self.mode == 'stream':
+            utterances = ((audio, speaker) for audio, _, speaker in self.iter_utterances('train'))
+        else:
+            speakers = self._train_speakers if self._train_speakers is not None else [None] * len(self._train_audios)
+            utterances = zip(self._train_audios, speakers)
+
+        for audio, speaker in utterances:
+            self.cmvn.update(feature_quantization.dequantize(audio), speaker)
+
+        print(f'Accumulated CMVN statistics of {self.cmvn.count()} frames, {len(self.cmvn.stats) - 1} speakers.')
+
+        if self.cmvn_path is not None:
+            self.cmvn.save(self.cmvn_path)
+
+    def split_dataset(self, audios, labels, speakers=None):
+        """
+        Splits the dataset to train and test set, see split.
+        The engines split the audio filenames before the feature extraction.
+
+        :param list audios: dataset audio filenames (or audios of the random split)
+        :param list labels: labels as transcription of audios
+        :param list speakers: speakers of the audios, None when they are not known
+        """
+        audios = to_object_array(audios)
+        labels = to_object_array(labels)
+
+        options = self.manifest_options
+
+        if options.split == 'hash':
+            is_test = hash_split(audios, options, speakers)
+
+            self._train_audios, self._test_audios = audios[~is_test], audios[is_test]
+            self._train_labels, self._test_labels = labels[~is_test], labels[is_test]
+
+            if speakers is not None:
+                speakers = to_object_array(speakers)
+                self._train_speakers, self._test_speakers = speakers[~is_test], speakers[is_test]
+
+            print(f'Divided dataset by hash of the {"speakers" if options.split_by_speaker else "utterances"} to '
+                  f'{len(self._train_audios)} of training data and {len(self._test_audios)} of testing data.')
+            return
+
+        # preshuffle dataset (the main shuffle will be performed in tf.dataset)
+        self.shuffle(audios, labels, seed=42)
+
+        # split dataset to train and test
+        from sklearn.model_selection import train_test_split
+
+        if speakers is None:
+            train_x, test_x, train_y, test_y = train_test_split(audios, labels, test_size=options.test_ratio,
+                                                                random_state=42)
+        else:
+            train_x, test_x, train_y, test_y, train_s, test_s = train_test_split(
+                audios, labels, to_object_array(speakers), test_size=options.test_ratio, random_state=42)
+            self._train_speakers = train_s
+            self._test_speakers = test_s
+
+        self._train_audios = train_x
+        self._train_labels = train_y
+        self._test_audios = test_x
+        self._test_labels = test_y
+
+        print(f'Divided dataset to {len(self._train_audios)} of training data and {len(self._test_audios)} of testing data.')
+
+    def feature_params(self):
+        """
+        Parameters of the feature extraction, every change of them changes the extracted features.
+        It's used as part of the feature cache key.
+
+        :return: dict of feature parameters
+        """
+        return dict(self.extraction_options(), sample_rate=audio_utils.SAMPLE_RATE, numcep=self.num_features,
+                    storage_dtype=self.store_options.dtype)
+
+    def store_params(self):
+        """
+        Parameters of the features kept in the feature store, the store is built again when they change.
+        The corpus digest of the manifest is among them, so the store is built again when the corpus grows.
+        :return: dict of feature, corpus and split parameters
+        """
+        return dict(self.feature_params(), **self.corpus_params(), **self.manifest_options.split_params(),
+                    corpus=self._corpus)
+
+    def corpus_params(self):
+        """
+        Parameters which choose the utterances of the dataset, engines override it.
+        :return: dict of corpus parameters
+        """
+        return {}
+
+    def extraction_options(self):
+        """
+        Keyword options of audio_utils.audiofiles_to_input_vectors.
+
+        :return: dict of extraction options
+        """
+        return {
+            'engine': self.feature_engine,
+            'loader': self.audio_loader,
+            'resample_quality': self.resample_quality,
+            'feature_type': self.feature_type,
+            'deltas': self.feature_deltas,
+            'vad_threshold': self.vad_threshold,
+            'vad_padding': self.vad_padding,
+            # CMVN is applied to the raw features in the batch assembly
+            'normalization': 'frame' if self.normalization == 'frame' else 'none',
+        }
+
+    def extract_features(self, audio_filenames, desc='Extracting features'):
+        """
+        Extracts speech features from the audio files.
+        The features are served from the feature cache when possible and the new ones are stored to it.
+        With more than one worker the missing features are computed in a process pool.
+        The features are kept in the storage dtype, they are dequantized to float32 in the batch assembly.
+
+        :param list audio_filenames: paths to the audio files
+        :param str desc: description of the progress bar
+        :return: list of features in the same order as audio_filenames
+        """
+        params = self.feature_params()
+
+        audios = [None] * len(audio_filenames)
+
+        if self.feature_cache is not None:
+            for i, audio_filename in enumerate(audio_filenames):
+                audios[i] = self.feature_cache.get(audio_filename, params)
+
+        missing = [i for i, audio_features in enumerate(audios) if audio_features is None]
+        missing_filenames = [audio_filenames[i] for i in missing]
+
+        start_time = time.perf_counter()
+
+        if self.num_workers > 1 and len(missing_filenames) > 1:
+            missing_audios, num_frames = self._extract_features_parallel(missing_filenames, desc)
+        else:
+            missing_audios, num_frames = self._extract_features_serial(missing_filenames, desc)
+
+        elapsed_time = time.perf_counter() - start_time
+
+        stored_audios = [feature_quantization.quantize(audio_features, self.store_options.dtype)
+                         for audio_features in missing_audios]
+
+        for i, audio_features in zip(missing, stored_audios):
+            audios[i] = audio_features
+
+            if self.feature_cache is not None:
+                self.feature_cache.put(audio_filenames[i], params, audio_features)
+
+        if missing_audios and self.vad_threshold is not None:
+            vad_report(num_frames, [len(audio_features) for audio_features in missing_audios], audio_utils.FRAME_STEP)
+
+        if missing_audios and self.store_options.dtype != 'float32':
+            feature_quantization.quantization_report(missing_audios, stored_audios)
+
+        if missing_audios and elapsed_time > 0:
+            # duration of the audio is approximated by the number of feature frames
+            audio_seconds = sum(len(audio_features) for audio_features in missing_audios) * audio_utils.FRAME_STEP
+            print(f'Extracted features of {len(missing_audios)} files in {elapsed_time:.1f}s '
+                  f'({len(missing_audios) / elapsed_time:.1f} files/s, {audio_seconds / elapsed_time:.1f} audio-seconds/s).')
+
+        if self.feature_cache is not None:
+            print(f'Feature cache: {self.feature_cache.hits} hits, {self.feature_cache.misses} misses, '
+                  f'{self.feature_cache.size() / 2**20:.1f} MB used.')
+
+        return audios
+
+    def _extract_features_serial(self, audio_filenames, desc):
+        """
+        Extracts speech features in the main process, chunk by chunk so the numpy engine can batch them.
+
+        :param list audio_filenames: paths to the audio files
+        :param str desc: description of the progress bar
+        :return: tuple of list of features in the same order as audio_filenames and their untrimmed number of frames
+        """
+        chunk_size = self.chunk_size or 32
+
+        audios = []
+        num_frames = []
+        with tqdm(total=len(audio_filenames), desc=desc) as t_files:
+            for i in range(0, len(audio_filenames), chunk_size):
+                chunk = audio_filenames[i:i + chunk_size]
+
+                chunk_audios, chunk_frames = audio_utils.audiofiles_to_input_vectors(
+                    chunk, self.num_features, self.num_context, return_num_frames=True, **self.extraction_options())
+                audios.extend(chunk_audios)
+                num_frames.extend(chunk_frames)
+                t_files.update(len(chunk))
+
+        return audios, num_frames
+
+    def _extract_features_parallel(self, audio_filenames, desc):
+        """
+        Extracts speech features in process pool of num_workers.
+        The files are submitted in chunks and the results are put back in the submission order.
+
+        :param list audio_filenames: paths to the audio files
+        :param str desc: description of the progress bar
+        :return: tuple of list of features in the same order as audio_filenames and their untrimmed number of frames
+        """
+        chunk_size = self.chunk_size or max(1, min(64, math.ceil(len(audio_filenames) / (self.num_workers * 4))))
+
+        chunks = [audio_filenames[i:i + chunk_size] for i in range(0, len(audio_filenames), chunk_size)]
+        chunk_audios = [None] * len(chunks)
+
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            futures = {
+                executor.submit(audio_utils.audiofiles_to_input_vectors, chunk, self.num_features, self.num_context,
+                                return_num_frames=True, **self.extraction_options()): i
+                for i, chunk in enumerate(chunks)
+            }
+
+            with tqdm(total=len(audio_filenames), desc=desc) as t_files:
+                for future in as_completed(futures):
+                    i = futures[future]
+                    chunk_audios[i] = future.result()
+                    t_files.update(len(chunks[i]))
+
+        audios = [audio_features for audios, _ in chunk_audios for audio_features in audios]
+        num_frames = [frames for _, chunk_frames in chunk_audios for frames in chunk_frames]
+
+        return audios, num_frames
+
+    def train_dataset(self, sort_by_length=False, context=True):
         """
         Returns the train targets for the model in wanted format.
 
+        :param bool sort_by_length: order the utterances from the shortest to the longest (SortaGrad curriculum)
+        :param bool context: stack the context windows when use_context is set, False leaves them to the batches
         :return: tuple of (x, sparse_label, x_length)
         """
-        return self.transform_to_speech_targets(self._train_audios, self._train_labels)
+        audios, labels, speakers = self._train_audios, self._train_labels, self._train_speakers
+
+        if sort_by_length:
+            order = self.length_order(audios)
+            audios, labels = audios[order], labels[order]
+            speakers = speakers[order] if speakers is not None else None
 
-    def test_dataset(self):
+        return self.transform_to_speech_targets(audios, labels, speakers, context=context)
+
+    def test_dataset(self, context=True):
         """
         Returns the train targets for the model in wanted format.
 
+        :param bool context: stack the context windows when use_context is set, False leaves them to the batches
         :return: tuple of (x, sparse_label, x_length)
         """
-        return self.transform_to_speech_targets(self._test_audios, self._test_labels)
+        return self.transform_to_speech_targets(self._test_audios, self._test_labels, self._test_speakers,
+                                                context=context)
 
-    def transform_to_speech_targets(self, audios, labels):
+    def transform_to_speech_targets(self, audios, labels, speakers=None, context=True):
         """
         Transorms the two inputs to training model acceptable forms.
         For labels it create sparse matrix and pads the audio sequence to same length.
+        With CMVN normalization the padded audios are normalized in place.
 
         :param np.ndarray audios: dataset audios
         :param np.ndarray labels: labels as transcription of audios
+        :param np.ndarray speakers: speakers of the audios for per speaker CMVN
+        :param bool context: stack the context windows when use_context is set, the windowed set is
+                             2 * num_context + 1 times larger, TensorIterator stacks them per batch instead
         :return: tuple of (x, sparse_label, x_length)
         """
         if not isinstance(labels, np.ndarray):
@@ -65,10 +756,47 @@ class DatasetBase(object):
         y_sparse = text_utils.sparse_tuple_from(labels)
 
         # pad audio batch
-        x, x_length = audio_utils.pad_sequences(audios)
+        x, x_length = audio_utils.pad_sequences(audios, multiple=self.frame_stack)
+
+        if self.cmvn is not None:
+            self.cmvn.normalize_batch(x, x_length, speakers)
+
+        x, x_length = audio_utils.stack_frames(x, x_length, self.frame_stack)
+
+        if self.use_context and context:
+            x = audio_utils.context_windows(x, self.num_context)
 
         return x, y_sparse, x_length
 
+    def input_size(self):
+        """
+        Size of the input vectors of the model, the feature size multiplied by the stacked and context frames.
+
+        :return: int
+        """
+        if self.use_context:
+            return self.stacked_size() * (2 * self.num_context + 1)
+
+        return self.stacked_size()
+
+    def stacked_size(self):
+        """
+        Size of the frame vectors after the frame stacking, before the context windows are stacked.
+
+        :return: int
+        """
+        return self.num_features * self.frame_stack
+
+    def length_order(self, audios):
+        """
+        Order of the audios by the number of audio frames.
+        The sort is stable, so utterances of the same length keep their order.
+
+        :param np.ndarray audios: dataset audios
+        :return: ndarray of indices
+        """
+        return np.argsort([len(audio) for audio in audios], kind='stable')
+
     def shuffle(self, x, y, seed):
         """
         Shuffles the x and y in same order.
@@ -101,14 +829,19 @@ class DatasetBase(object):
         audio_filenames_batch = []
         label_filenames_batch = []
 
+        if self._labels_csr is None:
+            self._labels_csr = text_utils.labels_to_csr(self._labels)
+
         if self._index_in_epoch > self._num_examples:
             # count finished epoches
             self._epochs_completed += 1
 
-            # perfrom shuffle
-            files = list(zip(self._audios, self._labels))
-            random.shuffle(files)
-            self._audios, self._labels= zip(*files)
+            # perfrom shuffle, the labels are gathered in the CSR format at once
+            order = list(range(len(self._labels)))
+            random.shuffle(order)
+            self._audios = to_object_array(self._audios)[order]
+            self._labels = to_object_array(self._labels)[order]
+            self._labels_csr = text_utils.csr_take(*self._labels_csr, order)
 
             # start next epoch
             start = 0
@@ -118,13 +851,19 @@ class DatasetBase(object):
         end = self._index_in_epoch
 
         audios_batch = self._audios[start:end]
-        labels_batch = self._labels[start:end]
 
-        output_target = np.asarray(labels_batch)
-        sparse_targets = text_utils.sparse_tuple_from(output_target)
+        sparse_targets = text_utils.sparse_tuple_from_csr(*text_utils.csr_slice(*self._labels_csr, start, end))
 
         # pad audio batch
-        train_input, train_length = audio_utils.pad_sequences(audios_batch)
+        train_input, train_length = self.batch_assembler.pad(audios_batch, multiple=self.frame_stack)
+
+        if self.cmvn is not None:
+            self.cmvn.normalize_batch(train_input, train_length)
+
+        train_input, train_length = audio_utils.stack_frames(train_input, train_length, self.frame_stack)
+
+        if self.use_context:
+            train_input = audio_utils.context_windows(train_input, self.num_context)
 
         return train_input, sparse_targets, train_length
 
@@ -158,24 +897,26 @@ class DatasetBase(object):
 
         end = self._index_in_epoch
 
-        audios = []
-        labels = []
-
         print("Preprocessing audio files for batch of size", batch_size)
 
-        for audio_filename, label_filename in tqdm(zip(self._audio_filenames[start:end], self._label_filenames[start:end]), total=(end - start)):
-            audio_features = audio_utils.audiofile_to_input_vector(audio_filename, self.num_features, self.num_context)
-
-            text_target = text_utils.get_refactored_transcript(label_filename, is_filename=True, is_digit=False)
+        audios = self.extract_features(self._audio_filenames[start:end])
 
-            audios.append(audio_features)
-            labels.append(text_target)
+        labels = text_utils.split_labels(*text_utils.encode_transcripts(
+            [text_utils.read_txt(label_filename) for label_filename in self._label_filenames[start:end]]))
 
-        output_target = np.asarray(labels)
+        output_target = to_object_array(labels)
         sparse_targets = text_utils.sparse_tuple_from(output_target)
 
         # pad audio batch
-        train_input, train_length = audio_utils.pad_sequences(audios)
+        train_input, train_length = self.batch_assembler.pad(audios, multiple=self.frame_stack)
+
+        if self.cmvn is not None:
+            self.cmvn.normalize_batch(train_input, train_length)
+
+        train_input, train_length = audio_utils.stack_frames(train_input, train_length, self.frame_stack)
+
+        if self.use_context:
+            train_input = audio_utils.context_windows(train_input, self.num_context)
 
         return train_input, sparse_targets, train_length
 
@@ -191,6 +932,8 @@ class DatasetBase(object):
         with open(name_dataset + '_labeles', 'rb') as f:
             self._labels = pickle.load(f)
 
+        self._labels_csr = None
+
     def save_pickle_dataset(self, name_dataset):
         """
         Save to pickle file variables for audio and it's label transcription.
@@ -204,5 +947,3 @@ class DatasetBase(object):
         with open(name_dataset + '_labeles', 'wb') as f:
             pickle.dump(self.labels, f)
 
-
-
@@ -1,9 +1,8 @@
 import os
 import numpy as np
-from tqdm import trange
-from sklearn.model_selection import train_test_split
 from speechrecognition.dataset.dataset_base import DatasetBase
-from speechrecognition.utils import audio_utils, text_utils
+from speechrecognition.dataset.manifest import Manifest, scan_files
+from speechrecognition.utils import text_utils
 
 
 class DigitDataset(DatasetBase):
@@ -12,14 +11,15 @@ class DigitDataset(DatasetBase):
     Digit dataset from download: https://github.com/Jakobovski/free-spoken-digit-dataset
     """
 
-    def __init__(self, dataset_path, num_features, num_context):
+    def __init__(self, dataset_path, num_features, num_context, **kwargs):
         """
         Initializer of DigitDataset object
         :param str dataset_path: path to digit dataset locally
         :param int num_features: size of feature vector
-        :param num_context: NOT USED...
+        :param int num_context: number of past and future context frames stacked to every frame
+        :param kwargs: feature extraction options of DatasetBase
         """
-        DatasetBase.__init__(self, num_features, num_context)
+        DatasetBase.__init__(self, num_features, num_context, **kwargs)
 
         self.dataset_path = dataset_path
 
@@ -28,7 +28,7 @@ class DigitDataset(DatasetBase):
         self._test_audios = []
         self._test_labels = []
 
-        self.read_digit_dataset(dataset_path)
+        self.init_dataset(self.read_digit_dataset, dataset_path)
 
 
     def read_digit_dataset(self, dataset_path=None):
@@ -37,49 +37,53 @@ class DigitDataset(DatasetBase):
         :param str dataset_path: path to digit dataset locally
         """
 
-        dataset_path = dataset_path or self.dataset_path
-
-        print(f'Preparing Digit Dataset from path {dataset_path}')
-
-        audios = []
-        labels = []
+        # the split is decided before the feature extraction, only the features of the wanted sets are extracted
+        self.read_sets(dataset_path, desc='Preprocessing Digit Dataset')
 
-        t_digits = trange(10, desc='Preprocessing Digit Dataset')
-        for i in t_digits:
-            dir = os.path.join(dataset_path, str(i))
+        print(f'Loaded {len(self._train_audios) + len(self._test_audios)} digit records.')
 
-            filenames = os.listdir(dir)
-
-            for filename in filenames:
-                if 'wav' in filename:
-                    wav_path = os.path.join(dir, filename)
+    def read_manifest(self, dataset_path=None):
+        """
+        Reads the filenames in dataset folder with their encoded digit labels and speakers from the manifest,
+        only the digit directories which changed since the last start are scanned.
+        :param str dataset_path: path to digit dataset locally
+        :return: tuple of (audio filenames, labels, speakers, durations in seconds)
+        """
 
-                    t_digits.set_postfix(file=f'{wav_path}')
+        dataset_path = dataset_path or self.dataset_path
 
-                    audio_features = audio_utils.audiofile_to_input_vector(wav_path, 13, 4)
+        print(f'Preparing Digit Dataset from path {dataset_path}')
 
-                    text_target = text_utils.get_refactored_transcript(i, is_filename=False)
+        manifest = Manifest(dataset_path, self.manifest_options.path)
 
-                    audios.append(audio_features)
-                    labels.append(text_target)
+        def scan_digit(group, previous):
+            text = text_utils.text_number(int(group))
 
+            return [manifest.scan_utterance(entry, self.get_speaker(entry.path), lambda: text, previous)
+                    for entry in scan_files(os.path.join(dataset_path, group), lambda filename: 'wav' in filename)]
 
-        print(f'Loaded {len(audios)} digit records.')
+        utterances = manifest.update({str(i): [str(i)] for i in range(10)}, scan_digit)
 
-        audios = np.asarray(audios)
-        labels = np.asarray(labels)
+        labels = text_utils.split_labels(*text_utils.encode_transcripts(
+            [utterance.transcript for utterance in utterances]))
 
-        # preshuffle dataset (the main shuffle will be performed in tf.dataset)
-        self.shuffle(audios, labels, seed=42)
+        return manifest.filenames(utterances), labels, [utterance.speaker for utterance in utterances], \
+            [utterance.duration for utterance in utterances]
 
-        # split dataset to train and test
-        train_x, test_x, train_y, test_y = train_test_split(audios, labels, test_size=0.3, random_state=42)
-        self._train_audios = train_x
-        self._train_labels = train_y
-        self._test_audios = test_x
-        self._test_labels = test_y
+    def corpus_params(self):
+        """
+        Digit utterances are chosen by the dataset path only.
+        :return: dict of corpus parameters
+        """
+        return {'dataset_path': os.path.abspath(self.dataset_path)}
 
-        print(f'Divided dataset to {len(self._train_audios)} of training data and {len(self._test_audios)} of testing data.')
+    def get_speaker(self, audio_filename):
+        """
+        Speaker of the audio file, the digit files are named {digit}_{speaker}_{index}.wav
+        :param str audio_filename: path to the audio file
+        :return: speaker name
+        """
+        return os.path.basename(audio_filename).split('_')[1]
 
 
 def test_dataset():
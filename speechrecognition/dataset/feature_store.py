@@ -0,0 +1,345 @@
+import os
+import json
+import numpy as np
+from tqdm import tqdm
+from collections import namedtuple
+from speechrecognition.utils.feature_quantization import STORAGE_DTYPES, QuantizedFeatures, quantize
+
+# the sets of the split dataset, every set has its own store in the subdirectory of the store path
+SPLIT_MODES = ('train', 'test')
+
+
+class StoreOptions(namedtuple('StoreOptions', ['path', 'dtype'])):
+    """
+    Options of the feature storage of the dataset engine.
+    path is the directory of the train and test FeatureStore, None disables the store, dtype is the dtype
+    the features are kept in memory, in the feature cache and in the store.
+    """
+
+    def __new__(cls, path=None, dtype='float32'):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f'Storage dtype "{dtype}" not understood, choose one of {STORAGE_DTYPES}')
+
+        return super().__new__(cls, path, dtype)
+
+
+class FeatureStore(object):
+    """
+    Read-only store of extracted features and labels opened via np.memmap.
+    All the feature matrices are kept in one contiguous float32 arena file with index of offsets and lengths,
+    the labels are kept in CSR format (values and offsets).
+    The arena can be also float16 or int8 with one scale per utterance, see feature_quantization.
+    Utterances are returned as views into the memory mapped files, so opening the store is instant,
+    nothing is copied and the pages are shared between processes reading the same store.
+
+    Files in the store directory:
+        meta.json          - dtype, feature size, counts and parameters the features were extracted with
+        features.bin       - arena of shape (num_frames, feature_size)
+        index.npy          - int64 array of shape (num_utterances, 2) with frame offset and length
+        label_values.npy   - int8 (see text_utils.encode_transcripts) or int32 array of all the labels concatenated
+        label_offsets.npy  - int64 array of shape (num_utterances + 1,)
+        scales.npy         - float32 array of utterance scales, only for int8 arena
+        speakers.npy       - string array of utterance speakers, only when the speakers are known
+    """
+
+    META_FILENAME = 'meta.json'
+    FEATURES_FILENAME = 'features.bin'
+    INDEX_FILENAME = 'index.npy'
+    LABEL_VALUES_FILENAME = 'label_values.npy'
+    LABEL_OFFSETS_FILENAME = 'label_offsets.npy'
+    SCALES_FILENAME = 'scales.npy'
+    SPEAKERS_FILENAME = 'speakers.npy'
+
+    def __init__(self, store_path):
+        """
+        Initializer of FeatureStore object, opens the store files.
+
+        :param str store_path: directory of the store
+        """
+        self.store_path = store_path
+
+        self.meta = self.read_meta(store_path)
+
+        self.feature_size = self.meta['feature_size']
+        num_frames = self.meta['num_frames']
+
+        if num_frames > 0:
+            self.arena = np.memmap(os.path.join(store_path, self.FEATURES_FILENAME), dtype=self.meta['dtype'],
+                                   mode='r', shape=(num_frames, self.feature_size))
+        else:
+            self.arena = np.zeros((0, self.feature_size), dtype=self.meta['dtype'])
+
+        self.index = np.load(os.path.join(store_path, self.INDEX_FILENAME), mmap_mode='r')
+        self.label_values = np.load(os.path.join(store_path, self.LABEL_VALUES_FILENAME), mmap_mode='r')
+        self.label_offsets = np.load(os.path.join(store_path, self.LABEL_OFFSETS_FILENAME), mmap_mode='r')
+
+        self.scales = None
+        if self.meta['dtype'] == 'int8':
+            self.scales = np.load(os.path.join(store_path, self.SCALES_FILENAME))
+
+        speakers_path = os.path.join(store_path, self.SPEAKERS_FILENAME)
+        self.speakers = np.load(speakers_path) if os.path.isfile(speakers_path) else None
+
+    @classmethod
+    def exists(cls, store_path):
+        """
+        Checks whether complete store is in the directory, the meta file is written as the last one.
+        :param str store_path: directory of the store
+        :return: bool
+        """
+        return os.path.isfile(os.path.join(store_path, cls.META_FILENAME))
+
+    @classmethod
+    def read_meta(cls, store_path):
+        """
+        Reads the meta of the store without opening the other files.
+        :param str store_path: directory of the store
+        :return: dict with dtype, feature_size, num_frames, num_utterances and params
+        """
+        with open(os.path.join(store_path, cls.META_FILENAME)) as f:
+            return json.load(f)
+
+    @classmethod
+    def write(cls, store_path, audios, labels, dtype=np.float32, speakers=None, params=None):
+        """
+        Writes the features and labels to new store.
+        :param str store_path: directory of the store
+        :param audios: sequence of feature matrices of shape (num_frames, feature_size)
+        :param labels: sequence of label arrays
+        :param dtype: dtype of the features in the arena, one of feature_quantization.STORAGE_DTYPES
+        :param speakers: sequence of speakers of the utterances, None if they are not known
+        :param dict params: JSON serializable parameters the features were extracted with, kept in the meta
+        :return: opened FeatureStore
+        """
+        if speakers is None:
+            speakers = [None] * len(audios)
+
+        with FeatureStoreWriter(store_path, dtype=dtype, params=params) as writer:
+            for audio, label, speaker in zip(audios, labels, speakers):
+                writer.append(audio, label, speaker)
+
+        return cls(store_path)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """
+        Features of the i-th utterance as view into the arena, QuantizedFeatures for int8 arena.
+        """
+        offset, length = self.index[i]
+
+        if self.scales is not None:
+            return QuantizedFeatures(self.arena[offset:offset + length], self.scales[i])
+
+        return self.arena[offset:offset + length]
+
+    def label(self, i):
+        """
+        Label of the i-th utterance as view into the label values.
+        """
+        return self.label_values[self.label_offsets[i]:self.label_offsets[i + 1]]
+
+    def audios(self):
+        """
+        All the utterances as object array of views.
+        """
+        return to_object_array(self[i] for i in range(len(self)))
+
+    def labels(self):
+        """
+        All the labels as object array of views.
+        """
+        return to_object_array(self.label(i) for i in range(len(self)))
+
+
+class FeatureStoreWriter(object):
+    """
+    Appends utterances to new FeatureStore, the features are streamed straight to the arena file.
+    Use it as context manager, the store is complete after closing.
+    """
+
+    def __init__(self, store_path, dtype=np.float32, params=None):
+        """
+        Initializer of FeatureStoreWriter object
+
+        :param str store_path: directory of the store, it's created if it doesn't exist
+        :param dtype: dtype of the features in the arena, one of feature_quantization.STORAGE_DTYPES
+        :param dict params: JSON serializable parameters the features were extracted with, kept in the meta
+        """
+        self.store_path = store_path
+        self.dtype = np.dtype(dtype)
+        self.params = params
+
+        if self.dtype.name not in STORAGE_DTYPES:
+            raise ValueError(f'Feature store dtype "{self.dtype.name}" not understood, choose one of {STORAGE_DTYPES}')
+
+        os.makedirs(store_path, exist_ok=True)
+
+        # remove the meta first, so half written store is never considered complete
+        meta_path = os.path.join(store_path, FeatureStore.META_FILENAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        self._features_file = open(os.path.join(store_path, FeatureStore.FEATURES_FILENAME), 'wb')
+        self._feature_size = None
+        self._index = []
+        self._num_frames = 0
+        self._label_values = []
+        self._label_offsets = [0]
+        self._scales = []
+        self._speakers = []
+
+    def append(self, features, label, speaker=None):
+        """
+        Appends one utterance to the store.
+        :param features: feature matrix of shape (num_frames, feature_size), ndarray or QuantizedFeatures
+        :param label: label array
+        :param str speaker: speaker of the utterance
+        """
+        features = quantize(features, self.dtype.name)
+
+        if isinstance(features, QuantizedFeatures):
+            self._scales.append(features.scale)
+            features = features.values
+
+        features = np.ascontiguousarray(features)
+
+        if self._feature_size is None:
+            self._feature_size = features.shape[1]
+        elif features.shape[1] != self._feature_size:
+            raise ValueError(f'Feature size {features.shape[1]} differs from feature size of the store {self._feature_size}')
+
+        self._features_file.write(features.tobytes())
+
+        self._index.append((self._num_frames, len(features)))
+        self._num_frames += len(features)
+
+        # int8 labels of the batch encoder are stored as they are
+        label = np.asarray(label)
+        if label.dtype.kind not in 'iu':
+            label = label.astype(np.int32)
+        self._label_values.append(label)
+        self._label_offsets.append(self._label_offsets[-1] + len(label))
+
+        self._speakers.append(speaker)
+
+    def close(self):
+        """
+        Writes the index, labels and meta of the store.
+        """
+        self._features_file.close()
+
+        np.save(os.path.join(self.store_path, FeatureStore.INDEX_FILENAME),
+                np.asarray(self._index, dtype=np.int64).reshape(-1, 2))
+        np.save(os.path.join(self.store_path, FeatureStore.LABEL_VALUES_FILENAME),
+                np.concatenate(self._label_values) if self._label_values else np.zeros(0, dtype=np.int32))
+        np.save(os.path.join(self.store_path, FeatureStore.LABEL_OFFSETS_FILENAME),
+                np.asarray(self._label_offsets, dtype=np.int64))
+
+        if self.dtype.name == 'int8':
+            np.save(os.path.join(self.store_path, FeatureStore.SCALES_FILENAME),
+                    np.asarray(self._scales, dtype=np.float32))
+
+        speakers_path = os.path.join(self.store_path, FeatureStore.SPEAKERS_FILENAME)
+        if self._speakers and all(speaker is not None for speaker in self._speakers):
+            np.save(speakers_path, np.asarray(self._speakers, dtype=str))
+        elif os.path.exists(speakers_path):
+            os.remove(speakers_path)
+
+        meta = {
+            'dtype': self.dtype.name,
+            'feature_size': self._feature_size or 0,
+            'num_frames': self._num_frames,
+            'num_utterances': len(self._index),
+            'params': self.params,
+        }
+        with open(os.path.join(self.store_path, FeatureStore.META_FILENAME), 'w') as f:
+            json.dump(meta, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._features_file.close()
+
+
+def to_object_array(items):
+    """
+    Creates 1D object array of the items without merging them to one multidimensional array.
+    np.asarray would copy equally shaped matrices to 3D array (or fail on ragged ones).
+    :param items: iterable of arrays
+    :return: object ndarray
+    """
+    items = list(items)
+
+    array = np.empty(len(items), dtype=object)
+    for i, item in enumerate(items):
+        array[i] = item
+
+    return array
+
+
+def split_store_matches(store_path, params, feature_size):
+    """
+    Checks that both the train and test store are complete and were written with the params,
+    a store of other features, corpus or split would be silently trained on.
+    :param str store_path: directory of the train and test store
+    :param dict params: current parameters of the stored features, see DatasetBase.store_params
+    :param int feature_size: current feature size
+    :return: bool, False when the store has to be (re)built
+    """
+    # the parameters are compared the way they are read back from the meta
+    params = json.loads(json.dumps(params))
+
+    for mode in SPLIT_MODES:
+        mode_path = os.path.join(store_path, mode)
+        if not FeatureStore.exists(mode_path):
+            return False
+
+        meta = FeatureStore.read_meta(mode_path)
+        stored_params = meta.get('params') or {}
+        if stored_params != params or meta['feature_size'] not in (0, feature_size):
+            changed = sorted(key for key in set(params) | set(stored_params)
+                             if params.get(key) != stored_params.get(key))
+            if changed == ['corpus']:
+                stored_size = (stored_params.get('corpus') or {}).get('num_utterances')
+                print(f'Feature store {store_path} was written from other utterances of the corpus '
+                      f'({stored_size} utterances, {params["corpus"]["num_utterances"]} now), it is built again.')
+            else:
+                print(f'Feature store {store_path} was written with different parameters '
+                      f'({", ".join(changed) or "feature_size"}), it is built again.')
+            return False
+
+    return True
+
+
+def open_split_store(store_path):
+    """
+    Opens the train and test store.
+    :param str store_path: directory of the train and test store
+    :return: tuple of (train FeatureStore, test FeatureStore)
+    """
+    return tuple(FeatureStore(os.path.join(store_path, mode)) for mode in SPLIT_MODES)
+
+
+def write_split_store(store_path, sets, dtype=np.float32, params=None):
+    """
+    Writes the train and test store utterance by utterance, the utterances may be streamed
+    from the audio files, at most one of them has to be in memory.
+    :param str store_path: directory of the train and test store
+    :param dict sets: mode -> tuple of (iterable of (features, label, speaker), number of utterances)
+    :param dtype: dtype of the features in the arena, one of feature_quantization.STORAGE_DTYPES
+    :param dict params: JSON serializable parameters the features were extracted with, kept in the meta
+    """
+    for mode in SPLIT_MODES:
+        utterances, total = sets[mode]
+
+        with FeatureStoreWriter(os.path.join(store_path, mode), dtype=dtype, params=params) as writer:
+            for features, label, speaker in tqdm(utterances, total=total, desc=f'Writing {mode} feature store'):
+                writer.append(features, label, speaker)
+
+    print(f'Saved dataset to feature store {store_path}.')
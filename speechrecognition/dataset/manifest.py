@@ -0,0 +1,281 @@
+import os
+import json
+import hashlib
+import numpy as np
+from collections import namedtuple
+
+from speechrecognition.utils import text_utils, wav_utils
+
+# one utterance of the corpus, the audio path is relative to the dataset path, size and mtime are of the audio file,
+# transcript_stamp is [size, mtime] of the transcript file or None when the transcript isn't read from a file
+Utterance = namedtuple('Utterance', ['audio_path', 'transcript', 'duration', 'speaker', 'size', 'mtime',
+                                     'transcript_stamp'])
+
+# 'random' splits by seeded shuffle of the whole corpus, 'hash' assigns every utterance (or speaker)
+# by a stable hash of its id, so the split doesn't change as the corpus grows
+SPLITS = ('random', 'hash')
+
+
+class ManifestOptions(namedtuple('ManifestOptions', ['path', 'split', 'test_ratio', 'split_by_speaker'])):
+    """
+    Options of the corpus manifest and of its split to the train and test set.
+    path is the cached Manifest file (None scans the corpus on every start), split is one of SPLITS,
+    test_ratio is the ratio of the test set and split_by_speaker hashes the speakers instead of the utterances,
+    so the sets have no common speaker.
+    """
+
+    def __new__(cls, path=None, split='random', test_ratio=0.3, split_by_speaker=False):
+        if split not in SPLITS:
+            raise ValueError(f'Split "{split}" not understood, choose one of {SPLITS}')
+        if split_by_speaker and split != 'hash':
+            raise ValueError('Speaker disjoint split needs the hash split')
+        if not 0. < test_ratio < 1.:
+            raise ValueError(f'Test ratio has to be between 0 and 1, got {test_ratio}')
+
+        return super().__new__(cls, path, split, test_ratio, split_by_speaker)
+
+    def split_params(self):
+        """
+        Parameters of the split, the feature store keeps them with the features.
+        :return: dict of split parameters
+        """
+        return {'split': self.split, 'test_ratio': self.test_ratio, 'split_by_speaker': self.split_by_speaker}
+
+
+class Manifest(object):
+    """
+    Manifest of the corpus utterances with their normalized transcripts, durations and speakers.
+    The utterances are kept in groups (speaker directories of VCTK, digit directories of the digit dataset),
+    every group is stamped by the modification times of its directories. Adding, removing or renaming a file
+    changes the stamp, so on the next start only the changed groups are rescanned and all the others are
+    served from the manifest file without listing their directories or opening their files.
+    Within a rescanned group the unchanged files (same size and mtime of the audio and transcript file)
+    keep their rows.
+
+    The manifest file is JSON:
+        {"version": 2, "groups": {group: {"stamp": [mtime_ns, ...], "utterances": [[audio_path, ...], ...]}}}
+    Edits of a file content which keep the directory stamps aren't noticed, delete the manifest file to rebuild it.
+    """
+
+    VERSION = 2
+
+    def __init__(self, dataset_path, manifest_path=None):
+        """
+        Initializer of Manifest object, loads the manifest file if there is one.
+
+        :param str dataset_path: path to the corpus, the audio paths are relative to it
+        :param str manifest_path: path to the manifest file, None keeps the manifest only in memory
+        """
+        self.dataset_path = dataset_path
+        self.manifest_path = manifest_path
+
+        # group -> dict(stamp=list of directory mtimes, utterances=list of Utterance)
+        self.groups = {}
+
+        if manifest_path is not None and os.path.isfile(manifest_path):
+            self.load(manifest_path)
+
+    def load(self, manifest_path):
+        """
+        Loads the groups of the manifest file, the file of other version is ignored and rebuilt.
+        :param str manifest_path: path to the manifest file
+        """
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        if manifest.get('version') != self.VERSION:
+            return
+
+        self.groups = {
+            group: {'stamp': entry['stamp'], 'utterances': [Utterance(*row) for row in entry['utterances']]}
+            for group, entry in manifest['groups'].items()
+        }
+
+    def save(self, manifest_path):
+        """
+        Saves the manifest atomically, the old manifest is replaced only by the complete new one.
+        :param str manifest_path: path to the manifest file
+        """
+        os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+
+        manifest = {
+            'version': self.VERSION,
+            'groups': {group: {'stamp': entry['stamp'], 'utterances': [list(row) for row in entry['utterances']]}
+                       for group, entry in self.groups.items()},
+        }
+
+        temp_path = manifest_path + '.part'
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+
+    def stamp(self, directories):
+        """
+        Modification times of the directories, None for the missing ones.
+        :param list directories: directories relative to the dataset path
+        :return: list of mtimes in ns
+        """
+        stamp = []
+        for directory in directories:
+            try:
+                stamp.append(os.stat(os.path.join(self.dataset_path, directory)).st_mtime_ns)
+            except FileNotFoundError:
+                stamp.append(None)
+
+        return stamp
+
+    def update(self, groups, scan_group):
+        """
+        Brings the groups up to date and returns their utterances.
+        The groups whose stamps changed are rescanned by the engine function, the manifest file is saved
+        when any of them changed. The groups which are not asked for are kept as they are.
+
+        :param dict groups: ordered dict of group -> list of directories (relative to the dataset path) of the group
+        :param function scan_group: engine function (group, dict of audio path -> previous Utterance) -> list of Utterance
+        :return: list of Utterance of the groups in the order of the groups
+        """
+        changed = 0
+
+        for group, directories in groups.items():
+            stamp = self.stamp(directories)
+
+            entry = self.groups.get(group)
+            if entry is not None and entry['stamp'] == stamp:
+                continue
+
+            previous = {utterance.audio_path: utterance for utterance in entry['utterances']} if entry else {}
+
+            self.groups[group] = {'stamp': stamp, 'utterances': scan_group(group, previous)}
+            changed += 1
+
+        if changed:
+            print(f'Scanned {changed} of {len(groups)} groups of the manifest.')
+
+            if self.manifest_path is not None:
+                self.save(self.manifest_path)
+
+        return [utterance for group in groups for utterance in self.groups[group]['utterances']]
+
+    def scan_utterance(self, entry, speaker, read_transcript, previous=None, transcript_path=None):
+        """
+        Creates the manifest row of the audio file, the row of unchanged file is reused.
+        The transcript is read again when its file changed, the duration when the audio file changed.
+        :param os.DirEntry entry: scandir entry of the audio file
+        :param str speaker: speaker of the utterance
+        :param function read_transcript: function returning the raw transcript, called only for new or changed file
+        :param dict previous: audio path -> Utterance of the previous scan of the group
+        :param str transcript_path: path to the transcript file, None when the transcript isn't read from a file
+        :return: Utterance
+        """
+        stat = entry.stat()
+        audio_path = os.path.relpath(entry.path, self.dataset_path)
+
+        transcript_stamp = None
+        if transcript_path is not None:
+            transcript_stat = os.stat(transcript_path)
+            transcript_stamp = [transcript_stat.st_size, transcript_stat.st_mtime_ns]
+
+        utterance = (previous or {}).get(audio_path)
+        audio_changed = utterance is None or utterance.size != stat.st_size or utterance.mtime != stat.st_mtime_ns
+
+        if not audio_changed and utterance.transcript_stamp == transcript_stamp:
+            return utterance
+
+        duration = wav_utils.wav_duration(entry.path) if audio_changed else utterance.duration
+
+        return Utterance(audio_path, text_utils.normalize_transcript(read_transcript()), duration, speaker,
+                         stat.st_size, stat.st_mtime_ns, transcript_stamp)
+
+    def filenames(self, utterances):
+        """
+        Absolute paths of the audio files of the utterances.
+        :param list utterances: list of Utterance
+        :return: list of paths
+        """
+        return [os.path.join(self.dataset_path, utterance.audio_path) for utterance in utterances]
+
+
+def corpus_digest(audio_filenames, labels, durations=None):
+    """
+    Digest of the utterances read from the manifest, it changes whenever an utterance is added, removed,
+    its transcript is corrected or its audio file is replaced by one of other duration.
+    :param list audio_filenames: paths to the audio files
+    :param list labels: encoded transcripts of the audio files
+    :param list durations: durations of the audio files in seconds, None when they are not known
+    :return: dict with num_utterances and sha1 digest
+    """
+    if durations is None:
+        durations = [None] * len(audio_filenames)
+
+    sha1 = hashlib.sha1()
+    for audio_filename, label, duration in sorted(zip(audio_filenames, labels, durations), key=lambda row: row[0]):
+        sha1.update(f'{audio_filename}\0{duration}\0'.encode('utf-8'))
+        sha1.update(np.asarray(label).tobytes())
+
+    return {'num_utterances': len(audio_filenames), 'digest': sha1.hexdigest()}
+
+
+def hash_split(audio_filenames, options, speakers=None):
+    """
+    Assigns the utterances to the test set by a stable hash of the utterance id (the audio filename
+    without the directory and extension) or of the speaker id. The assignment of an utterance
+    depends only on its id, so the split is the same on every machine and the new utterances
+    don't move the old ones between the sets.
+
+    :param audio_filenames: paths to the audio files
+    :param ManifestOptions options: test ratio and whether the speakers are hashed
+    :param list speakers: speakers of the audios, needed for the speaker disjoint split
+    :exception ValueError: it's raised when the speaker disjoint split has no speakers
+    :return: bool ndarray, True for the test utterances
+    """
+    if options.split_by_speaker:
+        if speakers is None:
+            raise ValueError('The speakers are not known, the split can\'t be speaker disjoint')
+        keys = [str(speaker) for speaker in speakers]
+    else:
+        keys = [os.path.splitext(os.path.basename(audio_filename))[0] for audio_filename in audio_filenames]
+
+    fractions = {key: hash_fraction(key) for key in set(keys)}
+
+    return np.asarray([fractions[key] < options.test_ratio for key in keys], dtype=bool)
+
+
+def hash_fraction(key):
+    """
+    Stable hash of the key mapped uniformly to [0, 1), unlike hash() it's the same in every process.
+    :param str key: utterance or speaker id
+    :return: float
+    """
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big') / 2 ** 64
+
+
+def scan_files(directory, predicate=None):
+    """
+    Lists the files of the directory by one os.scandir call sorted by name, hidden files are skipped.
+    :param str directory: path to the directory
+    :param function predicate: filter of the filenames, None keeps all the files
+    :return: list of os.DirEntry
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    with os.scandir(directory) as entries:
+        files = [entry for entry in entries if not entry.name.startswith('.') and entry.is_file()
+                 and (predicate is None or predicate(entry.name))]
+
+    return sorted(files, key=lambda entry: entry.name)
+
+
+def scan_dirs(directory):
+    """
+    Lists the subdirectories of the directory by one os.scandir call sorted by name, hidden ones are skipped.
+    :param str directory: path to the directory
+    :return: list of os.DirEntry
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    with os.scandir(directory) as entries:
+        dirs = [entry for entry in entries if not entry.name.startswith('.') and entry.is_dir()]
+
+    return sorted(dirs, key=lambda entry: entry.name)
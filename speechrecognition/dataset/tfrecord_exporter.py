@@ -0,0 +1,200 @@
+import os
+import json
+import time
+from tqdm import tqdm
+
+# the exported sets, every set is sharded to its own files
+EXPORT_MODES = ('train', 'test')
+
+# the train set sorted by length for the SortaGrad epochs, it's exported only on demand
+SORTED_MODE = 'train_sorted'
+
+META_FILENAME = 'meta.json'
+
+
+def export_tfrecords(dataset_engine, export_path, num_shards=8, sorted_train=False):
+    """
+    Exports the preprocessed utterances of the dataset engine to sharded TFRecord files,
+    which are read by the parallel interleave pipeline of TensorIterator.
+    The utterances are streamed by stream_dataset one at a time, so the exported corpus is never in memory.
+    They are normalized and frame stacked, the context windows are stacked only to the batches of the reader
+    (see tensor_iterator.context_windows), so the files are not 2 * num_context + 1 times larger. The train utterances are shuffled
+    and distributed to the shards round robin, all the shards have nearly the same size.
+    The length sorted train set is distributed round robin too, so reading its shards round robin
+    in a fixed order yields the utterances from the shortest to the longest.
+    Every shard is written to temporary file and renamed when it's complete, the meta file is written as the last one.
+    The meta keeps the export_params of the engine, an export of other features, normalization, CMVN statistics,
+    frame stacking or split is exported again (see tfrecords_match).
+
+    :param DatasetBase dataset_engine: dataset engine of the exported utterances
+    :param str export_path: directory of the TFRecord files
+    :param int num_shards: number of files of every set
+    :param bool sorted_train: export also the length sorted train set (SORTED_MODE) for the SortaGrad epochs
+    :return: dict of number of exported utterances of every set
+    """
+    import tensorflow as tf
+
+    if num_shards < 1:
+        raise ValueError(f'Number of shards has to be positive, got {num_shards}')
+
+    os.makedirs(export_path, exist_ok=True)
+
+    # remove the meta first, so half written export is never considered complete
+    meta_path = os.path.join(export_path, META_FILENAME)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    feature_size = dataset_engine.stacked_size()
+    counts = {}
+
+    start_time = time.perf_counter()
+
+    for mode in EXPORT_MODES + ((SORTED_MODE,) if sorted_train else ()):
+        filenames = shard_filenames(export_path, mode, num_shards)
+        writers = [tf.io.TFRecordWriter(filename + '.part') for filename in filenames]
+
+        source_mode = 'train' if mode == SORTED_MODE else mode
+
+        count = 0
+        try:
+            utterances = dataset_engine.stream_dataset(source_mode, shuffle=mode == 'train',
+                                                       sort_by_length=mode == SORTED_MODE, context=False)
+            for features, label in tqdm(utterances, total=dataset_engine.num_utterances(source_mode),
+                                        desc=f'Exporting {mode} TFRecords'):
+                writers[count % num_shards].write(serialize_example(features, label))
+                count += 1
+        finally:
+            for writer in writers:
+                writer.close()
+
+        for filename in filenames:
+            os.replace(filename + '.part', filename)
+
+        counts[mode] = count
+
+    meta = {
+        'feature_size': feature_size,
+        'num_shards': num_shards,
+        'counts': counts,
+        'sorted': sorted_train,
+        'params': export_params(dataset_engine),
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    elapsed_time = time.perf_counter() - start_time
+
+    print(f'Exported {counts["train"]} of training and {counts["test"]} of testing utterances '
+          f'to {num_shards} shards per set in {elapsed_time:.1f}s to {export_path}.')
+
+    return counts
+
+
+def serialize_example(features, label):
+    """
+    Serializes one utterance to tf.train.Example, the features are raw float32 bytes.
+    :param np.ndarray features: float32 ndarray of shape (num_frames, feature_size)
+    :param np.ndarray label: label array
+    :return: serialized example
+    """
+    import tensorflow as tf
+
+    return tf.train.Example(features=tf.train.Features(feature={
+        'features': tf.train.Feature(bytes_list=tf.train.BytesList(value=[features.astype('<f4', copy=False).tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=label.tolist())),
+    })).SerializeToString()
+
+
+def parse_example(serialized, feature_size):
+    """
+    Parses one serialized utterance, it's used as tf.data map function.
+
+    :param tf.Tensor serialized: scalar string tensor
+    :param int feature_size: size of the exported feature vector
+    :return: tuple of (float32 features of shape (num_frames, feature_size), int32 label)
+    """
+    import tensorflow as tf
+
+    example = tf.io.parse_single_example(serialized, {
+        'features': tf.io.FixedLenFeature([], tf.string),
+        'label': tf.io.VarLenFeature(tf.int64),
+    })
+
+    features = tf.reshape(tf.io.decode_raw(example['features'], tf.float32), [-1, feature_size])
+    label = tf.cast(tf.sparse_tensor_to_dense(example['label']), tf.int32)
+
+    return features, label
+
+
+def shard_filenames(export_path, mode, num_shards):
+    """
+    Paths to the shards of the set.
+    :param str export_path: directory of the TFRecord files
+    :param str mode: 'train', 'test' or SORTED_MODE
+    :param int num_shards: number of files of the set
+    :return: list of paths
+    """
+    return [os.path.join(export_path, f'{mode}-{i:05d}-of-{num_shards:05d}.tfrecord') for i in range(num_shards)]
+
+
+def tfrecords_exist(export_path):
+    """
+    Checks whether complete export is in the directory, the meta file is written as the last one.
+    :param str export_path: directory of the TFRecord files
+    :return: bool
+    """
+    return os.path.isfile(os.path.join(export_path, META_FILENAME))
+
+
+def tfrecords_match(export_path, dataset_engine):
+    """
+    Checks whether complete export of the same preprocessing as of the dataset engine is in the directory.
+    :param str export_path: directory of the TFRecord files
+    :param DatasetBase dataset_engine: dataset engine of the exported utterances
+    :return: bool, False when the dataset has to be exported (again)
+    """
+    if not tfrecords_exist(export_path):
+        return False
+
+    meta = read_meta(export_path)
+
+    # the parameters are compared the way they are read back from the meta
+    params = json.loads(json.dumps(export_params(dataset_engine)))
+
+    if meta.get('params') != params or meta['feature_size'] != dataset_engine.stacked_size():
+        print(f'TFRecords in {export_path} were exported with different parameters, they are exported again.')
+        return False
+
+    return True
+
+
+def export_params(dataset_engine):
+    """
+    Parameters of the utterances yielded by stream_dataset without the context windows, it's the feature store
+    parameters of the engine with the normalization and frame stacking of the batch assembly.
+    The TFRecord export is written again when they change.
+    :param DatasetBase dataset_engine: dataset engine of the exported utterances
+    :return: dict of export parameters
+    """
+    cmvn = dataset_engine.cmvn
+
+    return dict(dataset_engine.store_params(), normalization=dataset_engine.normalization,
+                frame_stack=dataset_engine.frame_stack, cmvn=cmvn.digest() if cmvn is not None else None)
+
+
+def read_meta(export_path, feature_size=None):
+    """
+    Reads the meta of the export and checks it fits the features of the model.
+    :param str export_path: directory of the TFRecord files
+    :param int feature_size: expected size of the exported feature vector, None skips the check
+    :exception ValueError: it's raised when the export has different feature size
+    :return: dict with feature_size, num_shards, counts, sorted and params
+    """
+    with open(os.path.join(export_path, META_FILENAME)) as f:
+        meta = json.load(f)
+
+    if feature_size is not None and meta['feature_size'] != feature_size:
+        raise ValueError(f'TFRecords in {export_path} have feature size {meta["feature_size"]}, '
+                         f'the model expects {feature_size}, remove them to export them again')
+
+    return meta
@@ -1,9 +1,8 @@
 import os
 import numpy as np
-from tqdm import tqdm
-from sklearn.model_selection import train_test_split
 from speechrecognition.dataset.dataset_base import DatasetBase
-from speechrecognition.utils import audio_utils, text_utils
+from speechrecognition.dataset.manifest import Manifest, scan_dirs, scan_files
+from speechrecognition.utils import text_utils
 
 
 class VCTKDataset(DatasetBase):
@@ -13,25 +12,28 @@ class VCTKDataset(DatasetBase):
     """
 
 
-    def __init__(self, dataset_path, num_speakers, num_features, num_context):
+    def __init__(self, dataset_path, num_speakers, num_features, num_context, audio_dir='wav48', **kwargs):
         """
         Initializer of VCTKDataset object
         :param str dataset_path: path to digit dataset locally
         :param int num_features: size of feature vector
         :param int num_speakers: number of speakers to be retrived
-        :param num_context: NOT USED...
+        :param int num_context: number of past and future context frames stacked to every frame
+        :param str audio_dir: directory of the audios in the dataset, 'wav48' or the converted mirror (see corpus_converter)
+        :param kwargs: feature extraction options of DatasetBase
         """
-        DatasetBase.__init__(self, num_features, num_context)
+        DatasetBase.__init__(self, num_features, num_context, **kwargs)
 
         self.dataset_path = dataset_path
         self.num_speakers = num_speakers
+        self.audio_dir = audio_dir
 
         self._train_audios = []
         self._train_labels = []
         self._test_audios = []
         self._test_labels = []
 
-        self.read_dataset(dataset_path, num_speakers)
+        self.init_dataset(self.read_dataset, dataset_path, num_speakers)
 
     def read_dataset(self, dataset_path=None, num_speakers=None):
         """
@@ -41,93 +43,124 @@ class VCTKDataset(DatasetBase):
         :param int num_speakers: number of speakers to be retrived
         """
 
+        # the split is decided before the feature extraction, only the features of the wanted sets are extracted
+        self.read_sets(dataset_path, num_speakers, desc='Preprocessing VCTK Dataset')
+
+    def read_manifest(self, dataset_path=None, num_speakers=None):
+        """
+        Reads the audio filenames, encoded transcripts and speakers of VCTK dataset from the manifest,
+        only the speakers whose directories changed since the last start are scanned.
+        :param str dataset_path: path to digit dataset locally
+        :param int num_speakers: number of speakers to be retrived
+        :return: tuple of (audio filenames, labels, speakers, durations in seconds)
+        """
+
         dataset_path = dataset_path or self.dataset_path
         num_speakers = num_speakers or self.num_speakers
 
-        audio_filenames, label_filenames = self.get_dataset_filenames(dataset_path, num_speakers)
-
-        audios = []
-        labels = []
-        num_examples = len(audio_filenames)
+        print("Retriving all filenames for VCTK training dataset from path", dataset_path)
 
-        t_files = tqdm(zip(audio_filenames, label_filenames), total=num_examples, desc='Preprocessing VCTK Dataset')
-        for audio_filename, label_filename in t_files:
+        manifest = Manifest(dataset_path, self.manifest_options.path)
 
-            # Progress bar info
-            t_audio_file = '/'.join(audio_filename.split('/')[-4:])
-            t_label_file = '/'.join(label_filename.split('/')[-4:])
-            t_files.set_postfix(audio_file=f'{t_audio_file}', label_file=f'{t_label_file }')
+        # the group of the speaker includes the audio directory, the converted mirror has its own paths
+        groups = {
+            f'{self.audio_dir}/{speaker}': [os.path.join(self.audio_dir, speaker), os.path.join('txt', speaker)]
+            for speaker in self.get_speakers(dataset_path, num_speakers)
+        }
 
-            audio_features = audio_utils.audiofile_to_input_vector(audio_filename, self.num_features, self.num_context)
-            text_target = text_utils.get_refactored_transcript(label_filename, is_filename=True, is_digit=False)
+        def scan_speaker(group, previous):
+            speaker = group.split('/')[-1]
 
-            audios.append(audio_features)
-            labels.append(text_target)
+            return [manifest.scan_utterance(audio_entry, speaker, lambda: text_utils.read_txt(label_filename), previous,
+                                            transcript_path=label_filename)
+                    for audio_entry, label_filename in self.get_speaker_files(dataset_path, speaker)]
 
-        audios = np.asarray(audios)
-        labels = np.asarray(labels)
+        utterances = manifest.update(groups, scan_speaker)
 
-        # preshuffle dataset (the main shuffle will be performed in tf.dataset)
-        self.shuffle(audios, labels, seed=42)
+        # all the transcripts are encoded at once to int8 labels, the labels are views into one array
+        labels = text_utils.split_labels(*text_utils.encode_transcripts(
+            [utterance.transcript for utterance in utterances]))
 
-        # split dataset to train and test
-        train_x, test_x, train_y, test_y = train_test_split(audios, labels, test_size=0.3, random_state=42)
-        self._train_audios = train_x
-        self._train_labels = train_y
-        self._test_audios = test_x
-        self._test_labels = test_y
+        return manifest.filenames(utterances), labels, [utterance.speaker for utterance in utterances], \
+            [utterance.duration for utterance in utterances]
 
-        print(f'Divided dataset to {len(self._train_audios)} of training data and {len(self._test_audios)} of testing data.')
+    def corpus_params(self):
+        """
+        VCTK utterances are chosen by the dataset path, the number of speakers and the audio directory.
+        :return: dict of corpus parameters
+        """
+        return {'dataset_path': os.path.abspath(self.dataset_path), 'num_speakers': self.num_speakers,
+                'audio_dir': self.audio_dir}
 
+    def get_speaker(self, audio_filename):
+        """
+        Speaker of the audio file, VCTK keeps the audios of every speaker in its own directory.
+        :param str audio_filename: path to the audio file
+        :return: speaker id
+        """
+        return os.path.basename(os.path.dirname(audio_filename))
 
-    def get_dataset_filenames(self, dataset_path=None, num_speakers=None):
+    def get_speakers(self, dataset_path=None, num_speakers=None):
         """
-        Function fetches all filenames for trainign and labels in VCTK dataset folder.
+        Sorted speakers which have both the audio and the transcript directory,
+        it lists the audio and transcript directories once.
         :param str dataset_path: path to digit dataset locally
-        :param int num_speakers: number of speakers to be retrived
+        :param int num_speakers: number of speakers to be retrived, None for all the speakers
+        :return: list of speaker ids
         """
 
         dataset_path = dataset_path or self.dataset_path
-        num_speakers = num_speakers or self.num_speakers
-
-        print("Retriving all filenames for VCTK training dataset from path", dataset_path)
 
-        audio_dataset_path = os.path.join(dataset_path, 'wav48')
-        label_dataset_path = os.path.join(dataset_path, 'txt')
+        audio_speakers = {entry.name for entry in scan_dirs(os.path.join(dataset_path, self.audio_dir))}
+        label_speakers = {entry.name for entry in scan_dirs(os.path.join(dataset_path, 'txt'))}
 
-        # gets list of directories for diffrent speakers
-        speakers_dirs = os.listdir(audio_dataset_path)
+        # ignore inconsistency in data or anything that is not directory
+        speakers = sorted(audio_speakers & label_speakers)
 
         if num_speakers is not None:
-            speakers_dirs = speakers_dirs[0:num_speakers]
+            speakers = speakers[0:num_speakers]
             print('Number of speakers: ', num_speakers)
         else:
             print('All speakers')
 
-        audio_filenames = []
-        label_filenames = []
+        return speakers
+
+    def get_speaker_files(self, dataset_path, speaker):
+        """
+        Audio files of the speaker paired with their transcript files by the filename,
+        the audios without transcript are skipped.
+        :param str dataset_path: path to digit dataset locally
+        :param str speaker: speaker id
+        :return: list of tuples (os.DirEntry of the audio file, path to the transcript file)
+        """
+        label_filenames = {os.path.splitext(entry.name)[0]: entry.path
+                           for entry in scan_files(os.path.join(dataset_path, 'txt', speaker))}
 
-        for speaker_dir in speakers_dirs:
-            # get full paths for speakers
-            speaker_audio_path = os.path.join(audio_dataset_path, speaker_dir)
-            speaker_label_path = os.path.join(label_dataset_path, speaker_dir)
+        audio_entries = scan_files(os.path.join(dataset_path, self.audio_dir, speaker))
+
+        return [(audio_entry, label_filenames[os.path.splitext(audio_entry.name)[0]]) for audio_entry in audio_entries
+                if os.path.splitext(audio_entry.name)[0] in label_filenames]
+
+    def get_dataset_filenames(self, dataset_path=None, num_speakers=None):
+        """
+        Function fetches all filenames for trainign and labels in VCTK dataset folder.
+        :param str dataset_path: path to digit dataset locally
+        :param int num_speakers: number of speakers to be retrived
+        :return: tuple of (audio filenames, label filenames) of the same length, paired by the filename
+        """
 
-            # ignore inconsistency in data or anything that is not directory
-            if not os.path.isdir(speaker_audio_path) or not os.path.isdir(speaker_label_path):
-                continue
+        dataset_path = dataset_path or self.dataset_path
+        num_speakers = num_speakers or self.num_speakers
 
-            # Getting full paths to all audios and labels of the speaker
-            audio_paths = [os.path.join(speaker_audio_path, speaker_filename) for speaker_filename in
-                           os.listdir(speaker_audio_path)]
-            label_paths = [os.path.join(speaker_label_path, speaker_filename) for speaker_filename in
-                           os.listdir(speaker_label_path)]
+        print("Retriving all filenames for VCTK training dataset from path", dataset_path)
 
-            audio_paths.sort()
-            label_paths.sort()
+        audio_filenames = []
+        label_filenames = []
 
-            # concatenate speaker filenames
-            audio_filenames = audio_filenames + audio_paths
-            label_filenames = label_filenames + label_paths
+        for speaker in self.get_speakers(dataset_path, num_speakers):
+            for audio_entry, label_filename in self.get_speaker_files(dataset_path, speaker):
+                audio_filenames.append(audio_entry.path)
+                label_filenames.append(label_filename)
 
         return audio_filenames, label_filenames
 
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import builtins
+import importlib.util
+
+# command line flag and environment variable which start the profiler before the CLI imports anything
+PROFILE_FLAG = '--profile-startup'
+PROFILE_ENV = 'SPEECH_PROFILE_STARTUP'
+
+# profiler started by start_from_argv
+_active_profiler = None
+
+
+class ImportProfiler(object):
+    """
+    Measures how long the imports of modules take while it's installed.
+    The time of a module includes the imports of its own dependencies,
+    only the outermost imports are reported, so the times add up to the total import time.
+    Relative imports are resolved to the absolute module names and every module is reported once,
+    when it's loaded for the first time.
+    """
+
+    def __init__(self):
+        """
+        Initializer of ImportProfiler object
+        """
+        self.timings = []
+
+        self._recorded = set()
+        self._depth = 0
+        self._original_import = None
+
+    def install(self):
+        """
+        Starts measuring the imports by wrapping builtins.__import__.
+        """
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+        return self
+
+    def uninstall(self):
+        """
+        Stops measuring the imports.
+        """
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+
+        new_modules = self._new_modules(name, globals, fromlist, level) if self._depth == 0 else []
+
+        # already imported modules cost nothing, the nested imports are part of the outer one
+        if not new_modules:
+            self._depth += 1
+            try:
+                return self._original_import(name, globals, locals, fromlist, level)
+            finally:
+                self._depth -= 1
+
+        start_time = time.perf_counter()
+        self._depth += 1
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+
+            loaded = [module_name for module_name in new_modules
+                      if module_name in sys.modules and module_name not in self._recorded]
+            if loaded:
+                self._recorded.update(loaded)
+                self.timings.append((loaded[0], time.perf_counter() - start_time))
+
+    def _new_modules(self, name, globals, fromlist, level):
+        """
+        Absolute names of the modules the import statement may load, which are not loaded yet.
+        The submodules of 'from package import submodule' are included.
+        :return: list of module names
+        """
+        module_name = self._resolve_name(name, globals, level)
+        if module_name is None:
+            return []
+
+        candidates = [module_name] + [f'{module_name}.{item}' for item in fromlist or () if item != '*']
+
+        return [candidate for candidate in candidates if candidate not in sys.modules]
+
+    def _resolve_name(self, name, globals, level):
+        """
+        Absolute name of the imported module, the relative names are resolved against the importing package.
+        :return: module name, None when it can't be resolved (the import itself reports the error)
+        """
+        if level == 0:
+            return name
+
+        package = (globals or {}).get('__package__')
+        if not package:
+            return None
+
+        try:
+            return importlib.util.resolve_name('.' * level + name, package)
+        except (ImportError, ValueError):
+            return None
+
+    def total_time(self):
+        """
+        Total time spent in the measured imports in seconds.
+        """
+        return sum(elapsed for _, elapsed in self.timings)
+
+    def report(self, limit=15):
+        """
+        Prints the slowest imports.
+        :param int limit: number of reported modules
+        """
+        print(f'Startup imports took {self.total_time() * 1000:.0f} ms, the slowest ones:')
+
+        for name, elapsed in sorted(self.timings, key=lambda timing: -timing[1])[:limit]:
+            print(f'  {elapsed * 1000:8.1f} ms  {name}')
+
+
+def start_from_argv(argv=None, environ=None):
+    """
+    Starts the profiler when the command line has PROFILE_FLAG or PROFILE_ENV is set.
+    It's called at the top of the CLI module before any other import, so the startup imports are measured.
+    :param list argv: command line arguments, sys.argv by default
+    :param dict environ: environment variables, os.environ by default
+    :return: started ImportProfiler or None
+    """
+    global _active_profiler
+
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+
+    if _active_profiler is None and (PROFILE_FLAG in argv or environ.get(PROFILE_ENV)):
+        _active_profiler = ImportProfiler().install()
+
+    return _active_profiler
+
+
+def active_profiler():
+    """
+    Profiler started by start_from_argv, None if it wasn't started.
+    """
+    return _active_profiler
@@ -1,11 +1,28 @@
+# the profiler is started before the CLI imports anything, so all the startup imports are measured
+from speechrecognition.helper import import_profiler
+import_profiler.start_from_argv()
+
 import click
 from speechrecognition.config.config_reader import ConfigReader
-from speechrecognition.predicter.main_predict import main_predict
-from speechrecognition.trainer.main_train import main_train
+
+# the training and prediction modules import tensorflow, librosa and sklearn,
+# they are imported only in the commands, so the CLI starts fast
 
 @click.group()
+@click.option('--profile-startup', is_flag=True,
+              help=f'Report the slowest imports of the command (or set {import_profiler.PROFILE_ENV}=1).')
 @click.pass_context
-def speech(ctx):
+def speech(ctx, profile_startup):
+    profiler = import_profiler.active_profiler()
+
+    # the CLI invoked in process (e.g. by the tests) was imported before the flag was seen
+    if profile_startup and profiler is None:
+        profiler = import_profiler.ImportProfiler().install()
+
+    if profiler is not None:
+        ctx.call_on_close(profiler.report)
+        ctx.call_on_close(profiler.uninstall)
+
     if ctx.invoked_subcommand is None:
         click.echo('Missing speech subcommand! \n Choose train or predict command.')
     else:
@@ -14,6 +31,8 @@ def speech(ctx):
 @speech.command()
 @click.option('-c', '--config', 'config_path', type=click.Path(exists=True), required=True, help='Configuration file for model.')
 def train(config_path):
+    from speechrecognition.trainer.main_train import main_train
+
     config = ConfigReader(config_path)
 
     main_train(config)
@@ -21,14 +40,55 @@ def train(config_path):
 @speech.command()
 @click.option('-x', '--audio', type=click.Path(), required=True, help='Audio filename for speech prediction.')
 @click.option('-c', '--config', 'config_path', type=click.Path(exists=True), required=True, help='Configuration file for model.')
-def predict(audio, config_path):
+@click.option('--chunk-seconds', type=float, default=10., show_default=True,
+              help='Length of the audio chunks of the streamed feature extraction.')
+def predict(audio, config_path, chunk_seconds):
+    from speechrecognition.predicter.main_predict import main_predict
+
     config = ConfigReader(config_path)
 
     print(audio)
-    transcripted_text = main_predict(config, audio)
+    transcripted_text = main_predict(config, audio, chunk_seconds)
     print(transcripted_text)
 
 
+@speech.command()
+@click.option('-c', '--config', 'config_path', type=click.Path(exists=True), required=True, help='Configuration file for model.')
+@click.option('-o', '--output', 'target_dir', default='wav16', show_default=True,
+              help='Directory of the converted audios in the dataset path.')
+@click.option('-w', '--workers', 'num_workers', type=int, default=1, show_default=True, help='Number of processes.')
+def convert(config_path, target_dir, num_workers):
+    """
+    Converts the dataset audios once to 16 kHz mono 16-bit PCM mirror.
+    """
+    from speechrecognition.dataset.corpus_converter import convert_corpus
+
+    config = ConfigReader(config_path)
+
+    convert_corpus(config.dataset_path(), target_dir=target_dir, num_workers=num_workers,
+                   resample_quality=config.resample_quality())
+
+
+@speech.command()
+@click.option('-c', '--config', 'config_path', type=click.Path(exists=True), required=True, help='Configuration file for model.')
+@click.option('-s', '--shards', 'num_shards', type=int, default=None,
+              help='Number of TFRecord files per set, defaults to num_shards of the config.')
+def export(config_path, num_shards):
+    """
+    Exports the preprocessed dataset to sharded TFRecord files of the dataset tfrecords directory.
+    """
+    from speechrecognition.dataset.dataset import Dataset
+    from speechrecognition.dataset.tfrecord_exporter import export_tfrecords
+
+    config = ConfigReader(config_path)
+
+    if config.tfrecord_path() is None:
+        raise click.UsageError('Set tfrecords directory in the dataset section of the config.')
+
+    export_tfrecords(Dataset(config).dataset_engine, config.tfrecord_path(), num_shards or config.num_shards(),
+                     sorted_train=config.sortagrad_epochs() > 0)
+
+
 if __name__ == '__main__':
     speech()
 
@@ -18,7 +18,7 @@ class RNNModel(BaseModel):
         self.config = config
 
         # TODO: move to base_model
-        self.init_placeholders(self.config.feature_size())
+        self.init_placeholders(self.config.input_size())
 
     def x(self):
         """NOT USED"""
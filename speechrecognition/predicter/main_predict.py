@@ -1,13 +1,119 @@
+import os
+import numpy as np
+from speechrecognition.utils import audio_utils
+from speechrecognition.utils.cmvn import CMVN
+from speechrecognition.utils.feature_stream import stream_features, stream_num_frames
 
 
-def main_predict(config, x):
+def main_predict(config, x, chunk_seconds=10.):
     """
     Main function for running prediction process.
     The model is specified in config.
     :param ConfigReader config: config reader object
     :param x: wav file
+    :param float chunk_seconds: length of the audio chunks of the streamed feature extraction
     """
 
     # load the wav file
+    audio, audio_length = preprocess_audio(config, x, chunk_seconds)
+
     # init model
-    # run prediction
\ No newline at end of file
+    # run prediction
+
+
+def preprocess_audio(config, wav_filename, chunk_seconds=10.):
+    """
+    Extracts the features of the audio file the same way as the training dataset.
+    When the stream gives the same features as the training dataset (see streamable), the batch is allocated
+    from the WAV header and every block of stream_audio is written to it as it arrives, so long recordings
+    are never resampled and framed at once and no block is kept after it's written.
+    Otherwise the features of the whole file are extracted at once.
+    With CMVN normalization the features are normalized by the statistics saved with the trained model.
+    :param ConfigReader config: config reader object
+    :param str wav_filename: path to the audio file
+    :param float chunk_seconds: length of the audio chunks of the streamed feature extraction
+    :return: tuple of (batch of one utterance, its length)
+    """
+    num_frames = stream_num_frames(wav_filename, config.feature_size()) if streamable(config) else None
+
+    if num_frames is not None:
+        # padded to multiple of frame_stack the same way as by pad_sequences
+        padded_frames = -(-num_frames // config.frame_stack()) * config.frame_stack()
+        x = np.zeros((1, padded_frames, config.feature_size()), dtype=np.float32)
+
+        length = 0
+        for block in stream_audio(config, wav_filename, chunk_seconds):
+            x[0, length:length + len(block)] = block
+            length += len(block)
+
+        x_length = np.asarray([length], dtype=np.int64)
+    else:
+        features = audio_utils.audiofile_to_input_vector(
+            wav_filename, config.feature_size(), config.num_context(), engine=config.feature_engine(),
+            loader=config.audio_loader(), resample_quality=config.resample_quality(),
+            normalization='frame' if config.normalization() == 'frame' else 'none',
+            feature_type=config.feature_name(), deltas=config.feature_deltas(),
+            vad_threshold=config.vad_threshold(), vad_padding=config.vad_padding())
+
+        x, x_length = audio_utils.pad_sequences([features], multiple=config.frame_stack())
+
+        if config.normalization() == 'cmvn':
+            # the speaker is unknown, the global statistics are used
+            load_cmvn(config).normalize_batch(x, x_length)
+
+    x, x_length = audio_utils.stack_frames(x, x_length, config.frame_stack())
+
+    if config.use_context():
+        x = audio_utils.context_windows(x, config.num_context())
+
+    return x, x_length
+
+
+def stream_audio(config, wav_filename, chunk_seconds=10.):
+    """
+    Generator of the normalized feature blocks of the audio file, every block is yielded as soon as
+    its chunk of audio is read, see feature_stream.stream_features. It's used only when streamable(config).
+    :param ConfigReader config: config reader object
+    :param str wav_filename: path to the audio file
+    :param float chunk_seconds: length of the audio chunks
+    :return: generator of float32 ndarrays of shape (num_frames, feature_size)
+    """
+    cmvn = load_cmvn(config) if config.normalization() == 'cmvn' else None
+
+    for block in stream_features(wav_filename, config.feature_size(), chunk_seconds=chunk_seconds,
+                                 normalization='none' if cmvn is not None else config.stream_normalization(),
+                                 resample_quality=config.resample_quality()):
+        # the speaker is unknown, the global statistics are used
+        if cmvn is not None:
+            block = cmvn.normalize(block)
+
+        yield np.asarray(block, dtype=np.float32)
+
+
+def load_cmvn(config):
+    """
+    Loads the CMVN statistics saved with the trained model.
+    :param ConfigReader config: config reader object
+    :exception Exception: it's raised when the statistics are missing or of other feature size
+    :return: CMVN object
+    """
+    if not os.path.isfile(config.cmvn_path()):
+        raise Exception(f'Missing CMVN statistics {config.cmvn_path()} of the trained model.')
+
+    cmvn = CMVN.load(config.cmvn_path())
+    if cmvn.feature_size != config.feature_size():
+        raise Exception(f'CMVN statistics {config.cmvn_path()} have feature size {cmvn.feature_size}, '
+                        f'the config has {config.feature_size()}.')
+
+    return cmvn
+
+
+def streamable(config):
+    """
+    Checks whether feature_stream gives the features the model was trained on,
+    it computes the MFCC of the numpy engine from the audio read by the wav loader without deltas and VAD.
+    :param ConfigReader config: config reader object
+    :return: bool
+    """
+    return config.feature_engine() == 'numpy' and config.audio_loader() == 'wav' and \
+        config.feature_name() == 'mfcc' and config.feature_deltas() == 0 and config.vad_threshold() is None
@@ -40,6 +40,12 @@ class BaseTrain(object):
         self.train_handle = train_handle
         self.test_handle = test_handle
 
+        # SortaGrad curriculum, the first epochs iterate the train set sorted by length
+        self.shuffled_train_handle = train_handle
+        self.sorted_train_handle = None
+        if self.config.sortagrad_epochs() > 0:
+            _, self.sorted_train_handle = self.iterator.create_dataset_iterator(mode='train', sort_by_length=True)
+
         self.model.build_model(model_train_inputs)
 
         self.init = tf.group(tf.global_variables_initializer(), tf.local_variables_initializer())
@@ -55,6 +61,8 @@ class BaseTrain(object):
                            desc=f'Training {self.config.model_name()}')
         for cur_epoch in t_epoches:
 
+            self.train_handle = self.epoch_train_handle(cur_epoch)
+
             # run epoch training
             train_output = self.train_epoch(cur_epoch)
             # run model on test set
@@ -75,6 +83,17 @@ class BaseTrain(object):
         self.model.save(self.session, write_meta_graph=True)
 
 
+    def epoch_train_handle(self, cur_epoch):
+        """
+        Chooses the train iterator of the epoch, length sorted in the first sortagrad epochs and shuffled after.
+        :param int cur_epoch: index of current epoch
+        :return: string handle of the train iterator
+        """
+        if self.sorted_train_handle is not None and cur_epoch < self.config.sortagrad_epochs():
+            return self.sorted_train_handle
+
+        return self.shuffled_train_handle
+
     def train_epoch(self, cur_epoche):
         """
         Method to be overridden for training epoche.
@@ -0,0 +1,113 @@
+import tensorflow as tf
+
+
+class SpecAugment(object):
+    """
+    SpecAugment frequency and time masking of whole padded batches inside the tf.data pipeline.
+    All the masks of the batch are drawn at once and applied by one multiplication,
+    there is no per utterance Python code, so the augmentation runs in the tf.data threads.
+    Time masks are drawn only within the seq_length of every utterance, the padding stays untouched.
+    The masked values are set to zero, which is the mean of the normalized features.
+    """
+
+    def __init__(self, feature_size, freq_masks=2, freq_mask_width=4, time_masks=2, time_mask_width=20,
+                 time_mask_ratio=0.2, num_blocks=1):
+        """
+        Initializer of SpecAugment object
+        :param int feature_size: size of the feature vector of one frame (without the context frames)
+        :param int freq_masks: number of frequency masks of every utterance
+        :param int freq_mask_width: maximal width of the frequency mask in coefficients
+        :param int time_masks: number of time masks of every utterance
+        :param int time_mask_width: maximal width of the time mask in frames
+        :param float time_mask_ratio: maximal width of the time mask as ratio of the utterance length
+        :param int num_blocks: number of stacked context frames, the same coefficients are masked in all of them
+        """
+        self.feature_size = feature_size
+        self.freq_masks = freq_masks
+        self.freq_mask_width = freq_mask_width
+        self.time_masks = time_masks
+        self.time_mask_width = time_mask_width
+        self.time_mask_ratio = time_mask_ratio
+        self.num_blocks = num_blocks
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates SpecAugment of the hyperparameters in the config.
+        :param ConfigReader config: config reader object
+        :return: SpecAugment object
+        """
+        return cls(config.feature_size(),
+                   freq_masks=config.freq_masks(),
+                   freq_mask_width=config.freq_mask_width(),
+                   time_masks=config.time_masks(),
+                   time_mask_width=config.time_mask_width(),
+                   time_mask_ratio=config.time_mask_ratio(),
+                   num_blocks=config.input_size() // config.feature_size())
+
+    def __call__(self, input, sparse_label, seq_length):
+        """
+        Masks the batch, it's used as tf.data map function of the batched dataset.
+        :param tf.Tensor input: batch of padded audios of shape (batch_size, max_length, input_size)
+        :param tf.SparseTensor sparse_label: batch of labels
+        :param tf.Tensor seq_length: lengths of the audios
+        :return: tuple of masked batch
+        """
+        batch_size = tf.shape(input)[0]
+        max_length = tf.shape(input)[1]
+
+        keep = tf.ones_like(input[:, :, :1])
+
+        if self.freq_masks > 0 and self.freq_mask_width > 0:
+            freq_mask = random_masks(tf.fill([batch_size], self.feature_size), self.feature_size,
+                                     self.freq_masks, self.freq_mask_width)
+            freq_mask = tf.tile(freq_mask, [1, self.num_blocks])
+
+            keep = keep * (1. - tf.cast(freq_mask, input.dtype))[:, None, :]
+
+        if self.time_masks > 0 and self.time_mask_width > 0:
+            lengths = tf.cast(seq_length, tf.int32)
+
+            # short utterances get proportionally shorter masks
+            max_width = tf.minimum(self.time_mask_width,
+                                   tf.cast(tf.cast(lengths, tf.float32) * self.time_mask_ratio, tf.int32))
+
+            time_mask = random_masks(lengths, max_length, self.time_masks, max_width)
+
+            keep = keep * (1. - tf.cast(time_mask, input.dtype))[:, :, None]
+
+        return input * keep, sparse_label, seq_length
+
+
+def random_masks(limits, size, num_masks, max_width):
+    """
+    Draws num_masks random intervals of every batch item, the intervals lie within [0, limit) of the item.
+    :param tf.Tensor limits: int32 tensor of shape (batch_size,) with the valid length of every item
+    :param size: size of the masked axis, tensor or int
+    :param int num_masks: number of intervals of every item
+    :param max_width: maximal width of the interval, int or int32 tensor of shape (batch_size,)
+    :return: bool tensor of shape (batch_size, size), True where the value is masked
+    """
+    batch_size = tf.shape(limits)[0]
+
+    max_width = tf.minimum(tf.zeros([batch_size], tf.int32) + max_width, limits)
+
+    widths = uniform_int([batch_size, num_masks], max_width[:, None] + 1)
+    starts = uniform_int([batch_size, num_masks], limits[:, None] - widths + 1)
+
+    positions = tf.range(size)[None, None, :]
+    masked = tf.logical_and(positions >= starts[:, :, None], positions < (starts + widths)[:, :, None])
+
+    return tf.reduce_any(masked, axis=1)
+
+
+def uniform_int(shape, maxval):
+    """
+    Random integers uniform in [0, maxval) with different maxval of every element.
+    :param list shape: shape of the result
+    :param tf.Tensor maxval: int32 tensor broadcastable to the shape, at least 1
+    :return: int32 tensor
+    """
+    values = tf.random_uniform(shape) * tf.cast(maxval, tf.float32)
+
+    return tf.minimum(tf.cast(values, tf.int32), maxval - 1)
@@ -114,8 +114,8 @@ class SpeechTrainer(BaseTrain):
         """
         Decoded the transcript from ascii to string
         :param tuple(sparse) decode_sparse: decoded sparse
-        :return: decoded string
+        :return: list of decoded strings, one per utterance of the batch
         """
-        decoded_str = text_utils.index_to_text(decode_sparse[1])
+        decoded_str = text_utils.decode_sparse(decode_sparse)
 
         return decoded_str
\ No newline at end of file
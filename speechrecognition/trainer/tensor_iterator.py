@@ -1,4 +1,13 @@
+import os
+import numpy as np
 import tensorflow as tf
+from speechrecognition.trainer.spec_augment import SpecAugment
+from speechrecognition.dataset import tfrecord_exporter
+
+# dtype of the sequence lengths of every pipeline, the model is built on the outputs of the string handle
+# iterator and all the datasets switched by the handle (train, sorted train, test) have to produce the same types.
+# int32 is the dtype of tf.shape and of the SpecAugment masks, the model placeholders are not fed by the iterators.
+SEQ_LENGTH_DTYPE = tf.int32
 
 class TensorIterator(object):
     """
@@ -20,31 +29,228 @@ class TensorIterator(object):
 
         self.handle_placeholder = tf.placeholder(tf.string, shape=[])
 
-    def create_dataset_iterator(self, mode='train'):
+        # the context windows are stacked to the batches in the graph, the datasets have the stacked frame size
+        engine = dataset.dataset_engine
+        self.num_context = engine.num_context if engine.use_context else 0
+
+        self.spec_augment = SpecAugment.from_config(config) if config.spec_augment() else None
+
+        # padded sets of the memory mode fed to the graph, see memory_dataset
+        self._memory_datasets = {}
+
+    def create_dataset_iterator(self, mode='train', sort_by_length=False):
         """
         Create feedable Tensorflow Iterator from dataset
 
         :param str mode: training mode [test || train]
+        :param bool sort_by_length: iterate the train set from the shortest to the longest utterance without shuffling
+        :return: iterator inputs dict for the models inputs placeholders and string handler for switching between test and train set
+        """
+
+        if self.config.tfrecord_path() is not None:
+            return self.create_tfrecord_iterator(mode, sort_by_length)
+
+        engine = self.dataset.dataset_engine
+
+        if engine.mode == 'stream':
+            return self.create_stream_iterator(mode, sort_by_length)
+
+        return self.create_memory_iterator(mode, sort_by_length)
+
+    def create_memory_iterator(self, mode='train', sort_by_length=False):
+        """
+        Create feedable Tensorflow Iterator from the padded set of the memory mode.
+        The set is fed to the graph only once (see memory_dataset), the iterators batch the indices
+        of the utterances and gather the batches from it, so the shuffled and the length sorted
+        train iterator share one copy of the train set.
+
+        :param str mode: training mode [test || train]
+        :param bool sort_by_length: iterate the train set from the shortest to the longest utterance without shuffling
         :return: iterator inputs dict for the models inputs placeholders and string handler for switching between test and train set
         """
+        data, seq_lengths = self.memory_dataset(mode)
+
+        # length sorted batches keep their order, similar lengths in a batch means less padding
+        if sort_by_length:
+            dataset = tf.data.Dataset.from_tensor_slices(np.argsort(seq_lengths, kind='stable'))
+        else:
+            dataset = tf.data.Dataset.range(len(seq_lengths))
+
+            if mode == 'train':
+                dataset = dataset.shuffle(buffer_size=len(seq_lengths), seed=tf.set_random_seed(1234))
+
+        dataset = dataset.batch(self.config.batch_size()) \
+            .map(lambda indices: self.gather_batch(data, indices))
+
+        if self.num_context > 0:
+            dataset = dataset.map(self.stack_context)
+
+        # the masks are drawn per batch, so every epoch sees differently augmented utterances
+        if mode == 'train' and self.spec_augment is not None:
+            dataset = dataset.map(self.spec_augment)
+
+        dataset = dataset.repeat()
+
+        return self.feedable_iterator(dataset)
+
+    def memory_dataset(self, mode='train'):
+        """
+        Feeds the padded train or test set of the memory mode to graph variables, once per set.
+        The variables are in no collection, so the variable initializers of the trainer don't touch them
+        and the Saver doesn't write the dataset to the checkpoints. The set is not context windowed,
+        the windows would make it 2 * num_context + 1 times larger, they are stacked per batch.
+
+        :param str mode: training mode [test || train]
+        :return: tuple of (input, dense label padded by -1, seq_length) variables and ndarray of the sequence lengths
+        """
+        if mode in self._memory_datasets:
+            return self._memory_datasets[mode]
+
+        engine = self.dataset.dataset_engine
 
         if mode == 'train':
-            x, y_sparse, x_seq_length = self.dataset.dataset_engine.train_dataset()
+            x, y_sparse, x_seq_length = engine.train_dataset(context=False)
         else:
-            x, y_sparse, x_seq_length = self.dataset.dataset_engine.test_dataset()
+            x, y_sparse, x_seq_length = engine.test_dataset(context=False)
+
+        indices, values, shape = y_sparse
+        labels = np.full(shape, -1, dtype=np.int32)
+        labels[indices[:, 0], indices[:, 1]] = values
+
+        with tf.device('/cpu:0'):
+            placeholders = (tf.placeholder(tf.float32, [None, None, engine.stacked_size()]),
+                            tf.placeholder(tf.int32, [None, None]),
+                            tf.placeholder(SEQ_LENGTH_DTYPE, [None]))
+            data = tuple(tf.Variable(placeholder, trainable=False, collections=[], validate_shape=False)
+                         for placeholder in placeholders)
+
+        self.session.run([variable.initializer for variable in data],
+                         feed_dict=dict(zip(placeholders, (x, labels, x_seq_length))))
+
+        self._memory_datasets[mode] = data, x_seq_length
+
+        return self._memory_datasets[mode]
+
+    def create_stream_iterator(self, mode='train', sort_by_length=False):
+        """
+        Create feedable Tensorflow Iterator from the utterances streamed by the dataset engine (stream mode).
+        The generator yields one preprocessed utterance at a time, so only the shuffle buffer
+        and the prefetched batches are in memory. The train set is shuffled by the bounded shuffle buffer
+        of shuffle_buffer utterances on top of the shuffled order of every epoch.
+
+        :param str mode: training mode [test || train]
+        :param bool sort_by_length: iterate the train set from the shortest to the longest utterance without shuffling
+        :return: iterator inputs dict for the models inputs placeholders and string handler for switching between test and train set
+        """
+        engine = self.dataset.dataset_engine
+        shuffle = mode == 'train' and not sort_by_length
+
+        # every repetition calls the generator again, so every epoch is read in new order
+        def utterances():
+            return engine.stream_dataset(mode, shuffle=shuffle, sort_by_length=sort_by_length and mode == 'train',
+                                         context=False)
+
+        dataset = tf.data.Dataset.from_generator(
+            utterances, (tf.float32, tf.int32), (tf.TensorShape([None, engine.stacked_size()]), tf.TensorShape([None])))
+
+        if shuffle:
+            dataset = dataset.shuffle(buffer_size=self.config.shuffle_buffer())
+
+        dataset = self.batch_utterances(dataset, mode, engine.stacked_size()).prefetch(1)
+
+        return self.feedable_iterator(dataset)
 
-        dataset = tf.data.Dataset.from_tensor_slices(
-            (self.model.input_placeholder,
-             self.model.label_sparse_placeholder,
-             self.model.input_seq_len_placeholder)
-        )
+    def create_tfrecord_iterator(self, mode='train', sort_by_length=False):
+        """
+        Create feedable Tensorflow Iterator reading the sharded TFRecord export of the dataset,
+        the dataset is exported first if there is no export yet or it was exported with other parameters
+        (see tfrecord_exporter). The engine still loads the dataset in the memory mode,
+        only the stream mode keeps the corpus out of memory.
+        The shards are read by parallel interleave, the utterances are parsed in parallel
+        and the batches are prefetched, so the reading overlaps with the training and nothing is fed from Python.
+        The length sorted train set is read from its own export, its shards are interleaved round robin
+        in the order they were written, which is the length order.
+
+        :param str mode: training mode [test || train]
+        :param bool sort_by_length: iterate the train set from the shortest to the longest utterance without shuffling
+        :return: iterator inputs dict for the models inputs placeholders and string handler for switching between test and train set
+        """
+        engine = self.dataset.dataset_engine
+        export_path = self.config.tfrecord_path()
+        sorted_set = sort_by_length and mode == 'train'
+
+        # the sorted set is exported with the others when the SortaGrad curriculum is configured
+        if not tfrecord_exporter.tfrecords_match(export_path, engine) or \
+                (sorted_set and not tfrecord_exporter.read_meta(export_path).get('sorted')):
+            tfrecord_exporter.export_tfrecords(engine, export_path, self.config.num_shards(),
+                                               sorted_train=self.config.sortagrad_epochs() > 0 or sorted_set)
+
+        meta = tfrecord_exporter.read_meta(export_path, engine.stacked_size())
+        filenames = tfrecord_exporter.shard_filenames(
+            export_path, tfrecord_exporter.SORTED_MODE if sorted_set else mode, meta['num_shards'])
+
+        shuffle = mode == 'train' and not sorted_set
+
+        dataset = tf.data.Dataset.from_tensor_slices(filenames)
+
+        if shuffle:
+            dataset = dataset.shuffle(buffer_size=len(filenames))
+
+        # sloppy interleave takes the record of whichever shard is ready, the order is random anyway,
+        # the sorted shards are read all at once one record at a time in the written order
+        cycle_length = len(filenames) if sorted_set else min(len(filenames), os.cpu_count() or 1)
+        dataset = dataset.apply(tf.data.experimental.parallel_interleave(
+            tf.data.TFRecordDataset, cycle_length=cycle_length, block_length=1, sloppy=shuffle))
+
+        if shuffle:
+            dataset = dataset.shuffle(buffer_size=self.config.shuffle_buffer())
+
+        dataset = dataset.map(lambda serialized: tfrecord_exporter.parse_example(serialized, meta['feature_size']),
+                              num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+        dataset = self.batch_utterances(dataset, mode, meta['feature_size']) \
+            .prefetch(tf.data.experimental.AUTOTUNE)
+
+        return self.feedable_iterator(dataset)
+
+    def batch_utterances(self, dataset, mode, feature_size):
+        """
+        Batches the dataset of single utterances (features, label) to the padded batches of the model,
+        the context windows are stacked and the SpecAugment is applied to the train batches.
+        The batched dataset is repeated.
+
+        :param tf.data.Dataset dataset: dataset of float32 features and int32 labels
+        :param str mode: training mode [test || train]
+        :param int feature_size: size of the stacked frames of the utterances
+        :return: batched dataset of (input, sparse_label, seq_length)
+        """
+        # labels are padded by -1, which is not a valid label, and turned to sparse labels per batch
+        dataset = dataset.map(lambda input, label: (input, label, tf.shape(input, out_type=SEQ_LENGTH_DTYPE)[0])) \
+            .padded_batch(self.config.batch_size(),
+                          padded_shapes=([None, feature_size], [None], []),
+                          padding_values=(tf.constant(0., tf.float32), tf.constant(-1, tf.int32),
+                                          tf.constant(0, SEQ_LENGTH_DTYPE))) \
+            .map(self.sparse_labels)
+
+        if self.num_context > 0:
+            dataset = dataset.map(self.stack_context)
+
+        if mode == 'train' and self.spec_augment is not None:
+            dataset = dataset.map(self.spec_augment)
 
-        buffer_size = len(x) if mode == 'train' else 1
+        return dataset.repeat()
 
-        # TODO: find better buffer_size, know it loads whole dataste in memory?
-        dataset = dataset.shuffle(buffer_size=buffer_size, seed=tf.set_random_seed(1234)) \
-            .batch(self.config.batch_size()) \
-            .repeat()
+    def feedable_iterator(self, dataset, feed=None):
+        """
+        Creates and initializes iterator of the dataset, which is switched to by the string handle.
+        :param tf.data.Dataset dataset: batched dataset
+        :param dict feed: feed of the dataset placeholders, None for dataset without placeholders
+        :exception ValueError: it's raised when the dataset doesn't produce the sequence lengths of SEQ_LENGTH_DTYPE
+        :return: iterator inputs dict for the models inputs placeholders and string handle of the dataset iterator
+        """
+        if dataset.output_types[2] != SEQ_LENGTH_DTYPE:
+            raise ValueError(f'Dataset produces {dataset.output_types[2].name} sequence lengths, '
+                             f'all the iterators of the string handle have to produce {SEQ_LENGTH_DTYPE.name}')
 
         dataset_iterator = dataset.make_initializable_iterator()
 
@@ -62,12 +268,65 @@ class TensorIterator(object):
             'seq_length': seq_length
         }
 
-        # init datset iterator with the data
-        feed = {
-            self.model.input_placeholder: x,
-            self.model.label_sparse_placeholder: y_sparse,
-            self.model.input_seq_len_placeholder: x_seq_length,
-        }
         self.session.run(dataset_iterator.initializer, feed_dict=feed)
 
-        return inputs, dataset_handle
\ No newline at end of file
+        return inputs, dataset_handle
+
+    def sparse_labels(self, input, label, seq_length):
+        """
+        Converts the batch of dense labels padded by -1 to sparse labels of the model.
+        :param tf.Tensor input: batch of padded audios
+        :param tf.Tensor label: int32 batch of labels padded by -1
+        :param tf.Tensor seq_length: lengths of the audios
+        :return: tuple of batch with tf.SparseTensor labels
+        """
+        indices = tf.where(tf.not_equal(label, -1))
+        sparse_label = tf.SparseTensor(indices, tf.gather_nd(label, indices), tf.shape(label, out_type=tf.int64))
+
+        return input, sparse_label, seq_length
+
+    def gather_batch(self, data, indices):
+        """
+        Gathers the batch of the utterances from the padded set of the memory mode and cuts it
+        to its longest utterance and label, the set is padded to the longest ones of the whole set.
+        :param tuple data: (input, dense label, seq_length) variables of memory_dataset
+        :param tf.Tensor indices: int64 indices of the utterances of the batch
+        :return: tuple of (input, sparse_label, seq_length) batch
+        """
+        input, label, seq_length = (tf.gather(variable, indices) for variable in data)
+
+        # the variables have no static shape, they are fed once with the whole set
+        input.set_shape([None, None, self.dataset.dataset_engine.stacked_size()])
+        label.set_shape([None, None])
+        seq_length.set_shape([None])
+
+        input = input[:, :tf.reduce_max(seq_length)]
+        label = label[:, :tf.reduce_max(tf.reduce_sum(tf.cast(tf.not_equal(label, -1), tf.int32), axis=1))]
+
+        return self.sparse_labels(input, label, seq_length)
+
+    def stack_context(self, input, sparse_label, seq_length):
+        """
+        Stacks the context windows to the frames of the batch, see context_windows.
+        :param tf.Tensor input: batch of padded audios
+        :param tf.SparseTensor sparse_label: batch of labels
+        :param tf.Tensor seq_length: lengths of the audios
+        :return: tuple of batch with the context windowed audios
+        """
+        return context_windows(input, self.num_context), sparse_label, seq_length
+
+
+def context_windows(input, num_context):
+    """
+    Stacks every frame of the batch with num_context past and num_context future frames, [frame-k ... frame+k],
+    in the graph. The frames are padded with zeros on both ends the same way as audio_utils.context_windows,
+    only the batch is ever context windowed, so the windows don't multiply the size of the whole dataset.
+
+    :param tf.Tensor input: float32 batch of shape (batch_size, num_frames, feature_size)
+    :param int num_context: number of context frames on each side
+    :return: batch of shape (batch_size, num_frames, (2 * num_context + 1) * feature_size)
+    """
+    num_frames = tf.shape(input)[1]
+    padded = tf.pad(input, [[0, 0], [num_context, num_context], [0, 0]])
+
+    return tf.concat([padded[:, i:i + num_frames] for i in range(2 * num_context + 1)], axis=2)
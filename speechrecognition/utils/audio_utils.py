@@ -1,38 +1,228 @@
 import numpy as np
 import math
-import librosa
-import scipy.io.wavfile as wav
-import python_speech_features as sf
-from sklearn.preprocessing import scale
+from speechrecognition.utils import wav_utils
+from speechrecognition.utils.feature_engine import feature_engine_for, num_coefficients, append_deltas
+from speechrecognition.utils.feature_quantization import dequantize
+from speechrecognition.utils.vad import trim_silence, VAD_PADDING
+
+# sample rate all audio is resampled to before the feature extraction
+SAMPLE_RATE = 16000
+
+# step between two successive feature frames in seconds
+FRAME_STEP = 0.01
+
+# MFCC implementations, python_speech_features per file or vectorized FeatureEngine per batch of files
+FEATURE_ENGINES = ('psf', 'numpy')
+
+# audio loaders, librosa.load or direct memory mapped WAV reader with polyphase resampling
+AUDIO_LOADERS = ('librosa', 'wav')
+
+# normalization of the extracted features, every frame to zero mean and unit variance or none
+# (raw features are normalized later by corpus statistics, see cmvn)
+NORMALIZATIONS = ('frame', 'none')
+
+def load_signal(wav_filename, loader='librosa', resample_quality='medium'):
+    """
+    Loads the audio file as mono float signal resampled to SAMPLE_RATE.
+    :param str wav_filename: path to the audio file
+    :param str loader: audio loader, one of AUDIO_LOADERS
+    :param str resample_quality: resampling quality of the wav loader, one of wav_utils.RESAMPLE_QUALITY
+    :return: tuple of (signal, sample_rate)
+    """
+    if loader == 'librosa':
+        # librosa takes seconds to import, it's loaded only when it's used
+        import librosa
+        return librosa.load(wav_filename, sr=SAMPLE_RATE)
+    elif loader == 'wav':
+        return wav_utils.load_wav(wav_filename, sample_rate=SAMPLE_RATE, quality=resample_quality)
+
+    raise ValueError(f'Audio loader "{loader}" not understood, choose one of {AUDIO_LOADERS}')
 
 
 # TODO: refactoring to ctc format will be requierd (sparse_tuple)
-def audiofile_to_input_vector(wav_filename, numcep, numcontext):
+def audiofile_to_input_vector(wav_filename, numcep, numcontext, engine='psf', loader='librosa',
+                              resample_quality='medium', normalization='frame', feature_type='mfcc', deltas=0,
+                              vad_threshold=None, vad_padding=VAD_PADDING):
     """
     Returns audio and its transcripts. Audio is preprocessed by MFCC.
     :param wav_filename:
     :param int numcep: feature size vector
-    :param int numcontext: not used
+    :param int numcontext: not used, the context frames are stacked in the batch assembly
+    :param str engine: MFCC implementation, one of FEATURE_ENGINES
+    :param str loader: audio loader, one of AUDIO_LOADERS
+    :param str resample_quality: resampling quality of the wav loader
+    :param str normalization: feature normalization, one of NORMALIZATIONS
+    :param str feature_type: type of the features, one of feature_engine.FEATURE_TYPES
+    :param int deltas: order of deltas appended to the features, numcep includes them
+    :param float vad_threshold: trims the leading and trailing silence quieter by the dB than the loudest frame,
+                                None disables the trimming
+    :param float vad_padding: seconds of silence kept on both ends of the trimmed audio
     :return: ndarray of shape (numcep, num_vectors)
     """
-    # load wav file and downsamples it to 16khz
-    signal, sample_rate = librosa.load(wav_filename, sr=16000)
-    #sample_rate, signal = wav.read(wav_filename)
+    return audiofiles_to_input_vectors([wav_filename], numcep, numcontext, engine=engine, loader=loader,
+                                       resample_quality=resample_quality, normalization=normalization,
+                                       feature_type=feature_type, deltas=deltas, vad_threshold=vad_threshold,
+                                       vad_padding=vad_padding)[0]
+
+
+def audiofiles_to_input_vectors(wav_filenames, numcep, numcontext, engine='psf', loader='librosa',
+                                resample_quality='medium', normalization='frame', feature_type='mfcc', deltas=0,
+                                vad_threshold=None, vad_padding=VAD_PADDING, return_num_frames=False):
+    """
+    Returns preprocessed features of multiple audio files.
+    It's the unit of work of the parallel feature extraction.
+    The numpy engine computes the features of all the files at once in FeatureEngine.
+    :param list wav_filenames: paths to the audio files
+    :param int numcep: feature size vector
+    :param int numcontext: not used, the context frames are stacked in the batch assembly
+    :param str engine: MFCC implementation, one of FEATURE_ENGINES
+    :param str loader: audio loader, one of AUDIO_LOADERS
+    :param str resample_quality: resampling quality of the wav loader
+    :param str normalization: feature normalization, one of NORMALIZATIONS
+    :param str feature_type: type of the features, one of feature_engine.FEATURE_TYPES
+    :param int deltas: order of deltas appended to the features, numcep includes them
+    :param float vad_threshold: trims the leading and trailing silence quieter by the dB than the loudest frame,
+                                None disables the trimming
+    :param float vad_padding: seconds of silence kept on both ends of the trimmed audio
+    :param bool return_num_frames: return also the number of frames of the untrimmed audios
+    :return: list of ndarrays of shape (num_vectors, numcep), with return_num_frames tuple of the list
+             and list of the untrimmed number of frames
+    """
+    if engine not in FEATURE_ENGINES:
+        raise ValueError(f'Feature engine "{engine}" not understood, choose one of {FEATURE_ENGINES}')
+
+    if engine == 'psf' and feature_type != 'mfcc':
+        raise ValueError(f'Feature engine "psf" computes only mfcc features, use "numpy" engine '
+                         f'for {feature_type} features')
+
+    size = num_coefficients(feature_type, numcep, deltas)
+
+    signals = []
+    num_frames = []
+    for wav_filename in wav_filenames:
+        # load wav file and downsamples it to 16khz
+        signal, sample_rate = load_signal(wav_filename, loader, resample_quality)
+
+        if vad_threshold is not None:
+            signal, signal_frames = trim_silence(signal, sample_rate, vad_threshold, vad_padding)
+        else:
+            signal_frames = None
+
+        signals.append(signal)
+        num_frames.append(signal_frames)
+
+    if engine == 'psf':
+        import python_speech_features as sf
+
+        # Applying mffc transformation to get feature vector
+        features = [sf.mfcc(signal, SAMPLE_RATE, numcep=size) for signal in signals]
+    else:
+        features = feature_engine_for(SAMPLE_RATE, feature_type, size).features(signals, (feature_type,))[feature_type]
+
+    features = [normalize_features(append_deltas(feature, deltas), normalization) for feature in features]
+
+    if return_num_frames:
+        return features, [len(feature) if signal_frames is None else signal_frames
+                          for feature, signal_frames in zip(features, num_frames)]
+
+    return features
+
+
+def normalize_features(features, normalization='frame'):
+    """
+    Normalizes the extracted features.
+    :param np.ndarray features: ndarray of shape (num_vectors, numcep)
+    :param str normalization: feature normalization, one of NORMALIZATIONS
+    :return: the normalized features
+    """
+    if normalization == 'frame':
+        return normalize_frames(features)
+    elif normalization == 'none':
+        return features
+
+    raise ValueError(f'Normalization "{normalization}" not understood, choose one of {NORMALIZATIONS}')
+
+
+def normalize_frames(features):
+    """
+    Standardizes every frame (row) to zero mean and unit variance in place.
+    Vectorized equivalent of sklearn.preprocessing.scale(features, axis=1).
+    :param np.ndarray features: ndarray of shape (num_vectors, numcep)
+    :return: the normalized features
+    """
+    features -= features.mean(axis=1, keepdims=True)
+
+    std = features.std(axis=1, keepdims=True)
+    std[std == 0] = 1.
+
+    features /= std
 
-    # Applying mffc transformation to get feature vector
-    mfcc_features = sf.mfcc(signal, sample_rate)
+    return features
 
-    # Swaping axes so first we get number of elements in vector(numcep) and the number of vectors
-    #mfcc_features = np.swapaxes(mfcc_features, 0, 1)
 
-    # normalization?
-    mfcc_features = scale(mfcc_features, axis=1)
+def context_windows(features, num_context):
+    """
+    Stacks every frame with num_context past and num_context future frames, [frame-k ... frame+k].
+    The frames are padded with zeros on both ends once, the windows are strided view of the padded frames,
+    so no frame is copied per window.
+
+    :param np.ndarray features: ndarray of shape (..., num_frames, feature_size), single utterance or padded batch
+    :param int num_context: number of context frames on each side
+    :return: read-only view of shape (..., num_frames, (2 * num_context + 1) * feature_size)
+    """
+    if num_context == 0:
+        return features
 
-    return mfcc_features
+    *batch_shape, num_frames, feature_size = features.shape
+
+    padded = np.zeros(tuple(batch_shape) + (num_frames + 2 * num_context, feature_size), dtype=features.dtype)
+    padded[..., num_context:num_context + num_frames, :] = features
+
+    # consecutive frames are contiguous, so the window of 2k+1 frames is one contiguous row starting at the frame
+    return np.lib.stride_tricks.as_strided(
+        padded, shape=tuple(batch_shape) + (num_frames, (2 * num_context + 1) * feature_size),
+        strides=padded.strides, writeable=False)
+
+
+def stack_frames(features, lengths, frame_stack):
+    """
+    Stacks every frame_stack consecutive frames to one frame and keeps every frame_stack-th stacked frame,
+    the batch has frame_stack times lower frame rate and frame_stack times wider frames.
+    When the number of frames is multiple of frame_stack (see multiple of pad_sequences) it's only reshaped view.
+    The last stacked frame of an utterance is completed by the padding.
+
+    :param np.ndarray features: padded batch of shape (batch_size, num_frames, feature_size)
+    :param np.ndarray lengths: lengths of the utterances
+    :param int frame_stack: number of the stacked frames
+    :return: tuple of (batch of shape (batch_size, ceil(num_frames / frame_stack), frame_stack * feature_size),
+             lengths of the stacked utterances)
+    """
+    if frame_stack == 1:
+        return features, lengths
+
+    batch_size, num_frames, feature_size = features.shape
+
+    remainder = -num_frames % frame_stack
+    if remainder:
+        features = np.pad(features, ((0, 0), (0, remainder), (0, 0)))
+
+    stacked = features.reshape(batch_size, (num_frames + remainder) // frame_stack, frame_stack * feature_size)
+
+    return stacked, stacked_lengths(lengths, frame_stack)
+
+
+def stacked_lengths(lengths, frame_stack):
+    """
+    Lengths of the utterances after the frame stacking.
+    :param lengths: number of frames of the utterances
+    :param int frame_stack: number of the stacked frames
+    :return: ndarray of the stacked lengths
+    """
+    return (np.asarray(lengths) + frame_stack - 1) // frame_stack
 
 
 def pad_sequences(sequences, maxlen=None, dtype=np.float32,
-                  padding='post', truncating='post', value=0.):
+                  padding='post', truncating='post', value=0., multiple=1):
     """
     From TensorLayer: http://tensorlayer.readthedocs.io/en/latest/_modules/tensorlayer/prepro.html
     Pads each sequence to the same length of the longest sequence.
@@ -40,6 +230,7 @@ def pad_sequences(sequences, maxlen=None, dtype=np.float32,
     maxlen. Truncation happens off either the beginning or the end
     (default) of the sequence. Supports post-padding (default) and
     pre-padding.
+    Every sequence is copied only once straight to the output array, only the padding is filled with the value.
 
     :param list sequences: list of lists where each element is a sequence
     :param int maxlen: maximum length
@@ -47,47 +238,139 @@ def pad_sequences(sequences, maxlen=None, dtype=np.float32,
     :param str padding: 'pre' or 'post', pad either before or after each sequence.
     :param str truncating: 'pre' or 'post', remove values from sequences larger
     :param float value: value to pad the sequences to the desired value.
+    :param int multiple: the padded length is rounded up to multiple of it, e.g. for the frame stacking
     :return: numpy.ndarray: Padded sequences shape = (number_of_sequences, maxlen)
              numpy.ndarray: original sequence lengths
     """
-    lengths = np.asarray([len(s) for s in sequences], dtype=np.int64)
+    lengths, maxlen, sample_shape = _batch_shape(sequences, maxlen, multiple)
+
+    x = np.empty((len(sequences), maxlen) + sample_shape, dtype=dtype)
+    _fill_padded(x, sequences, maxlen, sample_shape, padding, truncating, value)
+
+    return x, lengths
+
+
+class BatchAssembler(object):
+    """
+    Assembles batches of variable length sequences to reusable preallocated buffers.
+    There is one buffer per dtype and sample shape, it grows geometrically when a batch doesn't fit to it,
+    so after few batches no memory is allocated anymore. Every sequence is copied exactly once.
+    The returned arrays are views into the buffers, they are valid only until the next call of the assembler.
+    """
+
+    def __init__(self, dtype=np.float32, growth=2.):
+        """
+        Initializer of BatchAssembler object
+        :param type dtype: type of the assembled batches
+        :param float growth: factor of the buffer growth
+        """
+        self.dtype = np.dtype(dtype)
+        self.growth = growth
+
+        self._buffers = {}
+
+    def pad(self, sequences, maxlen=None, padding='post', truncating='post', value=0., multiple=1):
+        """
+        Pads the sequences to the same length, same as pad_sequences but into the reused buffer.
+
+        :param list sequences: list of sequences of shape (length,) + sample_shape
+        :param int maxlen: maximum length, longer sequences are truncated
+        :param str padding: 'pre' or 'post', pad either before or after each sequence.
+        :param str truncating: 'pre' or 'post', remove values from sequences larger
+        :param float value: value to pad the sequences to the desired value.
+        :param int multiple: the padded length is rounded up to multiple of it, e.g. for the frame stacking
+        :return: tuple of (padded view of shape (number_of_sequences, maxlen) + sample_shape, sequence lengths)
+        """
+        lengths, maxlen, sample_shape = _batch_shape(sequences, maxlen, multiple)
+
+        x = self._buffer((len(sequences), maxlen), sample_shape)
+        _fill_padded(x, sequences, maxlen, sample_shape, padding, truncating, value)
+
+        return x, lengths
+
+    def ragged(self, sequences):
+        """
+        Concatenates the sequences without any padding.
+        The i-th sequence is values[row_splits[i]:row_splits[i + 1]].
+
+        :param list sequences: list of sequences of shape (length,) + sample_shape
+        :return: tuple of (values view of shape (total_length,) + sample_shape, int64 row_splits)
+        """
+        lengths, _, sample_shape = _batch_shape(sequences, 0)
+
+        row_splits = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=row_splits[1:])
+
+        values = self._buffer((int(row_splits[-1]),), sample_shape)
+
+        # stored features are dequantized straight to the values
+        for i, s in enumerate(sequences):
+            dequantize(s, out=values[row_splits[i]:row_splits[i + 1]])
+
+        return values, row_splits
+
+    def _buffer(self, batch_shape, sample_shape):
+        """
+        View of the buffer of the sample shape with shape batch_shape + sample_shape,
+        the buffer grows when it's too small.
+        """
+        shape = batch_shape + sample_shape
+        size = int(np.prod(shape))
+
+        buffer = self._buffers.get(sample_shape)
+        if buffer is None or buffer.size < size:
+            capacity = size if buffer is None else max(size, int(buffer.size * self.growth))
+            buffer = np.empty(capacity, dtype=self.dtype)
+            self._buffers[sample_shape] = buffer
+
+        return buffer[:size].reshape(shape)
+
+
+def _batch_shape(sequences, maxlen, multiple=1):
+    """
+    Lengths, maximum length and the sample shape of the batch.
+    The sample shape is taken from the first non empty sequence.
+    """
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
 
-    nb_samples = len(sequences)
     if maxlen is None:
-        maxlen = np.max(lengths)
+        maxlen = int(lengths.max()) if len(lengths) else 0
+        maxlen += -maxlen % multiple
 
-    # take the sample shape from the first non empty sequence
-    # checking for consistency in the main loop below.
     sample_shape = tuple()
     for s in sequences:
         if len(s) > 0:
-            sample_shape = np.asarray(s).shape[1:]
+            sample_shape = np.shape(s)[1:]
             break
 
-    x = (np.ones((nb_samples, maxlen) + sample_shape) * value).astype(dtype)
+    return lengths, maxlen, sample_shape
+
+
+def _fill_padded(x, sequences, maxlen, sample_shape, padding, truncating, value):
+    """
+    Copies the truncated sequences to the rows of x and fills the rest of rows with value.
+    """
+    if truncating not in ('pre', 'post'):
+        raise ValueError('Truncating type "%s" not understood' % truncating)
+    if padding not in ('pre', 'post'):
+        raise ValueError('Padding type "%s" not understood' % padding)
+
     for idx, s in enumerate(sequences):
-        if len(s) == 0:
-            continue  # empty list was found
-        if truncating == 'pre':
-            trunc = s[-maxlen:]
-        elif truncating == 'post':
-            trunc = s[:maxlen]
-        else:
-            raise ValueError('Truncating type "%s" not understood' % truncating)
+        trunc = s[-maxlen:] if truncating == 'pre' else s[:maxlen]
+        length = len(trunc) if maxlen > 0 else 0
 
         # check `trunc` has expected shape
-        trunc = np.asarray(trunc, dtype=dtype)
-        if trunc.shape[1:] != sample_shape:
+        if length > 0 and np.shape(trunc)[1:] != sample_shape:
             raise ValueError('Shape of sample %s of sequence at position %s is different from expected shape %s' %
-                             (trunc.shape[1:], idx, sample_shape))
+                             (np.shape(trunc)[1:], idx, sample_shape))
 
+        # stored features are dequantized straight to the batch
         if padding == 'post':
-            x[idx, :len(trunc)] = trunc
-        elif padding == 'pre':
-            x[idx, -len(trunc):] = trunc
+            dequantize(trunc[:length], out=x[idx, :length])
+            x[idx, length:] = value
         else:
-            raise ValueError('Padding type "%s" not understood' % padding)
-    return x, lengths
+            dequantize(trunc[:length], out=x[idx, maxlen - length:])
+            x[idx, :maxlen - length] = value
 
 
 # def audiofile_to_input_vector(audio_filename, numcep, numcontext):
@@ -0,0 +1,184 @@
+import os
+import hashlib
+import numpy as np
+
+
+class CMVN(object):
+    """
+    Cepstral mean and variance normalization by statistics of the whole training corpus.
+    The mean and variance of every coefficient are accumulated in a single pass over the utterances,
+    every utterance is merged to the running statistics by batched Welford (Chan et al.) update.
+    Optionally the statistics are kept also per speaker, unknown speakers are normalized by the global ones.
+    """
+
+    def __init__(self, feature_size, per_speaker=False, params=None):
+        """
+        Initializer of CMVN object
+        :param int feature_size: size of feature vector
+        :param bool per_speaker: accumulate and apply statistics per speaker
+        :param str params: digest of the parameters of the features (see params_digest), saved with the statistics
+        """
+        self.feature_size = feature_size
+        self.per_speaker = per_speaker
+        self.params = params
+
+        # speaker (None for the global statistics) -> [count, mean, m2]
+        self.stats = {None: self._empty_stats()}
+
+    def _empty_stats(self):
+        return [0, np.zeros(self.feature_size), np.zeros(self.feature_size)]
+
+    def update(self, features, speaker=None):
+        """
+        Merges the features of one utterance to the statistics.
+        :param np.ndarray features: ndarray of shape (num_frames, feature_size)
+        :param str speaker: speaker of the utterance
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if len(features) == 0:
+            return
+
+        count = len(features)
+        mean = features.mean(axis=0)
+        m2 = np.square(features - mean).sum(axis=0)
+
+        self._merge(self.stats[None], count, mean, m2)
+
+        if self.per_speaker and speaker is not None:
+            self._merge(self.stats.setdefault(speaker, self._empty_stats()), count, mean, m2)
+
+    def _merge(self, stats, count, mean, m2):
+
+        total = stats[0] + count
+        delta = mean - stats[1]
+
+        stats[1] = stats[1] + delta * (count / total)
+        stats[2] = stats[2] + m2 + delta * delta * (stats[0] * count / total)
+        stats[0] = total
+
+    def count(self, speaker=None):
+        """
+        Number of accumulated frames.
+        """
+        return self._speaker_stats(speaker)[0]
+
+    def mean(self, speaker=None):
+        """
+        Mean of the coefficients, of the speaker if there are statistics of the speaker.
+        :param str speaker: speaker, None for the global mean
+        :return: ndarray of shape (feature_size,)
+        """
+        return self._speaker_stats(speaker)[1]
+
+    def std(self, speaker=None):
+        """
+        Standard deviation of the coefficients, constant coefficients have std 1.
+        :param str speaker: speaker, None for the global std
+        :return: ndarray of shape (feature_size,)
+        """
+        count, _, m2 = self._speaker_stats(speaker)
+
+        std = np.sqrt(m2 / max(count, 1))
+        std[std == 0] = 1.
+
+        return std
+
+    def _speaker_stats(self, speaker):
+
+        if speaker is not None and speaker in self.stats:
+            return self.stats[speaker]
+
+        return self.stats[None]
+
+    def normalize(self, features, speaker=None):
+        """
+        Normalizes the features of one utterance in place.
+        :param np.ndarray features: float ndarray of shape (num_frames, feature_size)
+        :param str speaker: speaker of the utterance
+        :return: the normalized features
+        """
+        features -= self.mean(speaker)
+        features /= self.std(speaker)
+
+        return features
+
+    def normalize_batch(self, x, lengths, speakers=None):
+        """
+        Normalizes padded batch in place, the padding stays zero.
+        :param np.ndarray x: float ndarray of shape (batch_size, max_length, feature_size)
+        :param np.ndarray lengths: lengths of the utterances
+        :param list speakers: speakers of the utterances, None uses the global statistics
+        :return: the normalized batch
+        """
+        if speakers is not None and self.per_speaker:
+            x -= np.stack([self.mean(speaker) for speaker in speakers])[:, None, :]
+            x /= np.stack([self.std(speaker) for speaker in speakers])[:, None, :]
+        else:
+            x -= self.mean()
+            x /= self.std()
+
+        x[np.arange(x.shape[1])[None, :] >= np.asarray(lengths)[:, None]] = 0.
+
+        return x
+
+    def digest(self):
+        """
+        Hash of the statistics, the features normalized by other statistics are not interchangeable.
+        :return: hex digest
+        """
+        digest = hashlib.sha1(str(self.per_speaker).encode())
+
+        for key in sorted(self.stats, key=lambda speaker: '' if speaker is None else str(speaker)):
+            count, mean, m2 = self.stats[key]
+            digest.update(f'{key}:{count}'.encode())
+            digest.update(np.asarray(mean, dtype=np.float64).tobytes())
+            digest.update(np.asarray(m2, dtype=np.float64).tobytes())
+
+        return digest.hexdigest()
+
+    def save(self, cmvn_path):
+        """
+        Saves the statistics to npz file.
+        :param str cmvn_path: path to the file
+        """
+        os.makedirs(os.path.dirname(cmvn_path) or '.', exist_ok=True)
+
+        speakers = [speaker for speaker in self.stats if speaker is not None]
+        keys = [None] + speakers
+
+        with open(cmvn_path, 'wb') as f:
+            np.savez(f,
+                     per_speaker=self.per_speaker,
+                     params=str(self.params or ''),
+                     speakers=np.asarray(speakers, dtype=str),
+                     counts=np.asarray([self.stats[key][0] for key in keys], dtype=np.int64),
+                     means=np.stack([self.stats[key][1] for key in keys]),
+                     m2s=np.stack([self.stats[key][2] for key in keys]))
+
+    @classmethod
+    def load(cls, cmvn_path):
+        """
+        Loads the statistics saved by save, the params of the statistics saved without them are None.
+        :param str cmvn_path: path to the file
+        :return: CMVN object
+        """
+        with np.load(cmvn_path) as data:
+            means = data['means']
+            params = str(data['params']) if 'params' in data.files else ''
+
+            cmvn = cls(means.shape[1], per_speaker=bool(data['per_speaker']), params=params or None)
+
+            keys = [None] + data['speakers'].tolist()
+            for key, count, mean, m2 in zip(keys, data['counts'], means, data['m2s']):
+                cmvn.stats[key] = [int(count), mean, m2]
+
+        return cmvn
+
+
+def params_digest(params):
+    """
+    Digest of the feature parameters the statistics are accumulated for.
+    :param dict params: feature parameters, see DatasetBase.feature_params
+    :return: hex digest
+    """
+    return hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()
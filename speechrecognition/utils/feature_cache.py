@@ -0,0 +1,168 @@
+import os
+import hashlib
+from collections import OrderedDict
+from speechrecognition.utils.feature_quantization import save_features, load_features
+
+
+class FeatureCache(object):
+    """
+    Persistent on-disk cache of extracted speech features.
+    Every entry is keyed by the audio file (its path, size and mtime or its content hash)
+    together with the feature parameters, so changing any of them results in a new entry.
+    The cache is kept under a byte budget, the least recently used entries are evicted first.
+    """
+
+    ENTRY_SUFFIX = '.npy'
+
+    def __init__(self, cache_path, max_bytes=None, hash_content=False):
+        """
+        Initializer of FeatureCache object
+
+        :param str cache_path: directory where the cached features are stored
+        :param int max_bytes: byte budget of the cache, None means unlimited
+        :param bool hash_content: key the entries by hash of the file content instead of path, size and mtime
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        self._load_entries()
+
+    def key(self, wav_filename, params):
+        """
+        Computes the cache key of the audio file and its feature parameters.
+
+        :param str wav_filename: path to the audio file
+        :param dict params: feature parameters which affects the extracted features
+        :return: hex digest key
+        """
+        digest = hashlib.sha1()
+
+        if self.hash_content:
+            with open(wav_filename, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            stat = os.stat(wav_filename)
+            digest.update(f'{os.path.abspath(wav_filename)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+
+        digest.update(repr(sorted(params.items())).encode())
+
+        return digest.hexdigest()
+
+    def get(self, wav_filename, params):
+        """
+        Returns the cached features of the audio file or None when it's not cached.
+
+        :param str wav_filename: path to the audio file
+        :param dict params: feature parameters which affects the extracted features
+        :return: features or None
+        """
+        key = self.key(wav_filename, params)
+
+        if key not in self._entries:
+            self.misses += 1
+            return None
+
+        try:
+            with open(self._entry_path(key), 'rb') as f:
+                features = load_features(f)
+        except (OSError, ValueError):
+            # entry was removed or corrupted by someone else
+            self._remove_entry(key)
+            self.misses += 1
+            return None
+
+        # mark entry as recently used, survives the restart through mtime
+        self._entries.move_to_end(key)
+        os.utime(self._entry_path(key))
+
+        self.hits += 1
+
+        return features
+
+    def put(self, wav_filename, params, features):
+        """
+        Stores the features of the audio file to the cache and evicts the old entries over the byte budget.
+
+        :param str wav_filename: path to the audio file
+        :param dict params: feature parameters which affects the extracted features
+        :param features: extracted features, ndarray or QuantizedFeatures
+        """
+        key = self.key(wav_filename, params)
+        entry_path = self._entry_path(key)
+
+        # write to temporary file first, so readers never see half written entry
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            save_features(f, features)
+        os.replace(tmp_path, entry_path)
+
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+
+        size = os.path.getsize(entry_path)
+        self._entries[key] = size
+        self._total_bytes += size
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits to its byte budget.
+        """
+        if self.max_bytes is None:
+            return
+
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove_entry(key)
+
+    def size(self):
+        """
+        Number of bytes used by the cache entries.
+        """
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _load_entries(self):
+        """
+        Scans the cache directory and orders the entries from the least recently used.
+        """
+        entries = []
+        with os.scandir(self.cache_path) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(self.ENTRY_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.name[:-len(self.ENTRY_SUFFIX)], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        self.evict()
+
+    def _remove_entry(self, key):
+
+        self._total_bytes -= self._entries.pop(key, 0)
+
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_path, key + self.ENTRY_SUFFIX)
@@ -0,0 +1,396 @@
+import math
+import numpy as np
+from functools import lru_cache
+
+# feature types computed from the power spectrum
+#   mfcc        - mel frequency cepstral coefficients, feature size is the number of coefficients
+#   fbank       - log mel filterbank energies, feature size is the number of filters
+#   spectrogram - log power spectrum, feature size is nfft/2 + 1
+FEATURE_TYPES = ('mfcc', 'fbank', 'spectrogram')
+
+# number of filters of MFCC mel filterbank and the FFT size
+MFCC_NUM_FILTERS = 26
+NFFT = 512
+
+
+class FeatureEngine(object):
+    """
+    Vectorized NumPy implementation of MFCC feature extraction.
+    It computes the same features as python_speech_features.mfcc, but it processes whole batch of signals at once.
+    The signals are framed with stride tricks views, all the frames go through single batched rfft
+    and the mel filterbank and DCT matrices are computed only once per engine.
+    Log mel filterbank and spectrogram features are computed from the same power spectrum,
+    so any combination of the FEATURE_TYPES costs one FFT pass.
+    """
+
+    def __init__(self, sample_rate=16000, numcep=13, nfilt=26, nfft=512, winlen=0.025, winstep=0.01,
+                 preemph=0.97, ceplifter=22, append_energy=True):
+        """
+        Initializer of FeatureEngine object, the parameters follows python_speech_features.mfcc
+
+        :param int sample_rate: sample rate of the signals
+        :param int numcep: number of cepstral coefficients
+        :param int nfilt: number of filters in the mel filterbank
+        :param int nfft: size of the FFT
+        :param float winlen: length of the analysis window in seconds
+        :param float winstep: step between successive windows in seconds
+        :param float preemph: preemphasis filter coefficient, 0 means no filter
+        :param int ceplifter: lifter applied to the cepstral coefficients, 0 means no lifter
+        :param bool append_energy: replace the zeroth cepstral coefficient with log of the frame energy
+        """
+        self.sample_rate = sample_rate
+        self.numcep = numcep
+        self.nfilt = nfilt
+        self.nfft = nfft
+        self.preemph = preemph
+        self.append_energy = append_energy
+
+        self.frame_len = _round_half_up(winlen * sample_rate)
+        self.frame_step = _round_half_up(winstep * sample_rate)
+
+        self.filterbank = mel_filterbank(nfilt, nfft, sample_rate)
+        self.dct_matrix = dct_matrix(nfilt, numcep) * lifter_vector(numcep, ceplifter)
+
+    def num_frames(self, signal_len):
+        """
+        Number of frames of the signal, the last frame is zero padded.
+        :param int signal_len: number of samples of the signal
+        :return: number of frames
+        """
+        if signal_len <= self.frame_len:
+            return 1
+
+        return 1 + int(math.ceil((signal_len - self.frame_len) / self.frame_step))
+
+    def frame_signal(self, signal):
+        """
+        Splits the preemphasized signal to overlapping frames.
+        The frames are strided view of the zero padded signal, no frame is copied.
+
+        :param np.ndarray signal: 1D audio signal
+        :return: ndarray of shape (num_frames, frame_len)
+        """
+        signal_len = len(signal)
+        num_frames = self.num_frames(signal_len)
+
+        padded = np.zeros((num_frames - 1) * self.frame_step + self.frame_len, dtype=np.float64)
+        if signal_len > 0:
+            padded[0] = signal[0]
+            padded[1:signal_len] = signal[1:]
+            padded[1:signal_len] -= self.preemph * signal[:-1]
+
+        return np.lib.stride_tricks.as_strided(
+            padded, shape=(num_frames, self.frame_len),
+            strides=(padded.strides[0] * self.frame_step, padded.strides[0]), writeable=False)
+
+    def power_spectrum(self, signals):
+        """
+        Power spectrum of all the frames of all the signals computed by single rfft.
+        The frames are copied only once, straight to the zero padded FFT input.
+
+        :param list signals: list of 1D audio signals
+        :return: tuple of (ndarray of shape (total_frames, nfft/2 + 1), list of number of frames per signal)
+        """
+        num_frames = [self.num_frames(len(signal)) for signal in signals]
+
+        fft_input = np.zeros((sum(num_frames), self.nfft), dtype=np.float64)
+
+        offset = 0
+        for signal, signal_frames in zip(signals, num_frames):
+            self._copy_frames(self.frame_signal(signal), fft_input[offset:offset + signal_frames])
+            offset += signal_frames
+
+        return self._power_spectrum(fft_input), num_frames
+
+    def power_spectrum_frames(self, frames):
+        """
+        Power spectrum of already framed and preemphasized signal.
+
+        :param np.ndarray frames: ndarray of shape (num_frames, frame_len)
+        :return: ndarray of shape (num_frames, nfft/2 + 1)
+        """
+        fft_input = np.zeros((len(frames), self.nfft), dtype=np.float64)
+        self._copy_frames(frames, fft_input)
+
+        return self._power_spectrum(fft_input)
+
+    def _copy_frames(self, frames, fft_input):
+
+        # frames longer than FFT are truncated like in numpy.fft.rfft
+        frame_len = min(self.frame_len, self.nfft)
+        fft_input[:, :frame_len] = frames[:, :frame_len]
+
+    def _power_spectrum(self, fft_input):
+
+        spectrum = np.fft.rfft(fft_input)
+
+        # squares real and imaginary parts in place
+        squared = spectrum.view(np.float64)
+        squared *= squared
+
+        power = squared[:, 0::2] + squared[:, 1::2]
+        power *= 1.0 / self.nfft
+
+        return power
+
+    def mfcc(self, signals):
+        """
+        Computes MFCC features of batch of signals.
+
+        :param list signals: list of 1D audio signals
+        :return: list of ndarrays of shape (num_frames, numcep)
+        """
+        return self.features(signals, ('mfcc',))['mfcc']
+
+    def features(self, signals, feature_types=('mfcc',)):
+        """
+        Computes features of all the types of batch of signals from one shared power spectrum.
+
+        :param list signals: list of 1D audio signals
+        :param tuple feature_types: feature types, subset of FEATURE_TYPES
+        :return: dict of feature type -> list of ndarrays of shape (num_frames, feature size of the type)
+        """
+        power, num_frames = self.power_spectrum(signals)
+
+        splits = np.cumsum(num_frames)[:-1]
+
+        return {feature_type: np.split(self.features_from_power(power, feature_type), splits)
+                for feature_type in feature_types}
+
+    def features_from_power(self, power, feature_type):
+        """
+        Computes features of the type from the power spectrum.
+
+        :param np.ndarray power: power spectrum of shape (num_frames, nfft/2 + 1)
+        :param str feature_type: one of FEATURE_TYPES
+        :return: ndarray of shape (num_frames, feature size of the type)
+        """
+        if feature_type == 'mfcc':
+            return self._mfcc_from_power(power)
+        elif feature_type == 'fbank':
+            return self._fbank_from_power(power)
+        elif feature_type == 'spectrogram':
+            return np.log(np.maximum(power, np.finfo(float).eps))
+
+        raise ValueError(f'Feature type "{feature_type}" not understood, choose one of {FEATURE_TYPES}')
+
+    def mfcc_frames(self, frames):
+        """
+        Computes MFCC features of already framed and preemphasized signal.
+
+        :param np.ndarray frames: ndarray of shape (num_frames, frame_len)
+        :return: ndarray of shape (num_frames, numcep)
+        """
+        return self._mfcc_from_power(self.power_spectrum_frames(frames))
+
+    def _fbank_from_power(self, power):
+
+        mel_energy = power @ self.filterbank.T
+        np.maximum(mel_energy, np.finfo(float).eps, out=mel_energy)
+        np.log(mel_energy, out=mel_energy)
+
+        return mel_energy
+
+    def _mfcc_from_power(self, power):
+
+        eps = np.finfo(float).eps
+
+        features = self._fbank_from_power(power) @ self.dct_matrix
+
+        if self.append_energy:
+            energy = power.sum(axis=1)
+            features[:, 0] = np.log(np.where(energy == 0, eps, energy))
+
+        return features
+
+
+@lru_cache(maxsize=None)
+def get_feature_engine(sample_rate, numcep, nfilt=MFCC_NUM_FILTERS):
+    """
+    Returns feature engine shared within the process, so the filterbank and DCT matrices are built only once.
+    :param int sample_rate: sample rate of the signals
+    :param int numcep: number of cepstral coefficients
+    :param int nfilt: number of filters in the mel filterbank
+    :return: FeatureEngine object
+    """
+    return FeatureEngine(sample_rate=sample_rate, numcep=min(numcep, nfilt), nfilt=nfilt, nfft=NFFT)
+
+
+def feature_engine_for(sample_rate, feature_type, num_coefficients):
+    """
+    Returns shared feature engine which computes num_coefficients features of the type.
+    :param int sample_rate: sample rate of the signals
+    :param str feature_type: one of FEATURE_TYPES
+    :param int num_coefficients: feature size of the type without deltas
+    :return: FeatureEngine object
+    """
+    if feature_type == 'fbank':
+        return get_feature_engine(sample_rate, num_coefficients, nfilt=num_coefficients)
+
+    return get_feature_engine(sample_rate, num_coefficients)
+
+
+def num_coefficients(feature_type, feature_size, deltas=0):
+    """
+    Number of the base coefficients of the feature type, the feature size is validated against the type.
+    :param str feature_type: one of FEATURE_TYPES
+    :param int feature_size: size of the feature vector including the deltas
+    :param int deltas: order of the appended deltas
+    :exception ValueError: it's raised when the type can't produce vector of the feature size
+    :return: number of coefficients without deltas
+    """
+    if feature_type not in FEATURE_TYPES:
+        raise ValueError(f'Feature type "{feature_type}" not understood, choose one of {FEATURE_TYPES}')
+
+    if feature_size % (deltas + 1) != 0:
+        raise ValueError(f'Feature size {feature_size} is not divisible by {deltas + 1}, '
+                         f'the {feature_type} coefficients and {deltas} order(s) of deltas')
+
+    size = feature_size // (deltas + 1)
+
+    if feature_type == 'mfcc' and not 0 < size <= MFCC_NUM_FILTERS:
+        raise ValueError(f'MFCC has 1 to {MFCC_NUM_FILTERS} coefficients, feature size {feature_size} '
+                         f'with {deltas} order(s) of deltas requires {size}')
+    elif feature_type == 'fbank' and size <= 0:
+        raise ValueError(f'Filterbank needs at least one filter, feature size {feature_size} is invalid')
+    elif feature_type == 'spectrogram' and size != NFFT // 2 + 1:
+        raise ValueError(f'Spectrogram has {NFFT // 2 + 1} frequency bins, feature size must be '
+                         f'{(NFFT // 2 + 1) * (deltas + 1)} with {deltas} order(s) of deltas, not {feature_size}')
+
+    return size
+
+
+def append_deltas(features, order, window=2):
+    """
+    Appends delta (and delta-delta, ...) coefficients, the same as python_speech_features.delta.
+    :param np.ndarray features: ndarray of shape (num_frames, num_coefficients)
+    :param int order: number of the appended orders of deltas
+    :param int window: number of frames on each side used for the regression
+    :return: ndarray of shape (num_frames, num_coefficients * (order + 1))
+    """
+    if order == 0:
+        return features
+
+    num_frames = len(features)
+    denominator = 2 * sum(n * n for n in range(1, window + 1))
+
+    blocks = [features]
+    for _ in range(order):
+        padded = np.pad(blocks[-1], ((window, window), (0, 0)), mode='edge')
+
+        delta = np.zeros_like(blocks[-1])
+        for n in range(1, window + 1):
+            delta += n * (padded[window + n:window + n + num_frames] - padded[window - n:window - n + num_frames])
+        delta /= denominator
+
+        blocks.append(delta)
+
+    return np.concatenate(blocks, axis=1)
+
+
+def mel_filterbank(nfilt, nfft, sample_rate, lowfreq=0, highfreq=None):
+    """
+    Triangular mel filterbank, identical to python_speech_features.get_filterbanks.
+    :param int nfilt: number of filters
+    :param int nfft: size of the FFT
+    :param int sample_rate: sample rate of the signals
+    :param float lowfreq: lowest band edge of mel filters in Hz
+    :param float highfreq: highest band edge of mel filters in Hz, default is sample_rate/2
+    :return: ndarray of shape (nfilt, nfft/2 + 1)
+    """
+    highfreq = highfreq or sample_rate / 2
+
+    mel_points = np.linspace(_hz_to_mel(lowfreq), _hz_to_mel(highfreq), nfilt + 2)
+    bins = np.floor((nfft + 1) * _mel_to_hz(mel_points) / sample_rate)
+
+    left, center, right = bins[:-2, None], bins[1:-1, None], bins[2:, None]
+    fft_bins = np.arange(nfft // 2 + 1)[None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = (fft_bins - left) / (center - left)
+        falling = (right - fft_bins) / (right - center)
+
+    filterbank = np.where((fft_bins >= left) & (fft_bins < center), rising, 0.)
+    filterbank = np.where((fft_bins >= center) & (fft_bins < right), falling, filterbank)
+
+    return filterbank
+
+
+def dct_matrix(size, numcep):
+    """
+    Orthonormal DCT-II matrix, x @ dct_matrix equals scipy.fftpack.dct(x, type=2, norm='ortho')[:, :numcep]
+    :param int size: length of the transformed vectors
+    :param int numcep: number of kept coefficients
+    :return: ndarray of shape (size, numcep)
+    """
+    n = np.arange(size)[:, None]
+    k = np.arange(numcep)[None, :]
+
+    matrix = np.cos(np.pi * k * (2 * n + 1) / (2 * size)) * np.sqrt(2. / size)
+    matrix[:, 0] /= np.sqrt(2.)
+
+    return matrix
+
+
+def lifter_vector(numcep, ceplifter):
+    """
+    Cepstral lifter weights
+    :param int numcep: number of cepstral coefficients
+    :param int ceplifter: lifter coefficient, 0 means no lifter
+    :return: ndarray of shape (numcep,)
+    """
+    if ceplifter <= 0:
+        return np.ones(numcep)
+
+    return 1 + (ceplifter / 2.) * np.sin(np.pi * np.arange(numcep) / ceplifter)
+
+
+def _round_half_up(number):
+    return int(math.floor(number + 0.5))
+
+
+def _hz_to_mel(hz):
+    return 2595 * np.log10(1 + hz / 700.)
+
+
+def _mel_to_hz(mel):
+    return 700 * (10 ** (mel / 2595.0) - 1)
+
+
+def compare_engines(wav_filenames, numcep=13, repeat=3):
+    """
+    Compares speed and output of python_speech_features and the vectorized engine on the audio files.
+    :param list wav_filenames: paths to the audio files
+    :param int numcep: number of cepstral coefficients
+    :param int repeat: number of timed runs, the best one is reported
+    """
+    import librosa
+    import python_speech_features as sf
+
+    signals = [librosa.load(wav_filename, sr=16000)[0] for wav_filename in wav_filenames]
+    engine = get_feature_engine(16000, numcep)
+
+    psf_time = min(_timeit(lambda: [sf.mfcc(signal, 16000, numcep=numcep) for signal in signals]) for _ in range(repeat))
+    engine_time = min(_timeit(lambda: engine.mfcc(signals)) for _ in range(repeat))
+
+    max_error = max(np.max(np.abs(sf.mfcc(signal, 16000, numcep=numcep) - features))
+                    for signal, features in zip(signals, engine.mfcc(signals)))
+
+    print(f'python_speech_features: {psf_time * 1000:.1f} ms, numpy engine: {engine_time * 1000:.1f} ms, '
+          f'speed up {psf_time / engine_time:.1f}x, max abs difference {max_error:.2e}')
+
+
+def _timeit(fn):
+    import time
+
+    start_time = time.perf_counter()
+    fn()
+
+    return time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+
+    import sys
+
+    compare_engines(sys.argv[1:])
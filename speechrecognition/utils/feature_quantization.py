@@ -0,0 +1,168 @@
+import numpy as np
+
+# dtypes the features can be kept in memory and on disk
+#   float32 - full precision
+#   float16 - half precision, 2x less memory
+#   int8    - linearly quantized with one scale per utterance, 4x less memory
+STORAGE_DTYPES = ('float32', 'float16', 'int8')
+
+
+class QuantizedFeatures(object):
+    """
+    Feature matrix quantized to int8 with one scale per utterance, the features are values * scale.
+    It behaves like read-only array of features, slicing keeps it quantized
+    and it's dequantized to float32 when it's converted to ndarray.
+    """
+
+    def __init__(self, values, scale):
+        """
+        Initializer of QuantizedFeatures object
+        :param np.ndarray values: int8 ndarray of shape (num_frames, feature_size)
+        :param float scale: scale of the values
+        """
+        self.values = values
+        self.scale = np.float32(scale)
+
+    @classmethod
+    def quantize(cls, features):
+        """
+        Quantizes the features symmetrically to [-127, 127] by their maximal absolute value.
+        :param np.ndarray features: features of shape (num_frames, feature_size)
+        :return: QuantizedFeatures
+        """
+        features = np.asarray(features, dtype=np.float32)
+
+        max_value = float(np.max(np.abs(features))) if features.size else 0.
+        scale = max_value / 127. if max_value > 0 else 1.
+
+        values = np.rint(features / scale).astype(np.int8)
+
+        return cls(values, scale)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.scale.nbytes
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, item):
+        return QuantizedFeatures(self.values[item], self.scale)
+
+    def __array__(self, dtype=None, copy=None):
+        return dequantize(self).astype(dtype or np.float32, copy=False)
+
+
+def quantize(features, storage_dtype='float32'):
+    """
+    Converts the features to the storage dtype.
+    :param features: ndarray or QuantizedFeatures
+    :param str storage_dtype: one of STORAGE_DTYPES
+    :return: ndarray for float dtypes, QuantizedFeatures for int8
+    """
+    if storage_dtype not in STORAGE_DTYPES:
+        raise ValueError(f'Storage dtype "{storage_dtype}" not understood, choose one of {STORAGE_DTYPES}')
+
+    if storage_dtype == 'int8':
+        if isinstance(features, QuantizedFeatures):
+            return features
+
+        return QuantizedFeatures.quantize(features)
+
+    if isinstance(features, QuantizedFeatures):
+        features = dequantize(features)
+
+    return np.asarray(features).astype(storage_dtype, copy=False)
+
+
+def dequantize(features, out=None):
+    """
+    Converts the stored features to float32.
+    :param features: ndarray or QuantizedFeatures
+    :param np.ndarray out: array the features are written to, it saves the intermediate copy
+    :return: float32 ndarray of the features or out
+    """
+    if isinstance(features, QuantizedFeatures):
+        if out is None:
+            out = np.empty(features.shape, dtype=np.float32)
+
+        return np.multiply(features.values, features.scale, out=out, casting='unsafe')
+
+    if out is None:
+        return np.asarray(features, dtype=np.float32)
+
+    out[...] = features
+
+    return out
+
+
+def features_nbytes(audios):
+    """
+    Number of bytes of the features data.
+    :param audios: sequence of ndarrays or QuantizedFeatures
+    :return: int
+    """
+    return sum(audio.nbytes for audio in audios)
+
+
+def quantization_report(audios, stored_audios):
+    """
+    Prints the memory saving and the error of the stored features against the float32 baseline.
+    :param audios: sequence of the original features
+    :param stored_audios: sequence of the stored features
+    :return: dict with the memory ratio, maximal absolute error and signal to noise ratio in dB
+    """
+    baseline_bytes = sum(np.size(audio) * 4 for audio in audios)
+    stored_bytes = features_nbytes(stored_audios)
+
+    signal_power = 0.
+    noise_power = 0.
+    max_error = 0.
+    for audio, stored_audio in zip(audios, stored_audios):
+        audio = np.asarray(audio, dtype=np.float32)
+        error = dequantize(stored_audio) - audio
+
+        signal_power += float(np.sum(audio * audio))
+        noise_power += float(np.sum(error * error))
+        if error.size:
+            max_error = max(max_error, float(np.max(np.abs(error))))
+
+    snr = 10 * np.log10(signal_power / noise_power) if noise_power > 0 else float('inf')
+    memory_ratio = baseline_bytes / stored_bytes if stored_bytes else 1.
+
+    print(f'Stored features use {stored_bytes / 2**20:.1f} MB, {memory_ratio:.1f}x less than float32, '
+          f'max abs error {max_error:.2e}, SNR {snr:.1f} dB.')
+
+    return {'memory_ratio': memory_ratio, 'max_error': max_error, 'snr': snr}
+
+
+def save_features(f, features):
+    """
+    Saves the stored features to open binary file, QuantizedFeatures are saved as values followed by scale.
+    :param f: file object
+    :param features: ndarray or QuantizedFeatures
+    """
+    if isinstance(features, QuantizedFeatures):
+        np.save(f, features.values)
+        np.save(f, np.asarray([features.scale], dtype=np.float32))
+    else:
+        np.save(f, features)
+
+
+def load_features(f):
+    """
+    Loads the features saved by save_features.
+    :param f: file object
+    :return: ndarray or QuantizedFeatures
+    """
+    features = np.load(f)
+
+    if features.dtype == np.int8:
+        scale = np.load(f)
+        return QuantizedFeatures(features, scale[0])
+
+    return features
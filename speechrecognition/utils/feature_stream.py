@@ -0,0 +1,290 @@
+import math
+import numpy as np
+from speechrecognition.utils import audio_utils, wav_utils
+from speechrecognition.utils.feature_engine import get_feature_engine
+
+# normalization of the streamed features
+#   frame   - every frame to zero mean and unit variance, same as the offline features
+#   running - every coefficient by mean and variance of all the frames seen so far
+#   none    - raw features, they are normalized by CMVN afterwards
+STREAM_NORMALIZATIONS = ('frame', 'running', 'none')
+
+
+def stream_features(wav_filename, numcep=13, chunk_seconds=10., normalization='frame', resample_quality='medium'):
+    """
+    Generator of MFCC feature blocks of the audio file with bounded memory.
+    The audio is read in chunks of chunk_seconds from memory mapped WAV, resampled, framed and transformed
+    chunk by chunk, the state between chunks (filter history, frame overlap, normalization statistics) is carried on.
+    With frame normalization the concatenated blocks are equal to the offline numpy engine features.
+    Formats which wav_utils can't read directly are loaded whole with librosa and then streamed.
+
+    :param str wav_filename: path to the audio file
+    :param int numcep: number of cepstral coefficients
+    :param float chunk_seconds: length of the audio chunks in seconds
+    :param str normalization: feature normalization, one of STREAM_NORMALIZATIONS
+    :param str resample_quality: resampling quality, one of wav_utils.RESAMPLE_QUALITY
+    :return: generator of ndarrays of shape (num_frames, numcep)
+    """
+    if normalization not in STREAM_NORMALIZATIONS:
+        raise ValueError(f'Normalization "{normalization}" not understood, choose one of {STREAM_NORMALIZATIONS}')
+
+    engine = get_feature_engine(audio_utils.SAMPLE_RATE, numcep)
+    framer = StreamingFramer(engine.frame_len, engine.frame_step, engine.preemph)
+    normalizer = RunningNormalizer(numcep) if normalization == 'running' else None
+
+    for signal, is_last in _resampled_chunks(wav_filename, chunk_seconds, resample_quality):
+
+        frames = framer.process(signal, final=is_last)
+        if len(frames) == 0:
+            continue
+
+        features = engine.mfcc_frames(frames)
+
+        if normalizer is not None:
+            yield normalizer.normalize(features)
+        elif normalization == 'none':
+            yield features
+        else:
+            yield audio_utils.normalize_frames(features)
+
+
+def stream_num_frames(wav_filename, numcep=13):
+    """
+    Number of the feature frames stream_features yields for the WAV file, it's computed from the header
+    without reading the samples, so the consumer can allocate the features before the first block.
+    :param str wav_filename: path to the audio file
+    :param int numcep: number of cepstral coefficients
+    :return: int, None when the file is not read directly by wav_utils
+    """
+    try:
+        samples, sample_rate, _ = wav_utils.read_wav(wav_filename)
+    except wav_utils.UnsupportedWavError:
+        return None
+
+    # length of the resampled signal, the same as of resample_poly
+    gcd = math.gcd(int(sample_rate), audio_utils.SAMPLE_RATE)
+    num_samples = -(-len(samples) * (audio_utils.SAMPLE_RATE // gcd) // (int(sample_rate) // gcd))
+
+    engine = get_feature_engine(audio_utils.SAMPLE_RATE, numcep)
+    if num_samples <= engine.frame_len:
+        return 1
+
+    return 1 + int(math.ceil((num_samples - engine.frame_len) / engine.frame_step))
+
+
+def _resampled_chunks(wav_filename, chunk_seconds, resample_quality):
+    """
+    Generator of mono float chunks of the audio resampled to audio_utils.SAMPLE_RATE
+    :return: generator of tuples (signal chunk, flag of the last chunk)
+    """
+    try:
+        samples, sample_rate, scale = wav_utils.read_wav(wav_filename)
+    except wav_utils.UnsupportedWavError:
+        import librosa
+        signal, sample_rate = librosa.load(wav_filename, sr=audio_utils.SAMPLE_RATE)
+        samples, scale = signal[:, None], 1.
+
+    chunk_len = max(1, int(chunk_seconds * sample_rate))
+    resampler = StreamingResampler(sample_rate, audio_utils.SAMPLE_RATE, resample_quality)
+
+    num_samples = len(samples)
+    for start in range(0, max(num_samples, 1), chunk_len):
+        chunk = samples[start:start + chunk_len]
+
+        # copies only the current chunk out of the memory mapped file
+        signal = chunk.mean(axis=1, dtype=np.float64)
+        if scale != 1.:
+            signal *= scale
+
+        is_last = start + chunk_len >= num_samples
+
+        yield resampler.process(signal, final=is_last), is_last
+
+
+class StreamingResampler(object):
+    """
+    Polyphase resampler of a signal coming in chunks.
+    The output is equal to scipy.signal.resample_poly of the whole signal with wav_utils.polyphase_filter,
+    the filter history is carried between chunks.
+    """
+
+    def __init__(self, orig_sample_rate, sample_rate, quality='medium'):
+        """
+        Initializer of StreamingResampler object
+        :param int orig_sample_rate: sample rate of the input signal
+        :param int sample_rate: sample rate of the output signal
+        :param str quality: resampling quality, one of wav_utils.RESAMPLE_QUALITY
+        """
+        gcd = math.gcd(int(orig_sample_rate), int(sample_rate))
+        self.up = int(sample_rate) // gcd
+        self.down = int(orig_sample_rate) // gcd
+
+        if self.up != self.down:
+            h = wav_utils.polyphase_filter(self.up, self.down, quality) * self.up
+
+            # same alignment of the output samples as in resample_poly
+            half_len = (len(h) - 1) // 2
+            pre_pad = self.down - half_len % self.down
+            self._filter = np.concatenate((np.zeros(pre_pad), h))
+            self._pre_remove = (half_len + pre_pad) // self.down
+
+            # global index of the first buffered input sample, always multiple of down
+            self._offset = 0
+            self._buffer = np.zeros(0)
+            self._received = 0
+            self._next_output = self._pre_remove
+
+    def process(self, chunk, final=False):
+        """
+        Resamples next chunk of the signal.
+        :param np.ndarray chunk: next input samples
+        :param bool final: flag of the last chunk, flushes the filter tail
+        :return: all the output samples which can be computed so far
+        """
+        if self.up == self.down:
+            return chunk
+
+        from scipy.signal import upfirdn
+
+        self._buffer = np.concatenate((self._buffer, chunk))
+        self._received += len(chunk)
+
+        total_output = -(-self._received * self.up // self.down)
+
+        if final:
+            last_output = self._pre_remove + total_output - 1
+            # zeros after the end of signal for the filter tail
+            buffer = np.concatenate((self._buffer, np.zeros(len(self._filter) // self.up + 1)))
+        else:
+            # outputs whose filter window is fully covered by the received samples
+            last_output = total_output - 1
+            buffer = self._buffer
+
+        base = self._offset * self.up // self.down
+        if last_output < self._next_output:
+            return np.zeros(0)
+
+        output = upfirdn(self._filter, buffer, self.up, self.down)
+        output = output[self._next_output - base:last_output - base + 1]
+
+        self._next_output = last_output + 1
+
+        # keep only the samples in the filter window of the next output
+        first_needed = (self._next_output * self.down - len(self._filter) + 1) // self.up
+        new_offset = max(self._offset, first_needed // self.down * self.down)
+        self._buffer = self._buffer[new_offset - self._offset:]
+        self._offset = new_offset
+
+        return output
+
+
+class StreamingFramer(object):
+    """
+    Splits the signal coming in chunks to preemphasized overlapping frames.
+    The frames are the same as FeatureEngine.frame_signal of the whole signal.
+    """
+
+    def __init__(self, frame_len, frame_step, preemph):
+        """
+        Initializer of StreamingFramer object
+        :param int frame_len: number of samples in frame
+        :param int frame_step: number of samples between starts of successive frames
+        :param float preemph: preemphasis filter coefficient
+        """
+        self.frame_len = frame_len
+        self.frame_step = frame_step
+        self.preemph = preemph
+
+        self._buffer = np.zeros(0)
+        self._last_sample = None
+        self._received = 0
+        self._emitted_frames = 0
+
+    def process(self, chunk, final=False):
+        """
+        Frames next chunk of the signal.
+        :param np.ndarray chunk: next samples
+        :param bool final: flag of the last chunk, pads the last frame with zeros
+        :return: ndarray of shape (num_frames, frame_len) of all the frames completed so far
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+
+        emphasized = np.empty_like(chunk)
+        if len(chunk) > 0:
+            emphasized[0] = chunk[0] if self._last_sample is None else chunk[0] - self.preemph * self._last_sample
+            np.subtract(chunk[1:], self.preemph * chunk[:-1], out=emphasized[1:])
+            self._last_sample = chunk[-1]
+
+        self._buffer = np.concatenate((self._buffer, emphasized))
+        self._received += len(chunk)
+
+        if final:
+            if self._received <= self.frame_len:
+                total_frames = 1
+            else:
+                total_frames = 1 + int(math.ceil((self._received - self.frame_len) / self.frame_step))
+
+            num_frames = max(total_frames - self._emitted_frames, 0)
+            padded_len = (num_frames - 1) * self.frame_step + self.frame_len
+            if padded_len > len(self._buffer):
+                self._buffer = np.concatenate((self._buffer, np.zeros(padded_len - len(self._buffer))))
+        elif len(self._buffer) >= self.frame_len:
+            num_frames = 1 + (len(self._buffer) - self.frame_len) // self.frame_step
+        else:
+            num_frames = 0
+
+        if num_frames == 0:
+            return np.zeros((0, self.frame_len))
+
+        frames = np.lib.stride_tricks.as_strided(
+            self._buffer, shape=(num_frames, self.frame_len),
+            strides=(self._buffer.strides[0] * self.frame_step, self._buffer.strides[0]), writeable=False)
+
+        self._emitted_frames += num_frames
+        # the old buffer stays referenced by the frames view
+        self._buffer = self._buffer[num_frames * self.frame_step:]
+
+        return frames
+
+
+class RunningNormalizer(object):
+    """
+    Online normalization of features to zero mean and unit variance per coefficient.
+    Every frame is normalized by the statistics of all the frames seen so far including itself,
+    the statistics are updated by vectorized Welford update block by block.
+    """
+
+    def __init__(self, feature_size):
+        """
+        Initializer of RunningNormalizer object
+        :param int feature_size: size of feature vector
+        """
+        self.count = 0
+        self.mean = np.zeros(feature_size)
+        self.m2 = np.zeros(feature_size)
+
+    def normalize(self, features):
+        """
+        Normalizes next block of features and updates the running statistics.
+        :param np.ndarray features: ndarray of shape (num_frames, feature_size)
+        :return: normalized features
+        """
+        counts = self.count + np.arange(1, len(features) + 1)[:, None]
+
+        # sums shifted by the previous mean for numerical stability
+        shifted = features - self.mean
+        shifted_sum = np.cumsum(shifted, axis=0)
+        shifted_square_sum = np.cumsum(shifted * shifted, axis=0)
+
+        means = self.mean + shifted_sum / counts
+        m2 = self.m2 + shifted_square_sum - shifted_sum * shifted_sum / counts
+
+        std = np.sqrt(np.maximum(m2, 0.) / counts)
+        std[std == 0] = 1.
+
+        self.count = int(counts[-1, 0])
+        self.mean = means[-1]
+        self.m2 = m2[-1]
+
+        return (features - means) / std
+
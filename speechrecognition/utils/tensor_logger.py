@@ -24,7 +24,7 @@ class TensorLogger:
         :param int step: the step of the summary
         :param str summarizer: use the train summary writer or the test one
         :param scope: variable scope
-        :param tuple summaries_dict: the dict of the summaries values (tag,value)
+        :param tuple summaries_dict: the dict of the summaries values (tag,value), text is string or list of strings
         """
 
         summary_writer = self.train_summary_writer if summarizer == "train" else self.test_summary_writer
@@ -37,7 +37,7 @@ class TensorLogger:
 
                     if tag not in self.summary_ops:
 
-                        if isinstance(value, str):
+                        if isinstance(value, (str, list)):
                             self.summary_placeholders[tag] = tf.placeholder(tf.string, shape=(None), name=tag)
                             self.summary_ops[tag] = tf.summary.text(tag, self.summary_placeholders[tag])
                         else:
@@ -1,5 +1,4 @@
 import numpy as np
-import tensorflow as tf
 import re
 
 SPACE_TOKEN = '<space>'
@@ -8,6 +7,28 @@ SPACE_INDEX = 0
 
 FIRST_INDEX = ord('a') - 1  # 0 is reserved to space
 
+# byte translation of the batch encoder, upper case letters are lowered and all whitespaces become space,
+# the separator of the transcripts is kept and every other byte is deleted
+TRANSCRIPT_SEPARATOR = 0
+_TRANSLATION = bytearray(range(256))
+_TRANSLATION[ord('A'):ord('Z') + 1] = range(ord('a'), ord('z') + 1)
+_TRANSLATION[9:14] = b' ' * 5
+TRANSLATION_TABLE = bytes(_TRANSLATION)
+DELETED_BYTES = bytes(b for b in range(256)
+                      if not (ord('a') <= b <= ord('z') or ord('A') <= b <= ord('Z') or 9 <= b <= 13
+                              or b in (ord(' '), TRANSCRIPT_SEPARATOR)))
+
+# label index -> byte of the batch decoder, the index after 'z' (CTC blank) and unknown indexes are deleted
+DELETED_CHAR = 0
+CHAR_TABLE = np.full(256, DELETED_CHAR, dtype=np.uint8)
+CHAR_TABLE[1:ord('z') - FIRST_INDEX + 1] = np.arange(ord('a'), ord('z') + 1)
+CHAR_TABLE[SPACE_INDEX] = ord(' ')
+
+# byte -> label index of the batch encoder
+LABEL_TABLE = np.zeros(256, dtype=np.int8)
+LABEL_TABLE[ord('a'):ord('z') + 1] = np.arange(ord('a'), ord('z') + 1) - FIRST_INDEX
+LABEL_TABLE[ord(' ')] = SPACE_INDEX
+
 
 def get_refactored_transcript(txt, is_filename=True, is_digit=True):
     """"
@@ -29,6 +50,66 @@ def get_refactored_transcript(txt, is_filename=True, is_digit=True):
 
     return chars_to_index(text_by_chars)
 
+def encode_transcripts(texts, dtype=np.int8):
+    """
+    Encodes batch of transcripts at once to labels in CSR format, the i-th label is values[offsets[i]:offsets[i + 1]].
+    The labels are the same as of get_refactored_transcript, but the transcripts are joined to one byte string,
+    cleaned by single bytes.translate and the whitespaces are collapsed and the bytes mapped to indexes by numpy.
+    Non ASCII characters are dropped.
+
+    :param list texts: transcripts
+    :param dtype: dtype of the label values, the indexes fit to int8
+    :return: tuple of (label values, int64 offsets of shape (len(texts) + 1,))
+    """
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    if not texts:
+        return np.zeros(0, dtype=dtype), offsets
+
+    encoded = chr(TRANSCRIPT_SEPARATOR).join(texts).encode('ascii', 'ignore').translate(TRANSLATION_TABLE, DELETED_BYTES)
+
+    # separator at the end closes the last transcript
+    chars = np.frombuffer(encoded + bytes([TRANSCRIPT_SEPARATOR]), dtype=np.uint8)
+
+    is_separator = chars == TRANSCRIPT_SEPARATOR
+    is_space = chars == ord(' ')
+
+    # the space is kept only between two letters of the transcript, the first of the spaces represents them
+    positions = np.arange(len(chars))
+    next_non_space = np.minimum.accumulate(np.where(is_space, len(chars) - 1, positions)[::-1])[::-1]
+    previous = np.concatenate(([TRANSCRIPT_SEPARATOR], chars[:-1]))
+
+    keep_space = is_space & (previous != ord(' ')) & (previous != TRANSCRIPT_SEPARATOR) & \
+                 ~is_separator[next_non_space]
+    keep = (~is_space & ~is_separator) | keep_space
+
+    transcript_ids = np.cumsum(is_separator) - is_separator
+    np.cumsum(np.bincount(transcript_ids[keep], minlength=len(texts)), out=offsets[1:])
+
+    return LABEL_TABLE[chars[keep]].astype(dtype, copy=False), offsets
+
+
+def normalize_transcript(text):
+    """
+    Cleans the transcript the same way as encode_transcripts, lower case letters separated by single spaces.
+    The normalized transcript is encoded to the same label as the original one.
+    :param str text: transcript
+    :return: normalized transcript
+    """
+    cleaned = text.encode('ascii', 'ignore').translate(TRANSLATION_TABLE, DELETED_BYTES + bytes([TRANSCRIPT_SEPARATOR]))
+
+    return ' '.join(cleaned.decode('ascii').split())
+
+
+def split_labels(values, offsets):
+    """
+    Splits the CSR labels to list of views into the values.
+    :param np.ndarray values: label values
+    :param np.ndarray offsets: offsets of the labels
+    :return: list of ndarrays
+    """
+    return np.split(values, offsets[1:-1])
+
+
 def read_txt(filename):
     """
     Reades text file
@@ -96,6 +177,33 @@ def index_to_text(text_index):
 
     return char_text
 
+def decode_sparse(decoded):
+    """
+    Decodes batch of CTC outputs in sparse format to one string per utterance.
+    The indexes are mapped to characters by lookup table and separators are inserted between the utterances,
+    so the whole batch is converted to text by single decode and split.
+    :param decoded: tuple of (indices, values, dense_shape) or tf.SparseTensorValue, values are in row major order
+    :return: list of strings aligned with the batch
+    """
+    indices, values, shape = decoded
+    batch_size = int(shape[0])
+
+    if batch_size == 0:
+        return []
+
+    values = np.asarray(values, dtype=np.int64)
+    rows = np.asarray(indices, dtype=np.int64).reshape(-1, 2)[:, 0]
+
+    known = (values >= 0) & (values < len(CHAR_TABLE))
+    chars = np.where(known, CHAR_TABLE[np.where(known, values, 0)], DELETED_CHAR).astype(np.uint8)
+
+    # separator after every utterance except the last one
+    ends = np.cumsum(np.bincount(rows, minlength=batch_size))[:-1]
+    chars = np.insert(chars, ends, ord('\n'))
+
+    return chars.tobytes().translate(None, bytes([DELETED_CHAR])).decode('ascii').split('\n')
+
+
 def sparse_tuple_from(sequences, dtype=np.int32):
     """
     Create a sparse representention of x.
@@ -103,21 +211,92 @@ def sparse_tuple_from(sequences, dtype=np.int32):
     :param dtype: type
     :return: sparse format of sequence
     """
-    indices = []
-    values = []
+    return sparse_tuple_from_csr(*labels_to_csr(sequences), dtype=dtype)
 
-    for n, seq in enumerate(sequences):
-        indices.extend(zip([n] * len(seq), range(len(seq))))
-        values.extend(seq)
 
-    indices = np.asarray(indices, dtype=np.int64)
-    values = np.asarray(values, dtype=dtype)
-    shape = np.asarray([len(sequences), indices.max(0)[1] + 1], dtype=np.int64)
+def sparse_tuple_from_csr(values, offsets, dtype=np.int32):
+    """
+    Sparse representation of the labels in CSR format, the indices are derived from the offsets at once.
+    The i-th label is values[offsets[i]:offsets[i + 1]], the offsets don't need to start at zero,
+    so a batch can be slice of the corpus labels (see csr_slice).
+    :param np.ndarray values: label values
+    :param np.ndarray offsets: offsets of the labels
+    :param dtype: type of the values
+    :return: tuple of (indices, values, shape) of the sparse tensor
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    num_values = int(offsets[-1] - offsets[0])
+
+    indices = np.empty((num_values, 2), dtype=np.int64)
+    indices[:, 0] = np.repeat(np.arange(len(lengths)), lengths)
+    indices[:, 1] = np.arange(num_values) - np.repeat(offsets[:-1] - offsets[0], lengths)
+
+    values = np.asarray(values[offsets[0]:offsets[-1]], dtype=dtype)
+    shape = np.asarray([len(lengths), lengths.max() if len(lengths) else 0], dtype=np.int64)
 
     # return tf.SparseTensor(indices=indices, values=values, shape=shape)
     return indices, values, shape
 
 
+def labels_to_csr(labels):
+    """
+    Concatenates the labels to CSR format.
+    :param labels: sequence of label arrays
+    :return: tuple of (label values, int64 offsets of shape (len(labels) + 1,))
+    """
+    offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(label) for label in labels), dtype=np.int64, count=len(labels)), out=offsets[1:])
+
+    non_empty = [label for label in labels if len(label) > 0]
+    values = np.concatenate(non_empty) if non_empty else np.zeros(0, dtype=np.int32)
+
+    return values, offsets
+
+
+def csr_slice(values, offsets, start, end):
+    """
+    Labels start to end of the CSR labels, the result are views without copying.
+    :param np.ndarray values: label values
+    :param np.ndarray offsets: offsets of the labels
+    :param int start: index of the first label
+    :param int end: index after the last label
+    :return: tuple of (label values, offsets) of the slice
+    """
+    return values, offsets[start:end + 1]
+
+
+def csr_take(values, offsets, order):
+    """
+    Labels of the CSR labels in the order, all the values are gathered at once.
+    :param np.ndarray values: label values
+    :param np.ndarray offsets: offsets of the labels
+    :param np.ndarray order: indices of the taken labels
+    :return: tuple of (label values, offsets) of the taken labels
+    """
+    order = np.asarray(order, dtype=np.int64)
+    lengths = offsets[order + 1] - offsets[order]
+
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+
+    positions = np.arange(new_offsets[-1]) + np.repeat(offsets[order] - new_offsets[:-1], lengths)
+
+    return values[positions], new_offsets
+
+
+def ctc_min_length(label):
+    """
+    Minimal number of input frames CTC needs to emit the label.
+    Every character needs one frame and repeated characters need a blank frame between them.
+    :param np.ndarray label: array of character indexes
+    :return: int
+    """
+    label = np.asarray(label)
+
+    return len(label) + int(np.count_nonzero(label[1:] == label[:-1]))
+
+
 def text_number(num):
     """
     Mapping number to its word transcript
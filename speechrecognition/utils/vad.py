@@ -0,0 +1,75 @@
+import numpy as np
+from speechrecognition.utils.feature_engine import get_feature_engine
+
+# default threshold of the voiced frames in dB below the loudest frame of the utterance
+VAD_THRESHOLD = 40.
+
+# default seconds of silence kept before and after the voiced part
+VAD_PADDING = 0.1
+
+
+def voice_activity_bounds(signal, sample_rate, threshold=VAD_THRESHOLD, padding=VAD_PADDING):
+    """
+    Finds the voiced part of the signal by frame energy thresholding.
+    The signal is framed the same way as for the features, the log energies of all the frames are computed
+    at once and the frames louder than threshold dB below the loudest frame are voiced.
+    The leading and trailing silence is cut, the silence between the words is kept.
+
+    :param np.ndarray signal: 1D audio signal
+    :param int sample_rate: sample rate of the signal
+    :param float threshold: dB below the loudest frame, the quieter frames are silence
+    :param float padding: seconds of silence kept on both ends of the voiced part
+    :return: tuple of (start, end) frame of the voiced part
+    """
+    engine = get_feature_engine(sample_rate, 13)
+
+    frames = engine.frame_signal(signal)
+
+    energy = np.einsum('ij,ij->i', frames, frames)
+    log_energy = 10 * np.log10(np.maximum(energy, np.finfo(float).eps))
+
+    voiced = np.flatnonzero(log_energy >= log_energy.max() - threshold)
+
+    padding_frames = int(round(padding * sample_rate / engine.frame_step))
+
+    return max(0, voiced[0] - padding_frames), min(len(frames), voiced[-1] + 1 + padding_frames)
+
+
+def trim_silence(signal, sample_rate, threshold=VAD_THRESHOLD, padding=VAD_PADDING):
+    """
+    Cuts the leading and trailing silence of the signal, see voice_activity_bounds.
+    The result is a view of the signal, its features are the features of the voiced frames.
+
+    :param np.ndarray signal: 1D audio signal
+    :param int sample_rate: sample rate of the signal
+    :param float threshold: dB below the loudest frame, the quieter frames are silence
+    :param float padding: seconds of silence kept on both ends of the voiced part
+    :return: tuple of (trimmed signal, number of frames of the whole signal)
+    """
+    engine = get_feature_engine(sample_rate, 13)
+
+    start, end = voice_activity_bounds(signal, sample_rate, threshold, padding)
+
+    num_frames = engine.num_frames(len(signal))
+    if start == 0 and end == num_frames:
+        return signal, num_frames
+
+    return signal[start * engine.frame_step:(end - 1) * engine.frame_step + engine.frame_len], num_frames
+
+
+def vad_report(num_frames, trimmed_frames, frame_step=0.01):
+    """
+    Prints how many frames the voice activity trimming removed.
+    :param list num_frames: number of frames of the whole utterances
+    :param list trimmed_frames: number of frames of the trimmed utterances
+    :param float frame_step: step between two successive frames in seconds
+    :return: ratio of the removed frames
+    """
+    total = sum(num_frames)
+    removed = total - sum(trimmed_frames)
+    ratio = removed / total if total else 0.
+
+    print(f'Voice activity trimming removed {removed} of {total} frames '
+          f'({ratio * 100:.1f}%, {removed * frame_step:.1f}s of silence).')
+
+    return ratio
@@ -0,0 +1,219 @@
+import os
+import struct
+import numpy as np
+from functools import lru_cache
+from collections import namedtuple
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> (numpy dtype, scale to [-1, 1] float)
+SUPPORTED_FORMATS = {
+    (WAVE_FORMAT_PCM, 16): ('<i2', 1. / 32768),
+    (WAVE_FORMAT_PCM, 32): ('<i4', 1. / 2147483648),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): ('<f4', 1.),
+}
+
+# resampling quality -> (half length of the filter per rate, kaiser window beta, cutoff relative to nyquist)
+RESAMPLE_QUALITY = {
+    'fast': (4, 5.0, 0.95),
+    'medium': (10, 5.0, 0.95),
+    'high': (24, 8.0, 0.95),
+}
+
+WavHeader = namedtuple('WavHeader', ['format_tag', 'channels', 'sample_rate', 'bits_per_sample',
+                                     'data_offset', 'data_size'])
+
+
+class UnsupportedWavError(Exception):
+    """
+    Raised when the file is not a WAV file which can be read directly.
+    """
+    pass
+
+
+def read_wav_header(wav_filename):
+    """
+    Parses RIFF header of the WAV file and finds the position of the sample data.
+    :param str wav_filename: path to the WAV file
+    :exception UnsupportedWavError: it's raised when the file is not a RIFF WAVE file
+    :return: WavHeader
+    """
+    with open(wav_filename, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[0:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            raise UnsupportedWavError(f'{wav_filename} is not RIFF WAVE file')
+
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise UnsupportedWavError(f'{wav_filename} is missing data chunk')
+
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+
+                # extensible format stores the real format in the sub format GUID
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    format_tag = struct.unpack('<H', fmt[24:26])[0]
+
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise UnsupportedWavError(f'{wav_filename} has data chunk before fmt chunk')
+
+                return WavHeader(format_tag, channels, sample_rate, bits_per_sample, f.tell(), chunk_size)
+            else:
+                # skip unknown chunks (LIST, fact, ...), chunks are word aligned
+                f.seek(chunk_size + chunk_size % 2, 1)
+
+
+def read_wav(wav_filename):
+    """
+    Reads samples of PCM or float WAV file as memory mapped array, the samples are not copied.
+    :param str wav_filename: path to the WAV file
+    :exception UnsupportedWavError: it's raised for compressed or unusual sample formats
+    :return: tuple of (ndarray of shape (num_samples, channels), sample_rate, scale to [-1, 1] float)
+    """
+    header = read_wav_header(wav_filename)
+
+    sample_format = SUPPORTED_FORMATS.get((header.format_tag, header.bits_per_sample))
+    if sample_format is None:
+        raise UnsupportedWavError(f'{wav_filename} has unsupported format {header.format_tag} '
+                                  f'with {header.bits_per_sample} bits per sample')
+
+    dtype, scale = sample_format
+    frame_size = np.dtype(dtype).itemsize * header.channels
+
+    num_frames = wav_data_size(wav_filename, header) // frame_size
+    if num_frames == 0:
+        return np.zeros((0, header.channels), dtype=dtype), header.sample_rate, scale
+
+    samples = np.memmap(wav_filename, dtype=dtype, mode='r', offset=header.data_offset,
+                        shape=(num_frames, header.channels))
+
+    return samples, header.sample_rate, scale
+
+
+def wav_duration(wav_filename):
+    """
+    Duration of the WAV file computed from its header, the samples are not read.
+    :param str wav_filename: path to the WAV file
+    :return: duration in seconds, None when the header can't be read directly
+    """
+    try:
+        header = read_wav_header(wav_filename)
+    except UnsupportedWavError:
+        return None
+
+    frame_size = header.channels * header.bits_per_sample // 8
+    if frame_size == 0 or header.sample_rate == 0:
+        return None
+
+    return wav_data_size(wav_filename, header) // frame_size / header.sample_rate
+
+
+def wav_data_size(wav_filename, header):
+    """
+    Size of the samples in the WAV file, the data size in the header can be bogus for streamed
+    recordings (0 or 0xFFFFFFFF), so it's clamped to the bytes actually in the file.
+    :param str wav_filename: path to the WAV file
+    :param WavHeader header: header of the file read by read_wav_header
+    :return: size of the samples in bytes
+    """
+    return max(min(header.data_size, os.path.getsize(wav_filename) - header.data_offset), 0)
+
+
+def load_wav(wav_filename, sample_rate=None, quality='medium'):
+    """
+    Loads the WAV file as mono float32 signal in range [-1, 1] and resamples it to the sample rate.
+    Fast replacement of librosa.load, it falls back to librosa for formats it can't read directly.
+    :param str wav_filename: path to the WAV file
+    :param int sample_rate: target sample rate, None keeps the original one
+    :param str quality: resampling quality, one of RESAMPLE_QUALITY
+    :return: tuple of (signal, sample_rate)
+    """
+    try:
+        samples, orig_sample_rate, scale = read_wav(wav_filename)
+    except UnsupportedWavError:
+        import librosa
+        return librosa.load(wav_filename, sr=sample_rate)
+
+    if samples.shape[1] == 1:
+        signal = samples[:, 0].astype(np.float32)
+    else:
+        signal = samples.mean(axis=1, dtype=np.float32)
+
+    if scale != 1.:
+        signal *= scale
+
+    if sample_rate is None or sample_rate == orig_sample_rate:
+        return signal, orig_sample_rate
+
+    return resample(signal, orig_sample_rate, sample_rate, quality), sample_rate
+
+
+def write_wav(wav_filename, signal, sample_rate):
+    """
+    Writes the float signal in range [-1, 1] as mono 16-bit PCM WAV file, the samples out of the range are clipped.
+    :param str wav_filename: path to the written WAV file
+    :param np.ndarray signal: 1D float signal
+    :param int sample_rate: sample rate of the signal
+    """
+    samples = np.rint(np.clip(signal, -1., 1.) * 32767).astype('<i2')
+
+    data_size = samples.nbytes
+
+    with open(wav_filename, 'wb') as f:
+        f.write(struct.pack('<4sI4s', b'RIFF', 36 + data_size, b'WAVE'))
+        f.write(struct.pack('<4sIHHIIHH', b'fmt ', 16, WAVE_FORMAT_PCM, 1, sample_rate, sample_rate * 2, 2, 16))
+        f.write(struct.pack('<4sI', b'data', data_size))
+        f.write(samples.tobytes())
+
+
+def resample(signal, orig_sample_rate, sample_rate, quality='medium'):
+    """
+    Resamples the signal with polyphase filtering, the filter is designed only once per rate ratio.
+    :param np.ndarray signal: 1D signal
+    :param int orig_sample_rate: sample rate of the signal
+    :param int sample_rate: target sample rate
+    :param str quality: resampling quality, one of RESAMPLE_QUALITY
+    :return: resampled float32 signal
+    """
+    from scipy.signal import resample_poly
+
+    gcd = np.gcd(int(orig_sample_rate), int(sample_rate))
+    up, down = int(sample_rate) // gcd, int(orig_sample_rate) // gcd
+
+    if up == down:
+        return signal
+
+    return resample_poly(signal, up, down, window=polyphase_filter(up, down, quality)).astype(np.float32, copy=False)
+
+
+@lru_cache(maxsize=None)
+def polyphase_filter(up, down, quality='medium'):
+    """
+    Low pass anti-aliasing FIR filter for polyphase resampling by up/down.
+    :param int up: upsampling factor
+    :param int down: downsampling factor
+    :param str quality: resampling quality, one of RESAMPLE_QUALITY
+    :return: ndarray of filter coefficients
+    """
+    from scipy.signal import firwin
+
+    if quality not in RESAMPLE_QUALITY:
+        raise ValueError(f'Resample quality "{quality}" not understood, choose one of {tuple(RESAMPLE_QUALITY)}')
+
+    half_len_per_rate, beta, cutoff = RESAMPLE_QUALITY[quality]
+
+    max_rate = max(up, down)
+    half_len = half_len_per_rate * max_rate
+
+    # resample_poly applies the gain of the upsampling itself
+    return firwin(2 * half_len + 1, cutoff / max_rate, window=('kaiser', beta))
@@ -0,0 +1,320 @@
+"""
+Micro-benchmarks of the hot paths of the speech preprocessing on synthetic data of realistic sizes.
+
+Every benchmark reports operations per second and peak memory of one operation (traced by tracemalloc).
+Results can be saved as JSON baseline and later runs compared against it:
+
+    $ python -m test.benchmarks --save benchmark_baseline.json
+    $ python -m test.benchmarks --compare benchmark_baseline.json --threshold 0.2
+
+The comparison exits with error code when any benchmark is slower or uses more memory than the threshold allows.
+"""
+import os
+import json
+import time
+import random
+import string
+import tempfile
+import platform
+import tracemalloc
+import click
+import numpy as np
+
+from speechrecognition.utils import audio_utils, text_utils
+from speechrecognition.dataset.dataset_base import DatasetBase
+from speechrecognition.dataset.feature_store import to_object_array
+
+# sizes of the synthetic data, VCTK utterances are 1-10 s long with 30-150 characters transcripts
+SAMPLE_RATE = 48000
+AUDIO_SECONDS = 4.
+NUM_FEATURES = 13
+BATCH_SIZE = 32
+MIN_FRAMES, MAX_FRAMES = 100, 1000
+MIN_CHARS, MAX_CHARS = 30, 150
+
+# minimal time of the measurement of one benchmark in seconds
+MIN_TIME = 1.
+
+# allowed relative slow down or memory increase against the baseline
+THRESHOLD = 0.2
+
+
+def synthetic_wav(wav_filename, seconds=AUDIO_SECONDS, sample_rate=SAMPLE_RATE, seed=0):
+    """
+    Writes speech-like 16-bit PCM WAV file, noise modulated by a slow envelope.
+    :param str wav_filename: path to the created file
+    :param float seconds: duration of the audio
+    :param int sample_rate: sample rate of the audio
+    :param int seed: random seed
+    """
+    from scipy.io import wavfile
+
+    rng = np.random.RandomState(seed)
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    signal = envelope * (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * rng.randn(len(t)))
+
+    wavfile.write(wav_filename, sample_rate, (signal * 32767 / np.max(np.abs(signal))).astype(np.int16))
+
+
+def synthetic_transcripts(num_transcripts, seed=0):
+    """
+    Random transcripts of lower case words.
+    :param int num_transcripts: number of transcripts
+    :param int seed: random seed
+    :return: list of strings
+    """
+    rng = random.Random(seed)
+
+    transcripts = []
+    for _ in range(num_transcripts):
+        num_chars = rng.randint(MIN_CHARS, MAX_CHARS)
+        words = []
+        while sum(len(word) + 1 for word in words) < num_chars:
+            words.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))))
+        transcripts.append(' '.join(words).capitalize() + '.')
+
+    return transcripts
+
+
+def synthetic_features(num_utterances, seed=0):
+    """
+    Random feature matrices of random lengths.
+    :param int num_utterances: number of utterances
+    :param int seed: random seed
+    :return: list of ndarrays of shape (num_frames, NUM_FEATURES)
+    """
+    rng = np.random.RandomState(seed)
+
+    return [rng.randn(rng.randint(MIN_FRAMES, MAX_FRAMES), NUM_FEATURES).astype(np.float32)
+            for _ in range(num_utterances)]
+
+
+def benchmarks(work_dir):
+    """
+    Creates the benchmarked operations with their synthetic inputs.
+    :param str work_dir: directory for the synthetic audio files
+    :return: dict of benchmark name -> function without arguments
+    """
+    wav_filename = os.path.join(work_dir, 'synthetic.wav')
+    synthetic_wav(wav_filename)
+
+    transcripts = synthetic_transcripts(BATCH_SIZE)
+    labels = [text_utils.get_refactored_transcript(transcript, is_filename=False, is_digit=False)
+              for transcript in transcripts]
+
+    sparse_labels = text_utils.sparse_tuple_from(labels)
+
+    features = synthetic_features(BATCH_SIZE)
+    assembler = audio_utils.BatchAssembler()
+
+    dataset = DatasetBase(NUM_FEATURES, 0)
+    dataset._audios = to_object_array(synthetic_features(BATCH_SIZE * 8))
+    dataset._labels = to_object_array(
+        [text_utils.get_refactored_transcript(transcript, is_filename=False, is_digit=False)
+         for transcript in synthetic_transcripts(BATCH_SIZE * 8)])
+    dataset._num_examples = len(dataset._audios)
+
+    benchmarks = {
+        'audiofile_to_input_vector[psf]':
+            lambda: audio_utils.audiofile_to_input_vector(wav_filename, NUM_FEATURES, 0, engine='psf'),
+        'audiofile_to_input_vector[numpy,wav]':
+            lambda: audio_utils.audiofile_to_input_vector(wav_filename, NUM_FEATURES, 0, engine='numpy',
+                                                          loader='wav'),
+        'get_refactored_transcript':
+            lambda: [text_utils.get_refactored_transcript(transcript, is_filename=False, is_digit=False)
+                     for transcript in transcripts],
+        'encode_transcripts':
+            lambda: text_utils.encode_transcripts(transcripts),
+        'sparse_tuple_from':
+            lambda: text_utils.sparse_tuple_from(labels),
+        'decode_sparse':
+            lambda: text_utils.decode_sparse(sparse_labels),
+        'pad_sequences':
+            lambda: audio_utils.pad_sequences(features),
+        'BatchAssembler.pad':
+            lambda: assembler.pad(features),
+        'BatchAssembler.ragged':
+            lambda: assembler.ragged(features),
+        'DatasetBase.next_batch':
+            lambda: dataset.next_batch(BATCH_SIZE),
+    }
+
+    # the input pipeline benchmarks need tensorflow
+    try:
+        import tensorflow
+    except ImportError:
+        return benchmarks
+
+    benchmarks['tf.data[plain]'] = input_pipeline(augment=False)
+    benchmarks['tf.data[spec_augment]'] = input_pipeline(augment=True)
+
+    return benchmarks
+
+
+def input_pipeline(augment, num_batches=8):
+    """
+    Creates tf.data pipeline of padded batches like TensorIterator, optionally augmented by SpecAugment.
+    :param bool augment: apply SpecAugment masking to the batches
+    :param int num_batches: number of batches in the dataset
+    :return: function which reads one batch from the pipeline
+    """
+    import tensorflow as tf
+    from speechrecognition.trainer.spec_augment import SpecAugment
+
+    x, x_length = audio_utils.pad_sequences(synthetic_features(BATCH_SIZE * num_batches))
+
+    graph = tf.Graph()
+    with graph.as_default():
+        dataset = tf.data.Dataset.from_tensor_slices((x, x_length, x_length)).batch(BATCH_SIZE)
+
+        if augment:
+            spec_augment = SpecAugment(NUM_FEATURES)
+            dataset = dataset.map(lambda input, length, seq_length: spec_augment(input, length, seq_length))
+
+        next_batch = dataset.repeat().make_one_shot_iterator().get_next()
+
+    session = tf.Session(graph=graph)
+
+    return lambda: session.run(next_batch)
+
+
+def measure(fn, min_time=MIN_TIME):
+    """
+    Measures the speed and peak memory of the operation.
+    The operation is repeated until min_time elapses, the fastest of 3 rounds is reported.
+    :param function fn: benchmarked operation
+    :param float min_time: minimal time of the measurement in seconds
+    :return: dict with ops_per_sec and peak_memory in bytes
+    """
+    # warm up, fills the caches and the reused buffers
+    fn()
+
+    start_time = time.perf_counter()
+    number = 0
+    while time.perf_counter() - start_time < min_time / 3 or number == 0:
+        fn()
+        number += 1
+
+    best_time = float('inf')
+    for _ in range(3):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best_time = min(best_time, (time.perf_counter() - start_time) / number)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'ops_per_sec': 1. / best_time, 'peak_memory': peak_memory}
+
+
+def run_benchmarks(name_filter=None, min_time=MIN_TIME):
+    """
+    Runs the benchmarks.
+    :param str name_filter: runs only benchmarks whose name contains it
+    :param float min_time: minimal time of the measurement of one benchmark in seconds
+    :return: dict of benchmark name -> measured results
+    """
+    results = {}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, fn in benchmarks(work_dir).items():
+            if name_filter and name_filter not in name:
+                continue
+
+            results[name] = measure(fn, min_time)
+            print(f'{name:40s} {results[name]["ops_per_sec"]:12.1f} ops/s '
+                  f'{results[name]["peak_memory"] / 2**20:10.2f} MB peak')
+
+    return results
+
+
+def save_baseline(results, baseline_path):
+    """
+    Saves the results as JSON baseline together with the description of the machine.
+    :param dict results: results of run_benchmarks
+    :param str baseline_path: path to the JSON file
+    """
+    baseline = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform()},
+        'benchmarks': results,
+    }
+
+    with open(baseline_path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def load_baseline(baseline_path):
+    """
+    Loads the results of JSON baseline.
+    :param str baseline_path: path to the JSON file
+    :return: dict of benchmark name -> results
+    """
+    with open(baseline_path) as f:
+        return json.load(f)['benchmarks']
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compares the results against the baseline.
+    :param dict results: results of run_benchmarks
+    :param dict baseline: results of the baseline
+    :param float threshold: allowed relative slow down or memory increase
+    :return: list of regression descriptions, empty when there is none
+    """
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        base = baseline[name]
+
+        speed_ratio = result['ops_per_sec'] / base['ops_per_sec']
+        if speed_ratio < 1. - threshold:
+            regressions.append(f'{name}: {result["ops_per_sec"]:.1f} ops/s is {(1 - speed_ratio) * 100:.0f}% slower '
+                               f'than baseline {base["ops_per_sec"]:.1f} ops/s')
+
+        if base['peak_memory'] > 0 and result['peak_memory'] > base['peak_memory'] * (1. + threshold):
+            regressions.append(f'{name}: peak memory {result["peak_memory"]} B is over '
+                               f'baseline {base["peak_memory"]} B')
+
+    return regressions
+
+
+@click.command()
+@click.option('--save', 'save_path', type=click.Path(), help='Save the results as JSON baseline.')
+@click.option('--compare', 'compare_path', type=click.Path(exists=True), help='Compare the results to JSON baseline.')
+@click.option('--threshold', type=float, default=THRESHOLD, show_default=True,
+              help='Allowed relative slow down or memory increase.')
+@click.option('--filter', 'name_filter', help='Run only benchmarks whose name contains the text.')
+@click.option('--min-time', type=float, default=MIN_TIME, show_default=True,
+              help='Minimal time of one benchmark in seconds.')
+def main(save_path, compare_path, threshold, name_filter, min_time):
+
+    results = run_benchmarks(name_filter, min_time)
+
+    if save_path:
+        save_baseline(results, save_path)
+        print(f'Saved baseline to {save_path}')
+
+    if compare_path:
+        regressions = compare(results, load_baseline(compare_path), threshold)
+
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+
+        if regressions:
+            raise SystemExit(1)
+
+        print(f'No regression over {threshold * 100:.0f}% against {compare_path}')
+
+
+if __name__ == '__main__':
+    main()
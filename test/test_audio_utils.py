@@ -0,0 +1,89 @@
+import numpy as np
+from speechrecognition.utils import audio_utils
+
+
+def _sequences():
+    return [np.random.rand(length, 13) for length in (30, 5, 0, 42)]
+
+
+def test_pad_sequences():
+
+    sequences = _sequences()
+
+    x, lengths = audio_utils.pad_sequences(sequences, value=-1.)
+
+    assert x.shape == (4, 42, 13) and x.dtype == np.float32
+    assert lengths.tolist() == [30, 5, 0, 42]
+    assert np.allclose(x[0, :30], sequences[0]) and np.all(x[0, 30:] == -1.)
+    assert np.all(x[2] == -1.)
+
+    x, _ = audio_utils.pad_sequences(sequences, maxlen=10, padding='pre', truncating='pre')
+
+    assert x.shape == (4, 10, 13)
+    assert np.allclose(x[1, 5:], sequences[1]) and np.all(x[1, :5] == 0.)
+    assert np.allclose(x[3], sequences[3][-10:])
+
+
+def test_batch_assembler_reuses_buffers():
+
+    assembler = audio_utils.BatchAssembler()
+    sequences = _sequences()
+
+    x, lengths = assembler.pad(sequences)
+    expected, expected_lengths = audio_utils.pad_sequences(sequences)
+
+    assert np.array_equal(x, expected) and np.array_equal(lengths, expected_lengths)
+
+    # smaller batch fits to the same buffer
+    y, _ = assembler.pad(sequences[:2])
+    assert np.shares_memory(x, y)
+
+    values, row_splits = assembler.ragged(sequences)
+
+    assert row_splits.tolist() == [0, 30, 35, 35, 77]
+    for i, sequence in enumerate(sequences):
+        assert np.allclose(values[row_splits[i]:row_splits[i + 1]], sequence)
+
+
+def test_context_windows():
+
+    features = np.random.rand(20, 13)
+    k = 3
+
+    windows = audio_utils.context_windows(features, k)
+
+    padded = np.concatenate((np.zeros((k, 13)), features, np.zeros((k, 13))))
+    expected = np.stack([padded[i:i + 2 * k + 1].reshape(-1) for i in range(20)])
+
+    assert windows.shape == (20, 13 * (2 * k + 1))
+    assert np.array_equal(windows, expected)
+
+    # windows of the padded batch are views, the frames aren't copied per window
+    x, _ = audio_utils.pad_sequences(_sequences())
+    batch_windows = audio_utils.context_windows(x, k)
+
+    assert batch_windows.shape == (4, 42, 13 * (2 * k + 1))
+    assert np.array_equal(batch_windows[3, 10], np.concatenate(x[3, 10 - k:10 + k + 1]))
+    assert batch_windows.base is not None and not batch_windows.flags.writeable
+
+
+def test_stack_frames():
+
+    sequences = _sequences()
+    x, x_length = audio_utils.pad_sequences(sequences, multiple=4)
+
+    assert x.shape == (4, 44, 13)
+
+    stacked, stacked_length = audio_utils.stack_frames(x, x_length, 4)
+
+    assert stacked.shape == (4, 11, 52)
+    assert stacked_length.tolist() == [8, 2, 0, 11]
+    assert np.shares_memory(stacked, x)
+    assert np.array_equal(stacked[0, 1], sequences[0][4:8].reshape(-1).astype(np.float32))
+
+    # the last stacked frame is completed by the padding
+    assert np.array_equal(stacked[1, 1], np.concatenate([sequences[1][4], np.zeros(39)]).astype(np.float32))
+
+    # batch of length which isn't multiple is padded
+    x, x_length = audio_utils.pad_sequences(sequences)
+    assert audio_utils.stack_frames(x, x_length, 4)[0].shape == (4, 11, 52)
@@ -0,0 +1,27 @@
+from test import benchmarks
+
+
+def test_compare_baseline():
+
+    baseline = {'pad_sequences': {'ops_per_sec': 100., 'peak_memory': 1000}}
+
+    assert benchmarks.compare({'pad_sequences': {'ops_per_sec': 90., 'peak_memory': 1100}}, baseline, 0.2) == []
+
+    regressions = benchmarks.compare({'pad_sequences': {'ops_per_sec': 50., 'peak_memory': 2000}}, baseline, 0.2)
+    assert len(regressions) == 2
+
+    # new benchmarks have nothing to be compared with
+    assert benchmarks.compare({'sparse_tuple_from': {'ops_per_sec': 1., 'peak_memory': 1}}, baseline, 0.2) == []
+
+
+def test_run_benchmarks(tmpdir):
+
+    results = benchmarks.run_benchmarks(name_filter='BatchAssembler', min_time=0.01)
+
+    assert set(results) == {'BatchAssembler.pad', 'BatchAssembler.ragged'}
+    assert all(result['ops_per_sec'] > 0 for result in results.values())
+
+    baseline_path = str(tmpdir.join('baseline.json'))
+    benchmarks.save_baseline(results, baseline_path)
+
+    assert benchmarks.load_baseline(baseline_path) == results
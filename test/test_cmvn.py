@@ -0,0 +1,71 @@
+import numpy as np
+from speechrecognition.utils import audio_utils
+from speechrecognition.utils.cmvn import CMVN, params_digest
+
+
+def _utterances():
+    rng = np.random.RandomState(0)
+    return [rng.randn(length, 13) * 4 + 10 for length in (30, 120, 7, 64)]
+
+
+def test_cmvn_statistics():
+
+    utterances = _utterances()
+    speakers = ['a', 'b', 'a', 'b']
+
+    cmvn = CMVN(13, per_speaker=True)
+    for features, speaker in zip(utterances, speakers):
+        cmvn.update(features, speaker)
+
+    frames = np.concatenate(utterances)
+    assert cmvn.count() == len(frames)
+    assert np.allclose(cmvn.mean(), frames.mean(axis=0))
+    assert np.allclose(cmvn.std(), frames.std(axis=0))
+
+    speaker_frames = np.concatenate([utterances[0], utterances[2]])
+    assert np.allclose(cmvn.mean('a'), speaker_frames.mean(axis=0))
+    assert np.allclose(cmvn.std('a'), speaker_frames.std(axis=0))
+
+    # unknown speaker falls back to the global statistics
+    assert np.array_equal(cmvn.mean('unknown'), cmvn.mean())
+
+
+def test_cmvn_normalize_batch(tmpdir):
+
+    utterances = _utterances()
+
+    cmvn = CMVN(13)
+    for features in utterances:
+        cmvn.update(features)
+
+    x, lengths = audio_utils.pad_sequences(utterances)
+    cmvn.normalize_batch(x, lengths)
+
+    assert np.allclose(x[1, :120], (utterances[1] - cmvn.mean()) / cmvn.std(), atol=1e-5)
+    assert np.all(x[0, 30:] == 0.)
+
+    cmvn_path = str(tmpdir.join('cmvn.npz'))
+    cmvn.save(cmvn_path)
+    loaded = CMVN.load(cmvn_path)
+
+    assert loaded.count() == cmvn.count()
+    assert np.array_equal(loaded.mean(), cmvn.mean()) and np.array_equal(loaded.std(), cmvn.std())
+
+    # the saved statistics normalize the same way
+    assert loaded.digest() == cmvn.digest()
+    loaded.update(utterances[0])
+    assert loaded.digest() != cmvn.digest()
+
+
+def test_cmvn_params(tmpdir):
+
+    cmvn_path = str(tmpdir.join('cmvn.npz'))
+
+    cmvn = CMVN(13, params=params_digest({'numcep': 13, 'deltas': 0}))
+    cmvn.update(_utterances()[0])
+    cmvn.save(cmvn_path)
+
+    # the statistics remember the features they were accumulated for
+    loaded = CMVN.load(cmvn_path)
+    assert loaded.params == params_digest({'deltas': 0, 'numcep': 13})
+    assert loaded.params != params_digest({'numcep': 13, 'deltas': 1})
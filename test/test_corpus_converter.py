@@ -0,0 +1,32 @@
+import os
+import shutil
+import numpy as np
+from speechrecognition.dataset.corpus_converter import convert_corpus
+from speechrecognition.utils import wav_utils
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+def test_convert_corpus(tmpdir):
+
+    dataset_path = str(tmpdir)
+    shutil.copytree(ABS_PATH + '/fixtures/vctk/wav48', os.path.join(dataset_path, 'wav48'))
+
+    source_filenames = sorted(os.listdir(os.path.join(dataset_path, 'wav48', 'p225')))
+
+    converted, skipped = convert_corpus(dataset_path, num_workers=2, chunk_size=2)
+    assert converted == len(source_filenames) and skipped == 0
+    assert sorted(os.listdir(os.path.join(dataset_path, 'wav16', 'p225'))) == source_filenames
+
+    source_filename = os.path.join(dataset_path, 'wav48', 'p225', source_filenames[0])
+    target_filename = os.path.join(dataset_path, 'wav16', 'p225', source_filenames[0])
+
+    samples, sample_rate, _ = wav_utils.read_wav(target_filename)
+    expected, _ = wav_utils.load_wav(source_filename, sample_rate=16000)
+
+    assert sample_rate == 16000 and samples.dtype == np.int16 and samples.shape[1] == 1
+    assert np.max(np.abs(samples[:, 0] / 32767 - expected)) < 1e-4
+
+    # removed file is converted again, the rest is skipped
+    os.remove(target_filename)
+    assert convert_corpus(dataset_path) == (1, len(source_filenames) - 1)
@@ -1,4 +1,5 @@
 import os
+import numpy as np
 
 ABS_PATH = os.path.abspath(os.path.dirname(__file__))
 
@@ -34,6 +35,219 @@ def test_speech_targets(vctk_dataset):
     assert x.shape[0] == len(x_length)
     assert y_sparse[0].shape[0] == y_sparse[1].shape[0]
 
+    vctk_dataset.use_context = True
+    try:
+        x, _, _ = vctk_dataset.train_dataset()
+        assert x.shape[2] == vctk_dataset.input_size() == (2 * vctk_dataset.num_context + 1) * vctk_dataset.num_features
+
+        # the context windows are left to the batches in the graph
+        x, _, _ = vctk_dataset.train_dataset(context=False)
+        assert x.shape[2] == vctk_dataset.stacked_size() == vctk_dataset.num_features
+    finally:
+        # the dataset fixture is shared by the session
+        vctk_dataset.use_context = False
+
+
+def test_sorted_train_dataset(vctk_dataset):
+
+    x, y_sparse, x_length = vctk_dataset.train_dataset(sort_by_length=True)
+
+    assert np.all(np.diff(x_length) >= 0)
+    assert sorted(x_length.tolist()) == sorted(len(audio) for audio in vctk_dataset._train_audios)
+
+
+def test_parallel_feature_extraction(vctk_dataset):
+
+    audio_filenames, _ = vctk_dataset.get_dataset_filenames()
+
+    serial_audios = vctk_dataset.extract_features(audio_filenames)
+
+    vctk_dataset.num_workers = 2
+    parallel_audios = vctk_dataset.extract_features(audio_filenames)
+    vctk_dataset.num_workers = 1
+
+    assert len(serial_audios) == len(parallel_audios)
+    assert all(np.array_equal(s, p) for s, p in zip(serial_audios, parallel_audios))
+
+
+def test_frame_stack_drops_unfit_utterances(vctk_dataset):
+
+    vctk_dataset.read_dataset()
+    num_train = len(vctk_dataset._train_audios)
+
+    try:
+        # stacking of 2 frames keeps all the VCTK utterances
+        vctk_dataset.frame_stack = 2
+        vctk_dataset.drop_unfit_utterances()
+        assert len(vctk_dataset._train_audios) == num_train
+
+        x, y_sparse, x_length = vctk_dataset.train_dataset()
+        assert x.shape[2] == vctk_dataset.input_size() == 2 * vctk_dataset.num_features
+        assert x_length.tolist() == [(len(audio) + 1) // 2 for audio in vctk_dataset._train_audios]
+
+        # no utterance fits 1 s frames
+        vctk_dataset.frame_stack = 100
+        vctk_dataset.drop_unfit_utterances()
+        assert len(vctk_dataset._train_audios) == 0 and len(vctk_dataset._test_audios) == 0
+    finally:
+        # the dataset fixture is shared by the session
+        vctk_dataset.frame_stack = 1
+        vctk_dataset.read_dataset()
+
+def test_stream_dataset(vctk_dataset, tmp_path):
+
+    from speechrecognition.dataset.vctk_dataset import VCTKDataset
+    from speechrecognition.dataset.feature_store import StoreOptions
+
+    vctk_dataset.read_dataset()
+
+    stream_dataset = VCTKDataset(vctk_dataset.dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                                 vctk_dataset.num_context, mode='stream')
+
+    # the manifest is split the same way as the features of the memory mode
+    utterances = list(stream_dataset.stream_dataset('train'))
+    assert len(utterances) == stream_dataset.num_utterances('train') == len(vctk_dataset._train_audios)
+    assert all(np.array_equal(audio, memory_audio) and np.array_equal(label, memory_label)
+               for (audio, label), memory_audio, memory_label in
+               zip(utterances, vctk_dataset._train_audios, vctk_dataset._train_labels))
+    assert all(audio.dtype == np.float32 and label.dtype == np.int32 for audio, label in utterances)
+
+    # the memory mode streams the features in memory
+    assert all(np.array_equal(audio, memory_audio) for (audio, _), (memory_audio, _) in
+               zip(utterances, vctk_dataset.stream_dataset('train')))
+
+    shuffled = list(stream_dataset.stream_dataset('train', shuffle=True))
+    assert sorted(len(audio) for audio, _ in shuffled) == sorted(len(audio) for audio, _ in utterances)
+
+    # the audio files are sorted by their manifest durations
+    lengths = [len(audio) for audio, _ in stream_dataset.stream_dataset('train', sort_by_length=True)]
+    assert lengths == sorted(len(audio) for audio, _ in utterances)
+
+    # the feature store is written on the first run and streamed from the next ones
+    store_path = str(tmp_path / 'store')
+    VCTKDataset(vctk_dataset.dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                vctk_dataset.num_context, mode='stream', store_options=StoreOptions(store_path))
+    store_dataset = VCTKDataset(vctk_dataset.dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                                vctk_dataset.num_context, mode='stream', store_options=StoreOptions(store_path))
+
+    assert store_dataset.num_utterances('test') == len(vctk_dataset._test_audios)
+
+    lengths = [len(audio) for audio, _ in store_dataset.stream_dataset('train', sort_by_length=True)]
+    assert lengths == sorted(len(audio) for audio in vctk_dataset._train_audios)
+
+
+def test_feature_store_params(vctk_dataset, tmp_path):
+
+    from speechrecognition.dataset.vctk_dataset import VCTKDataset
+    from speechrecognition.dataset.feature_store import FeatureStore, StoreOptions
+    from speechrecognition.dataset.manifest import ManifestOptions
+
+    store_path = str(tmp_path / 'store')
+
+    def open_dataset(storage_dtype='float32', test_ratio=0.3, **kwargs):
+        return VCTKDataset(vctk_dataset.dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                           vctk_dataset.num_context, store_options=StoreOptions(store_path, storage_dtype),
+                           manifest_options=ManifestOptions(test_ratio=test_ratio), **kwargs)
+
+    assert open_dataset().train_store is None
+    # the store of the same parameters is loaded
+    assert open_dataset().train_store is not None
+
+    # the store of other features is built again instead of being trained on
+    rebuilt_dataset = open_dataset(storage_dtype='float16')
+    assert rebuilt_dataset.train_store is None
+    assert FeatureStore.read_meta(str(tmp_path / 'store' / 'train'))['dtype'] == 'float16'
+    assert FeatureStore.read_meta(str(tmp_path / 'store' / 'train'))['params'] == rebuilt_dataset.store_params()
+
+    assert open_dataset(storage_dtype='float16').train_store is not None
+
+    # the split is stored with the features too
+    split_dataset = open_dataset(storage_dtype='float16', test_ratio=0.5)
+    assert split_dataset.train_store is None
+    assert len(split_dataset._test_audios) > len(rebuilt_dataset._test_audios)
+
+    test_dataset = open_dataset(storage_dtype='float16', test_ratio=0.5, sets=('test',))
+    assert test_dataset.test_store is not None
+    assert len(test_dataset._train_audios) == test_dataset.num_utterances('train') == 0
+    assert len(test_dataset._test_audios) == len(split_dataset._test_audios)
+
+
+def test_feature_store_corpus(vctk_dataset, tmp_path):
+
+    import shutil
+    from speechrecognition.dataset.vctk_dataset import VCTKDataset
+    from speechrecognition.dataset.feature_store import StoreOptions
+
+    dataset_path = str(tmp_path / 'vctk')
+    shutil.copytree(vctk_dataset.dataset_path, dataset_path)
+    store_path = str(tmp_path / 'store')
+
+    def open_dataset():
+        return VCTKDataset(dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                           vctk_dataset.num_context, mode='stream', store_options=StoreOptions(store_path))
+
+    num_utterances = open_dataset().num_utterances('train') + open_dataset().num_utterances('test')
+    assert open_dataset().store_params()['corpus']['num_utterances'] == num_utterances
+
+    # the store written before the corpus changed is built again instead of missing the new utterances
+    os.remove(os.path.join(dataset_path, 'wav48', 'p225', 'p225_010.wav'))
+
+    dataset = open_dataset()
+    assert dataset.num_utterances('train') + dataset.num_utterances('test') == num_utterances - 1
+
+
+def test_cmvn_statistics_params(vctk_dataset, tmp_path):
+
+    from speechrecognition.dataset.vctk_dataset import VCTKDataset
+    from speechrecognition.dataset.feature_store import StoreOptions
+    from speechrecognition.utils.cmvn import CMVN, params_digest
+
+    cmvn_path = str(tmp_path / 'cmvn.npz')
+
+    def open_dataset(storage_dtype='float32'):
+        return VCTKDataset(vctk_dataset.dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                           vctk_dataset.num_context, mode='stream', normalization='cmvn', cmvn_path=cmvn_path,
+                           store_options=StoreOptions(dtype=storage_dtype))
+
+    dataset = open_dataset()
+    assert CMVN.load(cmvn_path).params == params_digest(dataset.feature_params())
+
+    # the statistics of other features are accumulated again instead of being applied
+    dataset = open_dataset(storage_dtype='float16')
+    assert CMVN.load(cmvn_path).params == dataset.cmvn.params == params_digest(dataset.feature_params())
+
+
+def test_hash_split(vctk_dataset, digit_dataset):
+
+    from speechrecognition.dataset.vctk_dataset import VCTKDataset
+    from speechrecognition.dataset.digit_dataset import DigitDataset
+    from speechrecognition.dataset.manifest import ManifestOptions, hash_split
+
+    # only the test set is extracted
+    options = ManifestOptions(split='hash', test_ratio=0.5)
+    test_dataset = VCTKDataset(vctk_dataset.dataset_path, vctk_dataset.num_speakers, vctk_dataset.num_features,
+                               vctk_dataset.num_context, manifest_options=options, sets=('test',))
+
+    audio_filenames, labels, speakers, durations = test_dataset.read_manifest()
+    is_test = hash_split(np.asarray(audio_filenames), options)
+
+    assert len(test_dataset._train_audios) == 0
+    assert len(test_dataset._test_audios) == np.count_nonzero(is_test) > 0
+
+    # the assignment of the utterance doesn't depend on the rest of the corpus
+    assert hash_split(np.asarray(audio_filenames[::-1]), options)[::-1].tolist() == is_test.tolist()
+    assert hash_split(np.asarray(audio_filenames[:3]), options).tolist() == is_test[:3].tolist()
+
+    # speaker disjoint split, no features are extracted in the stream mode
+    options = ManifestOptions(split='hash', test_ratio=0.5, split_by_speaker=True)
+    speaker_dataset = DigitDataset(digit_dataset.dataset_path, digit_dataset.num_features, digit_dataset.num_context,
+                                   mode='stream', manifest_options=options)
+
+    speakers = np.asarray([f'speaker{i % 20}' for i in range(200)])
+    is_test = hash_split(np.asarray([f'{i}.wav' for i in range(200)]), options, speakers)
+
+    assert 0 < np.count_nonzero(is_test) < len(is_test)
+    assert not set(speakers[is_test]) & set(speakers[~is_test])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+from speechrecognition.utils.feature_cache import FeatureCache
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+WAV_FILENAMES = [
+    ABS_PATH + '/fixtures/audio_numbers/0/0_jackson_0.wav',
+    ABS_PATH + '/fixtures/audio_numbers/1/1_jackson_0.wav',
+    ABS_PATH + '/fixtures/audio_numbers/2/2_jackson_0.wav',
+]
+
+PARAMS = {'sample_rate': 16000, 'numcep': 13, 'normalization': 'frame'}
+
+
+def test_cache_roundtrip(tmpdir):
+
+    cache = FeatureCache(str(tmpdir))
+    features = np.random.rand(50, 13)
+
+    assert cache.get(WAV_FILENAMES[0], PARAMS) is None
+
+    cache.put(WAV_FILENAMES[0], PARAMS, features)
+
+    assert np.array_equal(cache.get(WAV_FILENAMES[0], PARAMS), features)
+    assert cache.get(WAV_FILENAMES[0], dict(PARAMS, numcep=26)) is None
+    assert cache.hits == 1 and cache.misses == 2
+
+    # entries are persistent between runs
+    assert len(FeatureCache(str(tmpdir))) == 1
+
+
+def test_cache_content_key(tmpdir):
+
+    cache = FeatureCache(str(tmpdir), hash_content=True)
+
+    assert cache.key(WAV_FILENAMES[0], PARAMS) != cache.key(WAV_FILENAMES[1], PARAMS)
+    assert cache.key(WAV_FILENAMES[0], PARAMS) == cache.key(WAV_FILENAMES[0], dict(PARAMS))
+
+
+def test_cache_lru_eviction(tmpdir):
+
+    features = np.zeros((100, 13))
+    entry_size = features.nbytes + 128
+
+    cache = FeatureCache(str(tmpdir), max_bytes=2 * entry_size)
+
+    cache.put(WAV_FILENAMES[0], PARAMS, features)
+    cache.put(WAV_FILENAMES[1], PARAMS, features)
+    # touch the first entry, so the second one is the least recently used
+    cache.get(WAV_FILENAMES[0], PARAMS)
+    cache.put(WAV_FILENAMES[2], PARAMS, features)
+
+    assert len(cache) == 2
+    assert cache.size() <= 2 * entry_size
+    assert cache.get(WAV_FILENAMES[1], PARAMS) is None
+    assert cache.get(WAV_FILENAMES[0], PARAMS) is not None
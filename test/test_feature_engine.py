@@ -0,0 +1,86 @@
+import os
+import glob
+import pytest
+import numpy as np
+from speechrecognition.utils import audio_utils
+from speechrecognition.utils.feature_engine import mel_filterbank, dct_matrix, get_feature_engine, \
+    num_coefficients, append_deltas
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+WAV_FILENAMES = sorted(glob.glob(ABS_PATH + '/fixtures/vctk/wav48/p225/*.wav'))[:3] + \
+                sorted(glob.glob(ABS_PATH + '/fixtures/audio_numbers/0/*.wav'))[:3]
+
+
+def test_filterbank_and_dct():
+
+    import python_speech_features as sf
+    from scipy.fftpack import dct
+
+    assert np.allclose(mel_filterbank(26, 512, 16000), sf.get_filterbanks(26, 512, 16000))
+
+    x = np.random.rand(10, 26)
+    assert np.allclose(x @ dct_matrix(26, 13), dct(x, type=2, axis=1, norm='ortho')[:, :13])
+
+
+def test_numpy_engine_matches_psf():
+
+    psf_features = audio_utils.audiofiles_to_input_vectors(WAV_FILENAMES, 13, 4, engine='psf')
+    numpy_features = audio_utils.audiofiles_to_input_vectors(WAV_FILENAMES, 13, 4, engine='numpy')
+
+    for psf, numpy in zip(psf_features, numpy_features):
+        assert psf.shape == numpy.shape
+        assert np.allclose(psf, numpy, atol=1e-3)
+
+
+def test_feature_types_share_one_stft():
+
+    signals = [audio_utils.load_signal(wav_filename)[0] for wav_filename in WAV_FILENAMES]
+    engine = get_feature_engine(audio_utils.SAMPLE_RATE, 13)
+
+    features = engine.features(signals, ('mfcc', 'fbank', 'spectrogram'))
+
+    for signal, mfcc, fbank, spectrogram in zip(signals, features['mfcc'], features['fbank'],
+                                                features['spectrogram']):
+        assert mfcc.shape[1] == 13 and fbank.shape[1] == 26 and spectrogram.shape[1] == 257
+        assert len(mfcc) == len(fbank) == len(spectrogram)
+
+    import python_speech_features as sf
+
+    for signal, mfcc, fbank in zip(signals, features['mfcc'], features['fbank']):
+        assert np.allclose(mfcc, sf.mfcc(signal, audio_utils.SAMPLE_RATE, numcep=13), atol=1e-3)
+        assert np.allclose(fbank, sf.logfbank(signal, audio_utils.SAMPLE_RATE), atol=1e-3)
+
+
+def test_deltas_match_psf():
+
+    import python_speech_features as sf
+
+    features = np.random.RandomState(0).randn(50, 13)
+
+    stacked = append_deltas(features, 2)
+    delta = sf.delta(features, 2)
+
+    assert stacked.shape == (50, 39)
+    assert np.allclose(stacked[:, :13], features)
+    assert np.allclose(stacked[:, 13:26], delta)
+    assert np.allclose(stacked[:, 26:], sf.delta(delta, 2))
+
+
+def test_feature_size_validation():
+
+    assert num_coefficients('mfcc', 39, deltas=2) == 13
+    assert num_coefficients('fbank', 40) == 40
+    assert num_coefficients('spectrogram', 514, deltas=1) == 257
+
+    for feature_type, feature_size, deltas in [('mfcc', 40, 0), ('mfcc', 13, 1), ('spectrogram', 13, 0),
+                                               ('mel', 13, 0)]:
+        with pytest.raises(ValueError):
+            num_coefficients(feature_type, feature_size, deltas)
+
+    with pytest.raises(ValueError):
+        audio_utils.audiofile_to_input_vector(WAV_FILENAMES[0], 40, 0, engine='psf', feature_type='fbank')
+
+    features = audio_utils.audiofile_to_input_vector(WAV_FILENAMES[0], 80, 0, engine='numpy',
+                                                     feature_type='fbank', deltas=1)
+    assert features.shape[1] == 80
@@ -0,0 +1,56 @@
+import io
+import numpy as np
+from speechrecognition.utils import audio_utils
+from speechrecognition.utils.feature_quantization import QuantizedFeatures, quantize, dequantize, \
+    save_features, load_features
+from speechrecognition.dataset.feature_store import FeatureStore
+
+
+def _features():
+    return [np.random.randn(length, 13) for length in (50, 12, 80)]
+
+
+def test_quantize_roundtrip():
+
+    for features in _features():
+        for storage_dtype, tolerance in (('float32', 1e-6), ('float16', 1e-2), ('int8', 0.05)):
+            stored = quantize(features, storage_dtype)
+
+            assert np.max(np.abs(dequantize(stored) - features)) < tolerance * np.max(np.abs(features))
+
+    quantized = quantize(_features()[0], 'int8')
+
+    assert isinstance(quantized, QuantizedFeatures) and quantized.values.dtype == np.int8
+    assert quantize(quantized, 'int8') is quantized
+    assert np.array_equal(dequantize(quantized[5:10]), dequantize(quantized)[5:10])
+
+
+def test_quantized_batch_assembly():
+
+    audios = _features()
+    stored = [quantize(features, 'int8') for features in audios]
+
+    x, lengths = audio_utils.pad_sequences(stored)
+    expected, _ = audio_utils.pad_sequences([dequantize(features) for features in stored])
+
+    assert x.dtype == np.float32
+    assert np.array_equal(x, expected)
+
+
+def test_quantized_save_load(tmpdir):
+
+    quantized = quantize(_features()[0], 'int8')
+
+    f = io.BytesIO()
+    save_features(f, quantized)
+    f.seek(0)
+    loaded = load_features(f)
+
+    assert np.array_equal(loaded.values, quantized.values) and loaded.scale == quantized.scale
+
+    audios = _features()
+    store = FeatureStore.write(str(tmpdir), [quantize(features, 'int8') for features in audios],
+                               [[1], [2], [3]], dtype='int8')
+
+    assert store.arena.dtype == np.int8
+    assert np.allclose(dequantize(store[2]), audios[2], atol=0.05 * np.max(np.abs(audios[2])))
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from speechrecognition.dataset.feature_store import FeatureStore, FeatureStoreWriter, StoreOptions, \
+    split_store_matches, open_split_store, write_split_store
+
+
+def test_store_roundtrip(tmpdir):
+
+    audios = [np.random.rand(length, 13).astype(np.float32) for length in (40, 7, 120)]
+    labels = [np.array([1, 2, 3]), np.array([], dtype=np.int32), np.array([5])]
+
+    assert not FeatureStore.exists(str(tmpdir))
+
+    store = FeatureStore.write(str(tmpdir), audios, labels)
+
+    assert FeatureStore.exists(str(tmpdir))
+    assert len(store) == 3
+
+    for i, (audio, label) in enumerate(zip(audios, labels)):
+        assert np.array_equal(store[i], audio)
+        assert np.array_equal(store.label(i), label)
+
+    # utterances are views into the memory mapped arena
+    assert isinstance(store[0], np.memmap)
+    assert store.audios().dtype == object and len(store.labels()) == 3
+
+
+def test_store_incomplete(tmpdir):
+
+    writer = FeatureStoreWriter(str(tmpdir))
+    writer.append(np.zeros((5, 13)), [1])
+
+    # meta is written on close only
+    assert not FeatureStore.exists(str(tmpdir))
+
+    writer.close()
+
+    assert FeatureStore.exists(str(tmpdir))
+    assert FeatureStore(str(tmpdir)).arena.shape == (5, 13)
+
+
+def test_split_store(tmpdir):
+
+    store_path = str(tmpdir)
+    params = {'numcep': 13, 'corpus': {'num_utterances': 3, 'digest': 'a'}}
+    sets = {
+        'train': ([(np.ones((5, 13)), [1], 'p225'), (np.ones((7, 13)), [2], 'p226')], 2),
+        'test': ([(np.ones((3, 13)), [3], 'p227')], 1),
+    }
+
+    assert not split_store_matches(store_path, params, 13)
+
+    write_split_store(store_path, sets, dtype=StoreOptions(store_path, 'float16').dtype, params=params)
+
+    train_store, test_store = open_split_store(store_path)
+    assert len(train_store) == 2 and len(test_store) == 1
+    assert train_store.arena.dtype == np.float16
+    assert test_store.speakers.tolist() == ['p227']
+
+    assert split_store_matches(store_path, params, 13)
+    assert not split_store_matches(store_path, params, 39)
+    assert not split_store_matches(store_path, dict(params, corpus={'num_utterances': 4, 'digest': 'b'}), 13)
+
+    with pytest.raises(ValueError):
+        StoreOptions(store_path, 'float64')
+
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+from speechrecognition.utils import audio_utils, wav_utils
+from speechrecognition.utils.feature_stream import stream_features, stream_num_frames, StreamingResampler, \
+    RunningNormalizer
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+WAV_FILENAMES = [
+    ABS_PATH + '/fixtures/vctk/wav48/p225/p225_001.wav',
+    ABS_PATH + '/fixtures/audio_numbers/0/0_jackson_0.wav',
+]
+
+
+def test_streaming_resampler_matches_offline():
+
+    signal = np.random.RandomState(0).randn(10000)
+
+    for orig_sample_rate in [48000, 8000, 44100]:
+        expected = wav_utils.resample(signal, orig_sample_rate, 16000)
+
+        resampler = StreamingResampler(orig_sample_rate, 16000)
+        chunks = [resampler.process(signal[i:i + 777], final=i + 777 >= len(signal))
+                  for i in range(0, len(signal), 777)]
+
+        assert np.allclose(np.concatenate(chunks), expected, atol=1e-6)
+
+
+def test_stream_features_matches_offline():
+
+    for wav_filename in WAV_FILENAMES:
+        expected = audio_utils.audiofile_to_input_vector(wav_filename, 13, 4, engine='numpy', loader='wav')
+
+        blocks = list(stream_features(wav_filename, 13, chunk_seconds=0.3))
+
+        assert len(blocks) > 1
+        assert np.allclose(np.concatenate(blocks), expected, atol=1e-4)
+
+        # the number of frames is known from the header before the first block
+        assert stream_num_frames(wav_filename, 13) == len(expected)
+
+    # raw features of the CMVN normalization
+    expected = audio_utils.audiofile_to_input_vector(WAV_FILENAMES[0], 13, 4, engine='numpy', loader='wav',
+                                                     normalization='none')
+    blocks = list(stream_features(WAV_FILENAMES[0], 13, chunk_seconds=0.3, normalization='none'))
+
+    assert np.allclose(np.concatenate(blocks), expected, rtol=1e-4, atol=1e-3)
+
+
+def test_predict_preprocess_streams_features(tmpdir):
+
+    from speechrecognition.config.config_reader import ConfigReader
+    from speechrecognition.predicter.main_predict import preprocess_audio, streamable
+
+    with open(ABS_PATH + '/fixtures/config/lstm_ctc.yml') as f:
+        config_text = f.read()
+
+    config_path = str(tmpdir.join('config.yml'))
+    with open(config_path, 'w') as f:
+        f.write(config_text.replace('    num_context: 4\n', '    num_context: 4\n    engine: numpy\n    loader: wav\n'))
+
+    config = ConfigReader(config_path)
+    assert streamable(config)
+
+    x, x_length = preprocess_audio(config, WAV_FILENAMES[1], chunk_seconds=0.3)
+    expected = audio_utils.audiofile_to_input_vector(WAV_FILENAMES[1], 13, 4, engine='numpy', loader='wav')
+
+    assert x.shape == (1, len(expected), 13) and x_length[0] == len(expected)
+    assert np.allclose(x[0], expected, atol=1e-4)
+
+    # the running normalization is chosen in the config
+    with open(config_path, 'w') as f:
+        f.write(config_text.replace('    num_context: 4\n', '    num_context: 4\n    engine: numpy\n    loader: wav\n'
+                                    '    stream_normalization: running\n'))
+
+    x, x_length = preprocess_audio(ConfigReader(config_path), WAV_FILENAMES[1], chunk_seconds=0.3)
+    expected = np.concatenate(list(stream_features(WAV_FILENAMES[1], 13, chunk_seconds=0.3, normalization='running')))
+
+    assert np.allclose(x[0, :x_length[0]], expected, atol=1e-4)
+
+
+def test_running_normalizer():
+
+    features = np.random.RandomState(0).randn(100, 13) * 5 + 3
+
+    normalizer = RunningNormalizer(13)
+    normalized = np.concatenate([normalizer.normalize(features[i:i + 30]) for i in range(0, 100, 30)])
+
+    # the last frame is normalized by statistics of the whole sequence
+    expected_last = (features[-1] - features.mean(axis=0)) / features.std(axis=0)
+    assert np.allclose(normalized[-1], expected_last)
+    assert np.allclose(normalizer.mean, features.mean(axis=0))
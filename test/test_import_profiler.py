@@ -0,0 +1,28 @@
+import sys
+from speechrecognition.helper.import_profiler import ImportProfiler, start_from_argv
+
+
+def test_import_profiler_records_modules_once():
+
+    for name in ('json', 'json.decoder', 'json.scanner', 'json.encoder'):
+        sys.modules.pop(name, None)
+
+    profiler = ImportProfiler().install()
+    try:
+        import json
+        import json.decoder
+        # relative import of an already loaded module
+        exec('from . import decoder', {'__package__': 'json', '__name__': 'json.test'})
+    finally:
+        profiler.uninstall()
+
+    names = [name for name, _ in profiler.timings]
+
+    # the dependencies of json are part of its time, the loaded modules aren't reported again
+    assert names == ['json']
+    assert profiler.total_time() > 0
+
+
+def test_start_from_argv():
+
+    assert start_from_argv(argv=['speech', 'train'], environ={}) is None
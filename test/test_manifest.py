@@ -0,0 +1,94 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from speechrecognition.dataset.manifest import Manifest, ManifestOptions, scan_files
+from speechrecognition.dataset.vctk_dataset import VCTKDataset
+from speechrecognition.utils import text_utils
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+def test_manifest_update(tmpdir):
+
+    dataset_path = str(tmpdir.join('vctk'))
+    shutil.copytree(ABS_PATH + '/fixtures/vctk', dataset_path)
+    manifest_path = str(tmpdir.join('manifest.json'))
+
+    scanned = []
+
+    def scan_speaker(manifest):
+        def scan(group, previous):
+            scanned.append(group)
+            return [manifest.scan_utterance(entry, group, lambda: 'Please call Stella.', previous)
+                    for entry in scan_files(os.path.join(dataset_path, 'wav48', group))]
+        return scan
+
+    groups = {'p225': ['wav48/p225']}
+
+    manifest = Manifest(dataset_path, manifest_path)
+    utterances = manifest.update(groups, scan_speaker(manifest))
+
+    assert len(utterances) == 10 and scanned == ['p225']
+    assert all(utterance.transcript == 'please call stella' and utterance.duration > 0 for utterance in utterances)
+    assert manifest.filenames(utterances)[0] == os.path.join(dataset_path, 'wav48', 'p225', 'p225_001.wav')
+
+    # unchanged directory is served from the manifest file
+    manifest = Manifest(dataset_path, manifest_path)
+    assert manifest.update(groups, scan_speaker(manifest)) == utterances
+    assert scanned == ['p225']
+
+    # removed file changes the stamp of its directory
+    os.remove(os.path.join(dataset_path, 'wav48', 'p225', 'p225_010.wav'))
+    os.utime(os.path.join(dataset_path, 'wav48', 'p225'), ns=(0, 0))
+
+    manifest = Manifest(dataset_path, manifest_path)
+    assert manifest.update(groups, scan_speaker(manifest)) == utterances[:-1]
+    assert scanned == ['p225', 'p225']
+
+
+def test_vctk_manifest(tmpdir):
+
+    dataset_path = ABS_PATH + '/fixtures/vctk'
+    manifest_path = str(tmpdir.join('manifest.json'))
+
+    vctk_dataset = VCTKDataset(dataset_path, 1, 13, 4, mode='stream', manifest_options=ManifestOptions(manifest_path))
+
+    audio_filenames, labels, speakers, durations = vctk_dataset.read_manifest()
+    expected_filenames, label_filenames = vctk_dataset.get_dataset_filenames()
+
+    assert os.path.isfile(manifest_path)
+    assert audio_filenames == expected_filenames
+    assert speakers == ['p225'] * len(audio_filenames)
+    assert len(durations) == len(audio_filenames) and all(duration > 0 for duration in durations)
+    assert all(np.array_equal(label, text_utils.get_refactored_transcript(label_filename, is_digit=False))
+               for label, label_filename in zip(labels, label_filenames))
+
+
+def test_manifest_transcript_update(tmpdir):
+
+    dataset_path = str(tmpdir.join('vctk'))
+    shutil.copytree(ABS_PATH + '/fixtures/vctk', dataset_path)
+    manifest_path = str(tmpdir.join('manifest.json'))
+
+    VCTKDataset(dataset_path, 1, 13, 4, mode='stream', manifest_options=ManifestOptions(manifest_path))
+
+    # corrected transcript is read again when its speaker is rescanned, the other rows are kept
+    with open(os.path.join(dataset_path, 'txt', 'p225', 'p225_001.txt'), 'w') as f:
+        f.write('Please call Bella.\n')
+    os.utime(os.path.join(dataset_path, 'txt', 'p225'), ns=(0, 0))
+
+    vctk_dataset = VCTKDataset(dataset_path, 1, 13, 4, mode='stream', manifest_options=ManifestOptions(manifest_path))
+    _, labels, _, _ = vctk_dataset.read_manifest()
+
+    assert text_utils.index_to_text(labels[0]) == 'please call bella'
+
+
+def test_manifest_options():
+
+    assert ManifestOptions().split_params() == {'split': 'random', 'test_ratio': 0.3, 'split_by_speaker': False}
+
+    for kwargs in ({'split': 'speaker'}, {'split_by_speaker': True}, {'split': 'hash', 'test_ratio': 1.}):
+        with pytest.raises(ValueError):
+            ManifestOptions(**kwargs)
+
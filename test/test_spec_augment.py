@@ -0,0 +1,35 @@
+import pytest
+import numpy as np
+
+tf = pytest.importorskip('tensorflow')
+
+from speechrecognition.trainer.spec_augment import SpecAugment
+
+
+def test_masks_respect_seq_length():
+
+    lengths = np.array([50, 10, 0, 30], dtype=np.int64)
+    x = np.ones((4, 50, 13 * 3), dtype=np.float32)
+    x[np.arange(50)[None, :] >= lengths[:, None]] = 0.
+
+    spec_augment = SpecAugment(13, freq_masks=2, freq_mask_width=4, time_masks=2, time_mask_width=10,
+                               num_blocks=3)
+
+    with tf.Graph().as_default():
+        masked, _, seq_length = spec_augment(tf.constant(x), tf.constant(0), tf.constant(lengths))
+
+        with tf.Session() as session:
+            masked, seq_length = session.run([masked, seq_length])
+
+    assert seq_length.dtype == np.int64
+    assert np.all(masked <= x)
+
+    for item, length in zip(masked, lengths):
+        masked_frames = np.all(item[:length] == 0, axis=1)
+        masked_coefficients = np.all(item[:length] == 0, axis=0)
+
+        assert masked_frames.sum() <= 2 * min(10, int(length * 0.2))
+
+        # the same coefficients are masked in every context block
+        blocks = masked_coefficients.reshape(3, 13)
+        assert np.all(blocks == blocks[0]) and blocks[0].sum() <= 8
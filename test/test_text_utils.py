@@ -0,0 +1,83 @@
+import os
+import glob
+import numpy as np
+from speechrecognition.utils import text_utils
+from speechrecognition.dataset.feature_store import FeatureStore
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+TEXTS = [text_utils.read_txt(filename) for filename in sorted(glob.glob(ABS_PATH + '/fixtures/vctk/txt/*/*.txt'))] + \
+        ['  Hello,   World!\n', 'AHOJ,  jak se \n @ mas 1?', "don't  stop", 'x\t\ty ', 'ümlaut über', 'a']
+
+
+def test_encode_transcripts_matches_refactored_transcript():
+
+    values, offsets = text_utils.encode_transcripts(TEXTS)
+
+    assert values.dtype == np.int8 and offsets.dtype == np.int64
+    assert len(offsets) == len(TEXTS) + 1
+
+    for text, label in zip(TEXTS, text_utils.split_labels(values, offsets)):
+        assert np.array_equal(label, text_utils.get_refactored_transcript(text, is_filename=False, is_digit=False))
+
+    # empty transcripts have empty labels
+    values, offsets = text_utils.encode_transcripts(['', ' .? ', 'ab'])
+    assert offsets.tolist() == [0, 0, 0, 2]
+
+    assert text_utils.encode_transcripts([])[1].tolist() == [0]
+
+
+def test_normalize_transcript():
+
+    normalized = [text_utils.normalize_transcript(text) for text in TEXTS]
+
+    assert normalized[-6:] == ['hello world', 'ahoj jak se mas', 'dont stop', 'x y', 'mlaut ber', 'a']
+    assert all(np.array_equal(a, b) for a, b in zip(text_utils.split_labels(*text_utils.encode_transcripts(normalized)),
+                                                    text_utils.split_labels(*text_utils.encode_transcripts(TEXTS))))
+
+
+def test_store_int8_labels(tmpdir):
+
+    labels = text_utils.split_labels(*text_utils.encode_transcripts(TEXTS[:3]))
+    audios = [np.zeros((5, 13), dtype=np.float32) for _ in labels]
+
+    store = FeatureStore.write(str(tmpdir), audios, labels)
+
+    assert store.label_values.dtype == np.int8
+    assert all(np.array_equal(store.label(i), label) for i, label in enumerate(labels))
+
+
+def test_sparse_tuple_from_csr():
+
+    rng = np.random.RandomState(0)
+    labels = [rng.randint(0, 27, rng.randint(0, 20)) for _ in range(50)]
+
+    indices, values, shape = text_utils.sparse_tuple_from(labels)
+
+    expected_indices = [(n, i) for n, label in enumerate(labels) for i in range(len(label))]
+    assert np.array_equal(indices, np.asarray(expected_indices, dtype=np.int64))
+    assert np.array_equal(values, np.concatenate(labels)) and values.dtype == np.int32
+    assert shape.tolist() == [50, max(len(label) for label in labels)]
+
+    # batches are sliced or gathered from the corpus labels
+    csr = text_utils.labels_to_csr(labels)
+    order = rng.permutation(50)
+
+    for batch, batch_csr in [(labels[5:17], text_utils.csr_slice(*csr, 5, 17)),
+                             ([labels[i] for i in order], text_utils.csr_take(*csr, order))]:
+        for expected, result in zip(text_utils.sparse_tuple_from(batch), text_utils.sparse_tuple_from_csr(*batch_csr)):
+            assert np.array_equal(expected, result)
+
+
+def test_decode_sparse():
+
+    labels = text_utils.split_labels(*text_utils.encode_transcripts(['hello world', '', 'a b', ' x ']))
+    labels[2] = np.array([1, 27, 0, 2])
+
+    decoded = text_utils.decode_sparse(text_utils.sparse_tuple_from(labels))
+
+    assert decoded == ['hello world', '', 'a b', 'x']
+    assert decoded == [text_utils.index_to_text(label) for label in labels]
+
+    # empty decoding of the whole batch
+    assert text_utils.decode_sparse((np.zeros((0, 2)), np.zeros(0), np.array([2, 0]))) == ['', '']
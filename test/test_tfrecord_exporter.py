@@ -0,0 +1,68 @@
+import os
+import pytest
+import numpy as np
+
+tf = pytest.importorskip('tensorflow')
+
+from speechrecognition.dataset.vctk_dataset import VCTKDataset
+from speechrecognition.dataset import tfrecord_exporter
+from speechrecognition.trainer.tensor_iterator import context_windows
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+def test_export_tfrecords(tmpdir):
+
+    export_path = str(tmpdir)
+
+    vctk_dataset = VCTKDataset(ABS_PATH + '/fixtures/vctk', 1, 13, 4, mode='stream', use_context=True, frame_stack=2)
+
+    counts = tfrecord_exporter.export_tfrecords(vctk_dataset, export_path, num_shards=3, sorted_train=True)
+
+    assert counts == {'train': 7, 'test': 3, 'train_sorted': 7}
+    assert tfrecord_exporter.tfrecords_exist(export_path)
+
+    # the export of other preprocessing is exported again
+    assert tfrecord_exporter.tfrecords_match(export_path, vctk_dataset)
+    assert not tfrecord_exporter.tfrecords_match(export_path, VCTKDataset(
+        ABS_PATH + '/fixtures/vctk', 1, 13, 4, mode='stream', use_context=True, frame_stack=2, normalization='cmvn'))
+
+    meta = tfrecord_exporter.read_meta(export_path, 26)
+    with pytest.raises(ValueError):
+        tfrecord_exporter.read_meta(export_path, 13)
+
+    filenames = tfrecord_exporter.shard_filenames(export_path, 'train', meta['num_shards'])
+
+    with tf.Graph().as_default():
+        dataset = tf.data.TFRecordDataset(filenames) \
+            .map(lambda serialized: tfrecord_exporter.parse_example(serialized, meta['feature_size'])) \
+            .batch(1).map(lambda features, label: (context_windows(features, 4)[0], label[0]))
+        next_utterance = dataset.make_one_shot_iterator().get_next()
+
+        utterances = []
+        with tf.Session() as session:
+            for _ in range(counts['train']):
+                utterances.append(session.run(next_utterance))
+
+    # the export is shuffled, the utterances are matched by their labels
+    expected = {label.tobytes(): features for features, label in vctk_dataset.stream_dataset('train')}
+
+    assert len(utterances) == len(expected)
+    for features, label in utterances:
+        assert features.shape[1] == vctk_dataset.input_size()
+        assert np.allclose(features, expected[label.astype(np.int32).tobytes()])
+
+    # the sorted shards read round robin yield the utterances from the shortest to the longest
+    filenames = tfrecord_exporter.shard_filenames(export_path, tfrecord_exporter.SORTED_MODE, meta['num_shards'])
+
+    with tf.Graph().as_default():
+        dataset = tf.data.Dataset.from_tensor_slices(filenames) \
+            .apply(tf.data.experimental.parallel_interleave(tf.data.TFRecordDataset, cycle_length=len(filenames),
+                                                            block_length=1, sloppy=False)) \
+            .map(lambda serialized: tfrecord_exporter.parse_example(serialized, meta['feature_size']))
+        next_utterance = dataset.make_one_shot_iterator().get_next()
+
+        with tf.Session() as session:
+            lengths = [len(session.run(next_utterance)[0]) for _ in range(counts['train_sorted'])]
+
+    assert lengths == sorted(len(features) for features in expected.values())
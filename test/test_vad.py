@@ -0,0 +1,42 @@
+import os
+import glob
+import numpy as np
+from speechrecognition.utils import audio_utils
+from speechrecognition.utils.feature_engine import get_feature_engine
+from speechrecognition.utils.vad import voice_activity_bounds, trim_silence, vad_report
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+WAV_FILENAMES = sorted(glob.glob(ABS_PATH + '/fixtures/vctk/wav48/p225/*.wav'))[:3]
+
+
+def test_voice_activity_bounds():
+
+    sample_rate = audio_utils.SAMPLE_RATE
+    t = np.arange(sample_rate) / sample_rate
+
+    # 1 s of silence, 1 s of tone and 1 s of silence
+    signal = np.concatenate([np.zeros(sample_rate), np.sin(2 * np.pi * 440 * t), np.zeros(sample_rate)])
+    signal += 1e-5 * np.random.RandomState(0).randn(len(signal))
+
+    start, end = voice_activity_bounds(signal, sample_rate, threshold=40., padding=0.)
+    assert abs(start - 98) <= 2 and abs(end - 200) <= 2
+
+    padded_start, padded_end = voice_activity_bounds(signal, sample_rate, threshold=40., padding=0.1)
+    assert padded_start == start - 10 and padded_end == end + 10
+
+    trimmed, num_frames = trim_silence(signal, sample_rate, threshold=40., padding=0.1)
+    assert num_frames == 299
+    assert get_feature_engine(sample_rate, 13).num_frames(len(trimmed)) == padded_end - padded_start
+
+
+def test_trimmed_features():
+
+    features = audio_utils.audiofiles_to_input_vectors(WAV_FILENAMES, 13, 4, engine='numpy')
+    trimmed, num_frames = audio_utils.audiofiles_to_input_vectors(WAV_FILENAMES, 13, 4, engine='numpy',
+                                                                  vad_threshold=40., return_num_frames=True)
+
+    assert num_frames == [len(feature) for feature in features]
+    assert all(len(feature) < frames for feature, frames in zip(trimmed, num_frames))
+
+    assert vad_report(num_frames, [len(feature) for feature in trimmed]) > 0
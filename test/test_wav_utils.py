@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import scipy.io.wavfile as wav
+from speechrecognition.utils import wav_utils
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+VCTK_WAV = ABS_PATH + '/fixtures/vctk/wav48/p225/p225_001.wav'
+DIGIT_WAV = ABS_PATH + '/fixtures/audio_numbers/0/0_jackson_0.wav'
+
+
+def test_read_wav_is_memory_mapped():
+
+    samples, sample_rate, scale = wav_utils.read_wav(VCTK_WAV)
+    expected_sample_rate, expected_samples = wav.read(VCTK_WAV)
+
+    assert isinstance(samples, np.memmap)
+    assert sample_rate == expected_sample_rate
+    assert np.array_equal(samples[:, 0], expected_samples)
+
+
+def test_wav_duration():
+
+    sample_rate, samples = wav.read(VCTK_WAV)
+
+    assert wav_utils.wav_duration(VCTK_WAV) == len(samples) / sample_rate
+
+
+def test_read_wav_clamps_streamed_data_size(tmpdir):
+
+    sample_rate, expected_samples = wav.read(VCTK_WAV)
+
+    # streamed recordings leave the maximal data size in the header
+    wav_filename = str(tmpdir.join('streamed.wav'))
+    wav.write(wav_filename, sample_rate, expected_samples)
+    with open(wav_filename, 'r+b') as f:
+        f.seek(40)
+        f.write(b'\xff\xff\xff\xff')
+
+    samples, _, _ = wav_utils.read_wav(wav_filename)
+
+    assert np.array_equal(samples[:, 0], expected_samples)
+    assert wav_utils.wav_duration(wav_filename) == len(expected_samples) / sample_rate
+
+
+def test_load_wav_resamples_like_librosa():
+
+    import librosa
+
+    for wav_filename in [VCTK_WAV, DIGIT_WAV]:
+        expected, _ = librosa.load(wav_filename, sr=16000)
+        signal, sample_rate = wav_utils.load_wav(wav_filename, sample_rate=16000)
+
+        assert sample_rate == 16000
+        assert signal.dtype == np.float32
+        assert len(signal) == len(expected)
+        assert np.corrcoef(signal, expected)[0, 1] > 0.99
+
+
+def test_load_wav_falls_back_to_librosa(tmpdir):
+
+    # 64-bit float WAV is not read directly
+    wav_filename = str(tmpdir.join('float64.wav'))
+    wav.write(wav_filename, 8000, np.sin(np.linspace(0, 100, 8000)))
+
+    signal, sample_rate = wav_utils.load_wav(wav_filename, sample_rate=16000)
+
+    assert sample_rate == 16000
+    assert len(signal) == 16000
+
+
+def test_polyphase_filter_is_cached():
+
+    assert wav_utils.polyphase_filter(1, 3, 'fast') is wav_utils.polyphase_filter(1, 3, 'fast')
+    assert len(wav_utils.polyphase_filter(1, 3, 'fast')) < len(wav_utils.polyphase_filter(1, 3, 'high'))